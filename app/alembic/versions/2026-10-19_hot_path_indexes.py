@@ -0,0 +1,68 @@
+"""hot_path_indexes
+
+Revision ID: 2d9e47b0a6c1
+Revises: 8f3a61d2c7b4
+Create Date: 2026-10-19 14:03:52.207319
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2d9e47b0a6c1"
+down_revision = "8f3a61d2c7b4"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("message_room_id_created_at_idx", "message", ["room_id", "created_at"]),
+    ("message_token_usage_id_idx", "message", ["token_usage_id"]),
+    ("user_file_user_source_value_idx", "user_file", ["user", "source_value"]),
+    ("active_room_user_user_id_idx", "active_room_user", ["user_id"]),
+    ("user_model_user_idx", "user_model", ["user"]),
+    (
+        "organization_model_organization_uuid_idx",
+        "organization_model",
+        ["organization_uuid"],
+    ),
+)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction and doesn't
+    # lock the tables against writes while it builds
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            # an index left invalid by an interrupted build has to be rebuilt
+            op.execute(
+                f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_index
+                        JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+                        WHERE pg_class.relname = '{name}' AND NOT pg_index.indisvalid
+                    ) THEN
+                        EXECUTE 'DROP INDEX {name}';
+                    END IF;
+                END $$;
+                """
+            )
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
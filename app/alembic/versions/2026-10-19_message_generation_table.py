@@ -0,0 +1,67 @@
+"""message_generation_table
+
+Revision ID: b5e1f3c8a217
+Revises: 71c0e5a9d3f8
+Create Date: 2026-10-19 18:12:44.315270
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+from src.db_types import AwareDateTime
+
+# revision identifiers, used by Alembic.
+revision = "b5e1f3c8a217"
+down_revision = "71c0e5a9d3f8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "message_generation",
+        sa.Column("id", sa.Integer(), sa.Identity(always=False), nullable=False),
+        sa.Column("message_uuid", sa.UUID(), nullable=False),
+        sa.Column("room_id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("provider", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("time_to_first_token", sa.Float(), nullable=False),
+        sa.Column("mean_chunk_gap", sa.Float(), nullable=True),
+        sa.Column("max_chunk_gap", sa.Float(), nullable=True),
+        sa.Column("chunks", sa.Integer(), nullable=False),
+        sa.Column("tokens", sa.Integer(), nullable=False),
+        sa.Column("tokens_per_second", sa.Float(), nullable=True),
+        sa.Column("duration", sa.Float(), nullable=False),
+        sa.Column(
+            "created_at",
+            AwareDateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["message_uuid"], ["message.uuid"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["room_id"], ["room.uuid"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["auth_user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("message_uuid"),
+    )
+    op.create_index(
+        "message_generation_room_id_created_at_idx",
+        "message_generation",
+        ["room_id", "created_at"],
+    )
+    op.create_index(
+        "message_generation_user_id_created_at_idx",
+        "message_generation",
+        ["user_id", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "message_generation_user_id_created_at_idx", table_name="message_generation"
+    )
+    op.drop_index(
+        "message_generation_room_id_created_at_idx", table_name="message_generation"
+    )
+    op.drop_table("message_generation")
@@ -0,0 +1,41 @@
+"""room_visibility_indexes
+
+Revision ID: 8f3a61d2c7b4
+Revises: 4c52b7bd9194
+Create Date: 2026-10-19 10:12:31.518204
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8f3a61d2c7b4"
+down_revision = "4c52b7bd9194"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "room_user_id_visibility_idx",
+        "room",
+        ["user_id", "visibility"],
+        unique=False,
+    )
+    op.create_index(
+        "room_organization_uuid_visibility_idx",
+        "room",
+        ["organization_uuid", "visibility"],
+        unique=False,
+    )
+    op.create_index(
+        "organization_user_auth_user_id_idx",
+        "organization_user",
+        ["auth_user_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("organization_user_auth_user_id_idx", table_name="organization_user")
+    op.drop_index("room_organization_uuid_visibility_idx", table_name="room")
+    op.drop_index("room_user_id_visibility_idx", table_name="room")
@@ -0,0 +1,41 @@
+"""token_usage_sequence_default
+
+Revision ID: 71c0e5a9d3f8
+Revises: 2d9e47b0a6c1
+Create Date: 2026-10-19 16:41:07.903662
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "71c0e5a9d3f8"
+down_revision = "2d9e47b0a6c1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ids used to be assigned as max(id) + 1 when the sequence collided,
+    # move the sequence past them and make it the column default
+    op.execute("CREATE SEQUENCE IF NOT EXISTS token_usage_id_seq START 1000")
+    op.execute(
+        """
+        SELECT setval(
+            'token_usage_id_seq',
+            GREATEST(
+                (SELECT max(id) FROM token_usage),
+                (SELECT last_value FROM token_usage_id_seq)
+            )
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE token_usage_id_seq OWNED BY token_usage.id")
+    op.execute(
+        "ALTER TABLE token_usage ALTER COLUMN id "
+        "SET DEFAULT nextval('token_usage_id_seq')"
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE token_usage ALTER COLUMN id DROP DEFAULT")
+    op.execute("ALTER SEQUENCE token_usage_id_seq OWNED BY NONE")
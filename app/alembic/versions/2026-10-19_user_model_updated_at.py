@@ -0,0 +1,33 @@
+"""user_model_updated_at
+
+Revision ID: e266316b7a05
+Revises: b5e1f3c8a217
+Create Date: 2026-10-19 20:04:31.528190
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+from src.db_types import AwareDateTime
+
+# revision identifiers, used by Alembic.
+revision = "e266316b7a05"
+down_revision = "b5e1f3c8a217"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_model",
+        sa.Column(
+            "updated_at",
+            AwareDateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("user_model", "updated_at")
@@ -4,6 +4,7 @@ import multiprocessing
 import os
 
 from src.config import settings
+from src.metrics import mark_process_dead
 
 host = os.getenv("GUNICORN_HOST", "0.0.0.0")
 port = os.getenv("PORT", "9000")
@@ -50,3 +51,8 @@ graceful_timeout = int(graceful_timeout_str)
 timeout = int(timeout_str)
 keepalive = int(keepalive_str)
 logconfig = settings.LOGGING_CONFIG
+
+
+def child_exit(server, worker):
+    # drops the live gauges of the worker from the multiprocess metrics
+    mark_process_dead(worker.pid)
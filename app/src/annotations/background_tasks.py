@@ -1,6 +1,4 @@
-import json
 import logging
-from asyncio import get_event_loop
 from time import time
 
 from src.annotations.helpers import (
@@ -26,11 +24,11 @@ from src.chat.bot_ai import BotAI
 from src.chat.content_cleaner import clean_html_input
 from src.chat.schemas import BroadcastData, MessageDetails
 from src.chat.service import update_message_in_db
-from src.database import database
 from src.listener.constants import bot_message_creation_finished_info
 from src.redis_client import pub_sub_manager
 from src.tasks import celery_app
 from src.user_files.constants import UserFileSourceType
+from src.worker import worker_runtime
 
 logger = logging.getLogger(__name__)
 
@@ -117,14 +115,12 @@ async def create_annotations(
         # set the message that the bot has finished creating the annotation
         await pub_sub_manager.publish(
             form_data.room_id,
-            json.dumps(
-                BroadcastData(
-                    type=bot_message_creation_finished_info,
-                    message="",
-                    room_id=form_data.room_id,
-                    created_by="bot",
-                ).model_dump(mode="json")
-            ),
+            BroadcastData(
+                type=bot_message_creation_finished_info,
+                message="",
+                room_id=form_data.room_id,
+                created_by="bot",
+            ).model_dump_json(),
         )
 
         return AnnotationFormOutput(status={"error": "selectors not created"})
@@ -196,14 +192,12 @@ async def create_annotations(
             # set the message that the bot has finished creating the annotation
             await pub_sub_manager.publish(
                 form_data.room_id,
-                json.dumps(
-                    BroadcastData(
-                        type=bot_message_creation_finished_info,
-                        message="",
-                        room_id=form_data.room_id,
-                        created_by="bot",
-                    ).model_dump(mode="json")
-                ),
+                BroadcastData(
+                    type=bot_message_creation_finished_info,
+                    message="",
+                    room_id=form_data.room_id,
+                    created_by="bot",
+                ).model_dump_json(),
             )
 
             return AnnotationFormOutput(status={"error": "annotation not created"})
@@ -246,26 +240,22 @@ async def create_annotations(
     # broadcast the message in the chat
     await pub_sub_manager.publish(
         form_data.room_id,
-        json.dumps(
-            BroadcastData(
-                type="annotation",
-                message=user_message,
-                room_id=form_data.room_id,
-                created_by="bot",
-            ).model_dump(mode="json"),
-        ),
+        BroadcastData(
+            type="annotation",
+            message=user_message,
+            room_id=form_data.room_id,
+            created_by="bot",
+        ).model_dump_json(),
     )
     # set the message that the bot has finished creating the annotation
     await pub_sub_manager.publish(
         form_data.room_id,
-        json.dumps(
-            BroadcastData(
-                type=bot_message_creation_finished_info,
-                message="",
-                room_id=form_data.room_id,
-                created_by="bot",
-            ).model_dump(mode="json")
-        ),
+        BroadcastData(
+            type=bot_message_creation_finished_info,
+            message="",
+            room_id=form_data.room_id,
+            created_by="bot",
+        ).model_dump_json(),
     )
 
     return AnnotationFormOutput(status={"result": "annotation created"})
@@ -279,18 +269,14 @@ def create_annotations_in_background(
     message_db: dict,
     prompt_message_db: dict,
 ):
-    loop = get_event_loop()
-    loop.run_until_complete(database.connect())
-    logger.info("Connected to database")
-    status: AnnotationFormOutput = loop.run_until_complete(
+    status: AnnotationFormOutput = worker_runtime.run(
         create_annotations(
             form_data_input=form_data,
             jwt_data_input=jwt_data,
             db_user=db_user,
             message_db=message_db,
             prompt_message_db=prompt_message_db,
-        )
+        ),
+        name="create_annotations_in_background",
     )
-    logger.info("Got users from database")
-    loop.run_until_complete(database.disconnect())
     return status.model_dump()
@@ -38,7 +38,7 @@ Expected return:
       "annotation": "An in-depth examination of 'our trouble', addressing its role, significance, and its interrelation with the previous context of love, exploring thematic struggles."
 
 Rules:
-- Returning an empty list is only permissible if `split_index` is less than `total`.
+- Returning an empty list is only permissible if `split_index` is less than `total`, or if `total` is unknown because the rest of the text is still being loaded.
 - Prefix and suffix must not exceed 30 characters.
 - Each annotation object must contain only four keys: `exact`, `prefix`, `suffix`, and `annotation`.
 - Begin the response directly with a valid JSON object.
@@ -84,7 +84,7 @@ Expected return:
       "annotation": "An in-depth examination of 'our trouble', addressing its role, significance, and its interrelation with the previous context of love, exploring thematic struggles."
 
 Rules:
-- Returning an empty list is only permissible if `split_index` is less than `total`.
+- Returning an empty list is only permissible if `split_index` is less than `total`, or if `total` is unknown because the rest of the text is still being loaded.
 - Prefix and suffix must not exceed 30 characters.
 - Each annotation object must contain only four keys: `exact`, `prefix`, `suffix`, and `annotation`.
 - Begin the response directly with a valid JSON object.
@@ -92,6 +92,9 @@ Rules:
 The JSON output:
 """
 
+# `total` of the prompt templates while the document is still being split
+SPLITS_TOTAL_UNKNOWN = "unknown"
+
 DOCUMENT_TITLE_PROMPT_TEMPLATE = """Get the title of the document
 from the input.
 RULES:
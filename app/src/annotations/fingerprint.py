@@ -1,8 +1,9 @@
 import hashlib
 import logging
+from typing import IO
 
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfparser import PDFParser
+from PyPDF2 import PdfReader
+from PyPDF2.generic import TextStringObject
 
 logger = logging.getLogger(__name__)
 
@@ -24,44 +25,46 @@ def hexify(byte_string):
     return "".join([byte_to_hex(b) for b in byte_string])
 
 
-def hash_of_first_kilobyte(path):
-    logger.info(f"Calculating hash of first kilobyte of {path}")
-    with open(path, "rb") as f:
-        h = hashlib.md5()
-        h.update(f.read(1024))
-        return h.hexdigest()
+def hash_of_first_kilobyte(stream: IO[bytes]) -> str:
+    logger.info("Calculating hash of first kilobyte")
+    stream.seek(0)
+    h = hashlib.md5()
+    h.update(stream.read(1024))
+    return h.hexdigest()
 
 
-def file_id_from(path):
+def file_id_from(reader: PdfReader) -> str | None:
     """
-    Return the PDF file identifier from the given file as a hex string.
+    Return the PDF file identifier from the already parsed trailer as a hex string.
     Returns None if the document doesn't contain a file identifier.
     """
-    logger.info(f"Extracting file id from {path}")
-    with open(path, "rb") as f:
-        parser = PDFParser(f)
-        document = PDFDocument(parser)
-
-        for xref in document.xrefs:
-            trailer = xref.get_trailer()
-            try:
-                id_array = trailer["ID"]
-            except KeyError:
-                continue
-
-            # Resolve indirect object references.
-            try:
-                id_array = id_array.resolve()
-            except AttributeError:
-                pass
-
-            try:
-                file_id = id_array[0]
-            except TypeError:
-                continue
-
-            return hexify(file_id)
-
-
-def fingerprint(path):
-    return file_id_from(path) or hash_of_first_kilobyte(path)
+    logger.info("Extracting file id from the PDF trailer")
+    try:
+        id_array = reader.trailer.get("/ID")
+    except Exception as e:
+        logger.error(f"Failed to read the PDF trailer: {e}")
+        return None
+    if not id_array:
+        return None
+
+    # Resolve indirect object references.
+    try:
+        file_id = id_array.get_object()[0].get_object()
+    except (IndexError, TypeError, AttributeError):
+        return None
+
+    # PyPDF2 decodes some identifiers into text, hash the raw bytes instead
+    if isinstance(file_id, TextStringObject):
+        file_id = file_id.get_original_bytes()
+
+    if not isinstance(file_id, bytes):
+        return None
+
+    return hexify(file_id)
+
+
+def fingerprint(reader: PdfReader, stream: IO[bytes]) -> str:
+    """
+    Fingerprint of the PDF, as used by Hypothesis in `urn:x-pdf:` URNs
+    """
+    return file_id_from(reader) or hash_of_first_kilobyte(stream)
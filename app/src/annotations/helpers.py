@@ -1,4 +1,3 @@
-import json
 from logging import Logger, getLogger
 from time import time
 
@@ -41,14 +40,12 @@ async def user_not_found_error(
     # set the message that the bot has finished creating the annotation
     await pub_sub_manager.publish(
         form_data_input["room_id"],
-        json.dumps(
-            BroadcastData(
-                type=bot_message_creation_finished_info,
-                message="",
-                room_id=form_data_input["room_id"],
-                created_by="bot",
-            ).model_dump(mode="json")
-        ),
+        BroadcastData(
+            type=bot_message_creation_finished_info,
+            message="",
+            room_id=form_data_input["room_id"],
+            created_by="bot",
+        ).model_dump_json(),
     )
 
     return AnnotationFormOutput(status={"error": "user not found"})
@@ -1,5 +1,4 @@
 import asyncio
-import json
 import logging
 from datetime import datetime
 from time import time
@@ -13,8 +12,9 @@ from src.annotations.schemas import (
     HypothesisApiInput,
 )
 from src.annotations.validations import validate_data_tags
+from src.chat.api_info import publish_api_info
 from src.chat.schemas import APIInfoBroadcastData
-from src.redis_client import pub_sub_manager
+from src.tracing import trace_http_request
 
 logger = logging.getLogger(__name__)
 
@@ -35,28 +35,22 @@ class HypothesisAPI:
         headers = {"Authorization": f"Bearer {self.api_key}"}
         url = f"{self.BASE_URL}/profile"
 
-        await pub_sub_manager.publish(
-            self.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.room_id,
-                    date=datetime.now().isoformat(),
-                    api="Hypothesis API",
-                    type="sent",
-                    data={
-                        "url": url,
-                        "why_you_see_this": """We need to get user id from
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.room_id,
+                date=datetime.now().isoformat(),
+                api="Hypothesis API",
+                type="sent",
+                data={
+                    "url": url,
+                    "why_you_see_this": """We need to get user id from
                         hypothesis API basing on the API key provided""",
-                    },
-                ).model_dump(
-                    mode="json",
-                    exclude={
-                        "model",
-                    },
-                )
+                },
             ),
+            exclude={"model"},
         )
-        response = requests.get(url, headers=headers)
+        with trace_http_request("GET", url):
+            response = requests.get(url, headers=headers)
         res_json = response.json()
         user_id = res_json["userid"]
 
@@ -84,25 +78,19 @@ class HypothesisAPI:
             model_dump.pop("tags")
 
         logger.info(f"Model dump: {model_dump}")
-        await pub_sub_manager.publish(
-            self.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.room_id,
-                    date=datetime.now().isoformat(),
-                    api="Hypothesis API",
-                    type="sent",
-                    data=model_dump,
-                ).model_dump(
-                    mode="json",
-                    exclude={
-                        "model",
-                    },
-                )
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.room_id,
+                date=datetime.now().isoformat(),
+                api="Hypothesis API",
+                type="sent",
+                data=model_dump,
             ),
+            exclude={"model"},
         )
 
-        response = requests.post(url, headers=headers, json=model_dump)
+        with trace_http_request("POST", url):
+            response = requests.post(url, headers=headers, json=model_dump)
 
         if response.status_code != 200:
             logger.error(f"Failed to create annotation: {response.text}")
@@ -110,23 +98,16 @@ class HypothesisAPI:
         res_json = response.json()
         annotation = HypothesisAnnotationCreateOutput(**res_json)
 
-        await pub_sub_manager.publish(
-            self.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.room_id,
-                    date=datetime.now().isoformat(),
-                    api="Hypothesis API",
-                    type="recd",
-                    elapsed_time=time() - start_time,
-                    data=res_json,
-                ).model_dump(
-                    mode="json",
-                    exclude={
-                        "model",
-                    },
-                )
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.room_id,
+                date=datetime.now().isoformat(),
+                api="Hypothesis API",
+                type="recd",
+                elapsed_time=time() - start_time,
+                data=res_json,
             ),
+            exclude={"model"},
         )
 
         logger.info(f"Hypothesis annotation created: {annotation.id}!!")
@@ -140,7 +121,8 @@ class HypothesisAPI:
             headers["Authorization"] = f"Bearer {self.api_key}"
         url = f"{self.BASE_URL}/annotations/{annotation_id}"
 
-        response = requests.get(url, headers=headers)
+        with trace_http_request("GET", url):
+            response = requests.get(url, headers=headers)
         if response.status_code != 200:
             logger.error(f"Failed to get annotation: {response.text}")
             return None
@@ -158,7 +140,8 @@ class HypothesisAPI:
             headers["Authorization"] = f"Bearer {self.api_key}"
         url = f"{self.BASE_URL}/search?user={user_id}&uri={url}"
 
-        response = requests.get(url, headers=headers)
+        with trace_http_request("GET", url):
+            response = requests.get(url, headers=headers)
         if response.status_code != 200:
             logger.error(f"Failed to get annotations: {response.text}")
             return []
@@ -184,31 +167,25 @@ class HypothesisAPI:
                 headers["Authorization"] = f"Bearer {self.api_key}"
             url = f"{self.BASE_URL}/annotations/{annotation.id}"
 
-            response = requests.delete(url, headers=headers)
+            with trace_http_request("DELETE", url):
+                response = requests.delete(url, headers=headers)
             if response.status_code != 200:
                 logger.error(f"Failed to delete annotation: {response.text}")
                 return None
 
-            await pub_sub_manager.publish(
-                self.room_id,
-                json.dumps(
-                    APIInfoBroadcastData(
-                        room_id=self.room_id,
-                        date=datetime.now().isoformat(),
-                        api="Hypothesis API",
-                        type="sent",
-                        data={
-                            "action": "delete",
-                            "url": url,
-                            "annotation_id": annotation.id,
-                        },
-                    ).model_dump(
-                        mode="json",
-                        exclude={
-                            "model",
-                        },
-                    )
+            await publish_api_info(
+                APIInfoBroadcastData(
+                    room_id=self.room_id,
+                    date=datetime.now().isoformat(),
+                    api="Hypothesis API",
+                    type="sent",
+                    data={
+                        "action": "delete",
+                        "url": url,
+                        "annotation_id": annotation.id,
+                    },
                 ),
+                exclude={"model"},
             )
             logger.info(f"Annotation deleted: {annotation.id}!!")
 
@@ -220,7 +197,8 @@ class HypothesisAPI:
             headers["Authorization"] = f"Bearer {self.api_key}"
         url = f"{self.BASE_URL}/annotations/{annotation_id}"
 
-        response = requests.delete(url, headers=headers)
+        with trace_http_request("DELETE", url):
+            response = requests.delete(url, headers=headers)
         if response.status_code != 200:
             logger.error(f"Failed to delete annotation: {response.text}")
             return None
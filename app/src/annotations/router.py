@@ -1,4 +1,3 @@
-import json
 import logging
 
 from databases.interfaces import Record
@@ -17,9 +16,9 @@ from src.auth.schemas import JWTData
 from src.auth.service import get_user_by_id
 from src.chat.schemas import MessageDetails
 from src.chat.service import create_message_in_db, delete_user_message_from_db
-from src.listener.constants import listener_room_name, room_changed_info
+from src.listener.constants import room_changed_info
 from src.listener.schemas import WSEventMessage
-from src.redis_client import pub_sub_manager
+from src.listener.topics import publish_room_event
 
 router = APIRouter()
 
@@ -101,14 +100,12 @@ async def delete_annotations(
     await delete_user_message_from_db(input_data.message_uuid, jwt_data.user_id)
     logger.info("Message deleted from DB")
 
-    await pub_sub_manager.publish(
-        listener_room_name,
-        json.dumps(
-            WSEventMessage(
-                type=room_changed_info,
-                id=str(jwt_data.user_id),
-                source="delete-annotations",
-            ).model_dump(mode="json")
+    await publish_room_event(
+        input_data.room_id,
+        WSEventMessage(
+            type=room_changed_info,
+            id=str(jwt_data.user_id),
+            source="delete-annotations",
         ),
     )
 
@@ -1,19 +1,17 @@
-import json
+import asyncio
 from datetime import datetime
 from logging import getLogger
-from time import sleep, time
+from time import time
+from typing import AsyncIterator
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_anthropic import ChatAnthropic
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
 
 from src.annotations.constants import (
     ANNOTATION_ANALYZE_PROMPT_TEMPLATE,
     DOCUMENT_TITLE_PROMPT_TEMPLATE,
     NUM_OF_SELECTORS_PROMPT_TEMPLATE,
+    SPLITS_TOTAL_UNKNOWN,
     TEXT_SELECTOR_PROMPT_TEMPLATE,
     YOUTUBE_TRANSCRIPTION_PROMPT_TEMPLATE,
 )
@@ -25,14 +23,17 @@ from src.annotations.schemas import (
     TextQuoteSelector,
 )
 from src.auth.schemas import UserDB
+from src.chat.api_info import has_api_info_listeners, publish_api_info
 from src.chat.schemas import APIInfoBroadcastData
 from src.google_drive.downloader import get_google_drive_file_details
-from src.redis_client import pub_sub_manager
+from src.metrics import time_llm_request
 from src.scraping.downloaders import download_and_extract_content_from_url
+from src.tokenizer.splitter import iter_pieces, split_text_stream
 from src.user_files.constants import UserFileSourceType
-from src.user_models.constants import KNOWN_CONTEXT_WINDOWS, NON_STREAMABLE_MODELS
+from src.user_models.clients import get_chat_model
+from src.user_models.constants import NON_STREAMABLE_MODELS
 from src.user_models.schemas import UserModelOut
-from src.user_models.service import decrypt_api_key, get_model_by_uuid
+from src.user_models.service import get_model_by_uuid
 from src.youtube.service import YouTubeService
 
 logger = getLogger(__name__)
@@ -47,6 +48,7 @@ class AnnotationsScraper:
     ):
         self.data: AnnotationFormInput = input_form_data
         self.splits: list[str] = []
+        self.all_splits_loaded = False
         self.user_db: UserDB | None = user_db
         self.pdf_urn: str | None = None
         self.whole_input = ""
@@ -75,130 +77,116 @@ class AnnotationsScraper:
         higher_temperature: float = (
             0.5 if self.data.model not in NON_STREAMABLE_MODELS else 1.0
         )
-        if user_model.provider.lower() == "openai":
-            self.zero_temp_llm = ChatOpenAI(  # type: ignore
-                temperature=zero_temperature,
-                model=self.data.model,
-                openai_api_key=decrypt_api_key(user_model.api_key),
-            )
-            self.higher_temp_llm = ChatOpenAI(  # type: ignore
-                temperature=higher_temperature,
-                model=self.data.model,
-                openai_api_key=decrypt_api_key(user_model.api_key),
-            )
-        elif user_model.provider.lower() == "claude":
-            self.zero_temp_llm = ChatAnthropic(  # type: ignore
-                temperature=zero_temperature,
-                model=self.data.model,
-                api_key=decrypt_api_key(user_model.api_key),
-            )
-            self.higher_temp_llm = ChatAnthropic(  # type: ignore
-                temperature=higher_temperature,
-                model=self.data.model,
-                api_key=decrypt_api_key(user_model.api_key),
-            )
-        elif user_model.provider.lower() == "groq":
-            self.zero_temp_llm = ChatGroq(  # type: ignore
-                temperature=zero_temperature,
-                model_name=self.data.model,
-                groq_api_key=decrypt_api_key(user_model.api_key),
-            )
-            self.higher_temp_llm = ChatGroq(  # type: ignore
-                temperature=higher_temperature,
-                model_name=self.data.model,
-                groq_api_key=decrypt_api_key(user_model.api_key),
-            )
+        # both models come from the shared client pool
+        self.zero_temp_llm = get_chat_model(
+            user_model.provider, self.data.model, user_model.api_key, zero_temperature
+        )
+        self.higher_temp_llm = get_chat_model(
+            user_model.provider, self.data.model, user_model.api_key, higher_temperature
+        )
 
-    async def _get_url_splits(self, url: str) -> list[str]:
+    async def _get_url_pages(self, url: str) -> AsyncIterator[str] | None:
         """
-        Get page content by URL
+        Get page content by URL, as a stream of pages
         """
-        content: str
-        await pub_sub_manager.publish(
-            self.data.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.data.room_id,
-                    date=datetime.now().isoformat(),
-                    api="Content Loader",
-                    type="sent",
-                    data={
-                        "url": url,
-                    },
-                ).model_dump(
-                    mode="json",
-                    exclude={
-                        "model",
-                    },
-                )
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.data.room_id,
+                date=datetime.now().isoformat(),
+                api="Content Loader",
+                type="sent",
+                data={
+                    "url": url,
+                },
             ),
+            exclude={"model"},
         )
-        start_time = time()
         logger.info(f"Annotations: Getting content from URL: {url}")
+        url_data: dict | None
         if self.data.input_type == UserFileSourceType.URL:
             self.source = UserFileSourceType.URL
             url_data = await download_and_extract_content_from_url(
-                url=url, room_id=self.data.room_id, get_urn=True
+                url=url, room_id=self.data.room_id, get_urn=True, stream=True
             )
             if not url_data:
-                return []
-            content = url_data.get("content", "")
+                return None
             self.pdf_urn = url_data.get("urn", None)
         elif self.data.input_type == UserFileSourceType.GOOGLE_DRIVE:
             self.source = UserFileSourceType.GOOGLE_DRIVE
             if not self.user_db:
                 logger.error("User is missing")
-                return []
+                return None
 
             logger.info(
                 f"Getting PDF file details from Google Drive with file ID: {url}"
             )
             logger.info("User: %s", self.user_db.model_dump())
-            data: dict | None = await get_google_drive_file_details(
-                file_id=url, user_db=self.user_db
+            url_data = await get_google_drive_file_details(
+                file_id=url, user_db=self.user_db, stream=True
             )
-            if not data:
-                return []
+            if not url_data:
+                return None
 
             logger.info(f"Got PDF file details from Google Drive with file ID: {url}")
-            content = data["content"]
-            self.pdf_urn = data["urn"]
+            self.pdf_urn = url_data["urn"]
         else:
             logger.info(f"Unsupported input type: {self.data.input_type}")
-            return []
+            return None
+
+        return url_data.get("pages") or iter_pieces(url_data.get("content", ""))
+
+    async def _iter_url_splits(self, url: str) -> AsyncIterator[str]:
+        """
+        Get page content by URL and split it while it is still being extracted
+        """
+        start_time = time()
+        pages = await self._get_url_pages(url)
+        if pages is None:
+            return
+
+        # the whole document is kept only for the API debug stream
+        keep_content = await has_api_info_listeners(self.data.room_id)
+        contents: list[str] = []
+
+        async def _collect_pages() -> AsyncIterator[str]:
+            async for page in pages:
+                if keep_content:
+                    contents.append(page)
+                yield page
+
+        async for split in split_text_stream(_collect_pages(), self.data.model):
+            yield split
 
         logger.info(f"Content from URL: {url} has been received")
-        await pub_sub_manager.publish(
-            self.data.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.data.room_id,
-                    date=datetime.now().isoformat(),
-                    api="Content Loader",
-                    type="recd",
-                    elapsed_time=time() - start_time,
-                    data={
-                        "content": content,
-                    },
-                ).model_dump(
-                    mode="json",
-                    exclude={
-                        "model",
-                    },
-                )
-            ),
-        )
+        if not keep_content:
+            return
 
-        splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=KNOWN_CONTEXT_WINDOWS.get(self.data.model, 4096),
-            chunk_overlap=0,
+        content = " ".join(contents)
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.data.room_id,
+                date=datetime.now().isoformat(),
+                api="Content Loader",
+                type="recd",
+                elapsed_time=time() - start_time,
+                data={
+                    "content": content,
+                },
+            ),
+            exclude={"model"},
         )
-        splits: list[str] = splitter.split_text(content)
 
-        # Save splits for later use
-        self.splits = splits
-
-        return splits
+    async def _produce_splits(self, url: str, queue: asyncio.Queue) -> None:
+        """
+        Save splits for later use and hand them over to the selectors loop
+        """
+        try:
+            async for split in self._iter_url_splits(url):
+                self.splits.append(split)
+                await queue.put(split)
+            self.all_splits_loaded = True
+        finally:
+            queue.put_nowait(None)
 
     def set_url_source(self):
         """
@@ -221,9 +209,22 @@ class AnnotationsScraper:
         Get selectors from URL
         """
         await self.set_models()
-        splits: list[str] = await self._get_url_splits(self.data.url)
 
-        if not splits:
+        # splitting runs in the background, so the first LLM request goes out
+        # while the rest of the document is still being extracted
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+        producer = asyncio.create_task(self._produce_splits(self.data.url, queue))
+        try:
+            return await self._get_selectors_from_splits(queue, producer)
+        finally:
+            producer.cancel()
+
+    async def _get_selectors_from_splits(
+        self, queue: asyncio.Queue, producer: asyncio.Task
+    ) -> dict[str, str | list[TextQuoteSelector]]:
+        split: str | None = await queue.get()
+        if split is None:
+            await producer
             return {
                 "error": "Content from URL is empty.",
             }
@@ -245,11 +246,12 @@ class AnnotationsScraper:
             f"""Creating selectors from URL: {self.data.url}
         with query: {self.data.prompt}..."""
         )
-        for index, split in enumerate(splits):
-            logger.info(f"Processing split {index + 1} out of {len(splits)}")
+        index = 0
+        while split is not None:
+            logger.info(f"Processing split {index + 1} out of {self._splits_total()}")
 
             scraped_data: ListOfTextQuoteSelector = await self._get_selector_from_split(
-                split
+                split, index
             )
 
             for selector in scraped_data.selectors:
@@ -266,6 +268,13 @@ class AnnotationsScraper:
                 )
                 break
 
+            index += 1
+            split = await queue.get()
+
+        if split is None:
+            # surface extraction errors of the background producer
+            await producer
+
         logger.info(
             f"""Selectors created from URL: {self.data.url}
         with query: {self.data.prompt}"""
@@ -285,6 +294,14 @@ class AnnotationsScraper:
             "selectors": selectors,
         }
 
+    def _splits_total(self) -> int | str:
+        """
+        Number of splits, unknown while the document is still loading
+        """
+        if self.all_splits_loaded:
+            return len(self.splits)
+        return SPLITS_TOTAL_UNKNOWN
+
     async def _get_num_of_interesting_selectors(self) -> int | None:
         """
         If there are more than 1 split we need to handle the case
@@ -310,7 +327,8 @@ class AnnotationsScraper:
             f"Getting number of interesting selectors with query: {self.data.prompt}"
         )
         try:
-            model_response = chain.invoke({"question": self.data.prompt})
+            with time_llm_request(self.user_model.provider, self.data.model):
+                model_response = await chain.ainvoke({"question": self.data.prompt})
         except Exception as e:
             logger.error(
                 f"""Failed to get number of interesting selectors
@@ -329,7 +347,9 @@ class AnnotationsScraper:
 
         return num_of_selectors
 
-    async def _get_selector_from_split(self, split: str) -> ListOfTextQuoteSelector:
+    async def _get_selector_from_split(
+        self, split: str, index: int
+    ) -> ListOfTextQuoteSelector:
         # get llm
         llm = self.zero_temp_llm
         # get parser
@@ -368,25 +388,22 @@ class AnnotationsScraper:
         input_data = {
             "scraped_data": scraped_data,
             "prompt": self.data.prompt,
-            "split_index": self.splits.index(split) + 1,
-            "total": len(self.splits),
+            "split_index": index + 1,
+            "total": self._splits_total(),
         }
 
-        await pub_sub_manager.publish(
-            self.data.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.data.room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.user_model.provider} API",
-                    type="sent",
-                    data={
-                        "template": template,
-                        "input": input_data,
-                    },
-                    model=self.data.model,
-                ).model_dump(mode="json")
-            ),
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.data.room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.user_model.provider} API",
+                type="sent",
+                data={
+                    "template": template,
+                    "input": input_data,
+                },
+                model=self.data.model,
+            )
         )
         start = time()
 
@@ -401,7 +418,8 @@ class AnnotationsScraper:
             if not self.guard.is_alive():
                 break
             try:
-                chain_response = chain.invoke(input_data)
+                with time_llm_request(self.user_model.provider, self.data.model):
+                    chain_response = await chain.ainvoke(input_data)
                 logger.info(
                     f"""Selector created from scraped data
                     with query: {self.data.prompt}"""
@@ -415,27 +433,24 @@ class AnnotationsScraper:
                 )
                 logger.error(f"Error: {e}")
                 logger.info(f"Retrying again in {time_out} seconds...")
-                await pub_sub_manager.publish(
-                    self.data.room_id,
-                    json.dumps(
-                        APIInfoBroadcastData(
-                            room_id=self.data.room_id,
-                            date=datetime.now().isoformat(),
-                            api=f"Retry call: {self.user_model.provider} API",
-                            type="sent",
-                            data={
-                                "info": f"""Last call failed,
+                await publish_api_info(
+                    APIInfoBroadcastData(
+                        room_id=self.data.room_id,
+                        date=datetime.now().isoformat(),
+                        api=f"Retry call: {self.user_model.provider} API",
+                        type="sent",
+                        data={
+                            "info": f"""Last call failed,
                                 making another attempt
                                 {retries + 1}/{max_retries}""",
-                                "reason": str(e),
-                                "template": template,
-                                "input": input_data,
-                            },
-                            model=self.data.model,
-                        ).model_dump(mode="json")
-                    ),
+                            "reason": str(e),
+                            "template": template,
+                            "input": input_data,
+                        },
+                        model=self.data.model,
+                    )
                 )
-                sleep(time_out)
+                await asyncio.sleep(time_out)
             retries += 1
 
         elapsed_time = time() - start
@@ -444,21 +459,18 @@ class AnnotationsScraper:
         if not chain_response:
             return ListOfTextQuoteSelector(selectors=[])
 
-        await pub_sub_manager.publish(
-            self.data.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.data.room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.user_model.provider} API",
-                    type="recd",
-                    elapsed_time=elapsed_time,
-                    data={
-                        **chain_response.model_dump(mode="json"),
-                    },
-                    model=self.data.model,
-                ).model_dump(mode="json")
-            ),
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.data.room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.user_model.provider} API",
+                type="recd",
+                elapsed_time=elapsed_time,
+                data={
+                    **chain_response.model_dump(mode="json"),
+                },
+                model=self.data.model,
+            )
         )
 
         # making sure that AI gave only last
@@ -499,25 +511,22 @@ class AnnotationsScraper:
 
         logger.info(f"Creating annotation analysis with query: {self.data.prompt}")
 
-        await pub_sub_manager.publish(
-            self.data.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.data.room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.user_model.provider} API",
-                    type="sent",
-                    data={
-                        "template": ANNOTATION_ANALYZE_PROMPT_TEMPLATE,
-                        "input": {
-                            "question": question,
-                            "full_text": full_text,
-                            "annotated_text": annotated_text,
-                        },
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.data.room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.user_model.provider} API",
+                type="sent",
+                data={
+                    "template": ANNOTATION_ANALYZE_PROMPT_TEMPLATE,
+                    "input": {
+                        "question": question,
+                        "full_text": full_text,
+                        "annotated_text": annotated_text,
                     },
-                    model=self.data.model,
-                ).model_dump(mode="json")
-            ),
+                },
+                model=self.data.model,
+            )
         )
 
         start = time()
@@ -530,7 +539,8 @@ class AnnotationsScraper:
         }
 
         try:
-            chain_response = chain.invoke(input_data)
+            with time_llm_request(self.user_model.provider, self.data.model):
+                chain_response = await chain.ainvoke(input_data)
             logger.info(
                 f"""Annotation analysis created with query: {self.data.prompt}"""
             )
@@ -543,21 +553,18 @@ class AnnotationsScraper:
 
         elapsed_time = time() - start
 
-        await pub_sub_manager.publish(
-            self.data.room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=self.data.room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.user_model.provider} API",
-                    type="recd",
-                    elapsed_time=elapsed_time,
-                    data={
-                        "annotation_analysis": chain_response,
-                    },
-                    model=self.data.model,
-                ).model_dump(mode="json")
-            ),
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.data.room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.user_model.provider} API",
+                type="recd",
+                elapsed_time=elapsed_time,
+                data={
+                    "annotation_analysis": chain_response,
+                },
+                model=self.data.model,
+            )
         )
 
         return chain_response
@@ -579,53 +586,45 @@ class AnnotationsScraper:
 
         logger.info("Getting document title basing on first split")
 
-        await pub_sub_manager.publish(
-            self.data.room_id,
-            json.dumps(
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=self.data.room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.user_model.provider} API",
+                type="sent",
+                data={
+                    "info": "Getting document title basing on first split",
+                    "template": DOCUMENT_TITLE_PROMPT_TEMPLATE,
+                    "input": self.splits[0][:1024],
+                },
+                model=self.data.model,
+            )
+        )
+        try:
+            with time_llm_request(self.user_model.provider, self.data.model):
+                res = await chain.ainvoke({"input": self.splits[0][:1024]})
+            logger.info(f"Document title: {res}")
+            await publish_api_info(
                 APIInfoBroadcastData(
                     room_id=self.data.room_id,
                     date=datetime.now().isoformat(),
                     api=f"{self.user_model.provider} API",
-                    type="sent",
-                    data={
-                        "info": "Getting document title basing on first split",
-                        "template": DOCUMENT_TITLE_PROMPT_TEMPLATE,
-                        "input": self.splits[0][:1024],
-                    },
+                    type="recd",
+                    data=res,
                     model=self.data.model,
-                ).model_dump(mode="json")
-            ),
-        )
-        try:
-            res = chain.invoke({"input": self.splits[0][:1024]})
-            logger.info(f"Document title: {res}")
-            await pub_sub_manager.publish(
-                self.data.room_id,
-                json.dumps(
-                    APIInfoBroadcastData(
-                        room_id=self.data.room_id,
-                        date=datetime.now().isoformat(),
-                        api=f"{self.user_model.provider} API",
-                        type="recd",
-                        data=res,
-                        model=self.data.model,
-                    ).model_dump(mode="json")
-                ),
+                )
             )
             return res
         except Exception as e:
             logger.error(f"Failed to get document title: {e}")
-            await pub_sub_manager.publish(
-                self.data.room_id,
-                json.dumps(
-                    APIInfoBroadcastData(
-                        room_id=self.data.room_id,
-                        date=datetime.now().isoformat(),
-                        api=f"Error: {self.user_model.provider} API",
-                        type="recd",
-                        data={"error": str(e)},
-                        model=self.data.model,
-                    ).model_dump(mode="json")
-                ),
+            await publish_api_info(
+                APIInfoBroadcastData(
+                    room_id=self.data.room_id,
+                    date=datetime.now().isoformat(),
+                    api=f"Error: {self.user_model.provider} API",
+                    type="recd",
+                    data={"error": str(e)},
+                    model=self.data.model,
+                )
             )
             return self.DEFAULT_DOCUMENT_TITLE
@@ -14,6 +14,8 @@ class AuthConfig(BaseSettings):
     SECURE_COOKIES: bool = True
     SECRET_KEY: str = "secret"
 
+    AUTH_CONTEXT_CACHE_TTL: int = 30  # seconds
+
 
 @lru_cache()
 def get_settings():
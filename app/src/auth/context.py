@@ -0,0 +1,174 @@
+"""
+Authorization context of a user: the user, the admin flag and the
+organization memberships, loaded with two queries
+
+Contexts are cached in Redis for AUTH_CONTEXT_CACHE_TTL seconds and
+invalidated whenever organization memberships or the admin flag of a user
+change. The admin flag is only set when the user is created; changing it
+by other means takes effect once the cached context expires. The FastAPI
+dependencies resolve the context once per request.
+"""
+from logging import getLogger
+
+from fastapi import Depends
+from pydantic import BaseModel
+from redis.exceptions import RedisError
+from sqlalchemy import literal, select, union_all
+
+from src.auth.config import settings as auth_settings
+from src.auth.exceptions import UserNotFound
+from src.auth.jwt import parse_jwt_user_data, parse_jwt_user_data_optional
+from src.auth.schemas import JWTData, UserDBNoSecrets
+from src.database import OrganizationAdmin, OrganizationUser, User, database
+from src.redis_client import pub_sub_manager
+
+logger = getLogger(__name__)
+
+AUTH_CONTEXT_KEY_PREFIX = "auth:context"
+
+
+class AuthContext(BaseModel):
+    user: UserDBNoSecrets
+    organization_uuids: set[str] = set()
+    admin_organization_uuids: set[str] = set()
+
+    @property
+    def user_id(self) -> int:
+        return self.user.id
+
+    @property
+    def is_admin(self) -> bool:
+        return self.user.is_admin
+
+    def is_in_organization(self, organization_uuid: str | None) -> bool:
+        if not organization_uuid:
+            return True
+
+        # auth_user admin can do anything
+        return self.is_admin or str(organization_uuid) in self.organization_uuids
+
+    def is_organization_admin(self, organization_uuid: str) -> bool:
+        return (
+            self.is_in_organization(organization_uuid)
+            and str(organization_uuid) in self.admin_organization_uuids
+        )
+
+    def shares_organization_with(self, other: "AuthContext") -> bool:
+        """
+        Rooms are shared with all organizations of their owner, so users
+        share them when they have any organization in common, or when
+        neither of them is in an organization
+        """
+        if not self.organization_uuids and not other.organization_uuids:
+            return True
+        return not self.organization_uuids.isdisjoint(other.organization_uuids)
+
+
+def _get_key(user_id: int) -> str:
+    return f"{AUTH_CONTEXT_KEY_PREFIX}:{user_id}"
+
+
+async def load_auth_contexts(user_ids: list[int]) -> dict[int, AuthContext]:
+    users = await database.fetch_all(select(User).where(User.id.in_(user_ids)))
+    contexts = {
+        user["id"]: AuthContext(user=UserDBNoSecrets(**dict(user))) for user in users
+    }
+    if not contexts:
+        return contexts
+
+    memberships_query = union_all(
+        select(
+            OrganizationUser.auth_user_id,
+            OrganizationUser.organization_uuid,
+            literal(False).label("is_admin"),
+        ).where(OrganizationUser.auth_user_id.in_(list(contexts))),
+        select(
+            OrganizationAdmin.auth_user_id,
+            OrganizationAdmin.organization_uuid,
+            literal(True).label("is_admin"),
+        ).where(OrganizationAdmin.auth_user_id.in_(list(contexts))),
+    )
+    for membership in await database.fetch_all(memberships_query):
+        context = contexts[membership["auth_user_id"]]
+        organization_uuid = str(membership["organization_uuid"])
+        if membership["is_admin"]:
+            context.admin_organization_uuids.add(organization_uuid)
+        else:
+            context.organization_uuids.add(organization_uuid)
+
+    return contexts
+
+
+async def get_auth_contexts(*user_ids: int) -> dict[int, AuthContext]:
+    """
+    Authorization contexts by user id, from the cache or the database
+
+    Users that don't exist are missing from the result.
+    """
+    unique_ids = list(dict.fromkeys(user_ids))
+    contexts: dict[int, AuthContext] = {}
+    try:
+        redis = pub_sub_manager.get_connection()
+        cached = await redis.mget([_get_key(user_id) for user_id in unique_ids])
+        for user_id, value in zip(unique_ids, cached):
+            if value:
+                contexts[user_id] = AuthContext.model_validate_json(value)
+    except RedisError as e:
+        logger.error(f"Failed to read cached auth contexts: {e}")
+        redis = None
+
+    missing_ids = [user_id for user_id in unique_ids if user_id not in contexts]
+    if not missing_ids:
+        return contexts
+
+    loaded = await load_auth_contexts(missing_ids)
+    contexts.update(loaded)
+    if redis is not None and loaded:
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for user_id, context in loaded.items():
+                    pipe.set(
+                        _get_key(user_id),
+                        context.model_dump_json(),
+                        ex=auth_settings.AUTH_CONTEXT_CACHE_TTL,
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to cache auth contexts: {e}")
+
+    return contexts
+
+
+async def get_auth_context_by_user_id(user_id: int) -> AuthContext | None:
+    return (await get_auth_contexts(user_id)).get(user_id)
+
+
+async def invalidate_auth_contexts(user_ids: list[int]) -> None:
+    if not user_ids:
+        return
+
+    try:
+        await pub_sub_manager.get_connection().delete(
+            *[_get_key(user_id) for user_id in set(user_ids)]
+        )
+    except RedisError as e:
+        logger.error(f"Failed to invalidate auth contexts {user_ids}: {e}")
+
+
+async def get_auth_context(
+    jwt_data: JWTData = Depends(parse_jwt_user_data),
+) -> AuthContext:
+    context = await get_auth_context_by_user_id(jwt_data.user_id)
+    if not context:
+        raise UserNotFound()
+
+    return context
+
+
+async def get_auth_context_optional(
+    jwt_data: JWTData | None = Depends(parse_jwt_user_data_optional),
+) -> AuthContext | None:
+    if not jwt_data:
+        return None
+
+    return await get_auth_context_by_user_id(jwt_data.user_id)
@@ -4,11 +4,13 @@ from datetime import datetime, timedelta
 from databases.interfaces import Record
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import UUID4
-from sqlalchemy import insert, select, update
+from sqlalchemy import String, any_, bindparam, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import NoResultFound
 
 from src import utils
 from src.auth.config import settings as auth_settings
+from src.auth.context import invalidate_auth_contexts
 from src.auth.exceptions import InvalidCredentials, UserNotFound
 from src.auth.jwt import parse_jwt_user_data_optional
 from src.auth.schemas import AuthUser, JWTData, UserDB
@@ -58,7 +60,11 @@ async def get_or_create_user(user: dict, is_admin: bool = False) -> Record | Non
         .returning(User)
     )
 
-    return await database.fetch_one(insert_query)
+    created_user = await database.fetch_one(insert_query)
+    if created_user:
+        # the admin flag is set here, drop any context cached under the id
+        await invalidate_auth_contexts([created_user["id"]])
+    return created_user
 
 
 async def get_users_from_db() -> dict:
@@ -86,6 +92,22 @@ async def get_user_by_email(email: str) -> Record | None:
     return await database.fetch_one(select_query)
 
 
+async def get_user_ids_by_emails(emails: list[str]) -> dict[str, int]:
+    if not emails:
+        return {}
+
+    # the oldest user of an email, as get_user_by_email would usually return
+    select_query = (
+        select(User.email, User.id)
+        .where(User.email == any_(bindparam("emails", emails, ARRAY(String))))
+        .distinct(User.email)
+        .order_by(User.email, User.id)
+    )
+    users = await database.fetch_all(select_query)
+
+    return {user["email"]: user["id"] for user in users}
+
+
 async def create_refresh_token(
     *, user_id: int, refresh_token: str | None = None
 ) -> str:
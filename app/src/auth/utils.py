@@ -4,6 +4,7 @@ import httpx
 
 from src.auth.config import settings as auth_settings
 from src.config import get_settings
+from src.tracing import trace_http_request
 
 settings = get_settings()
 
@@ -38,6 +39,7 @@ def fetch_user_info(access_token: str):
             "Accept": "application/json",
         }
         params = {"access_token": access_token}
-        response = client.get(url, headers=headers, params=params)
+        with trace_http_request("GET", url):
+            response = client.get(url, headers=headers, params=params)
 
         return response.json()
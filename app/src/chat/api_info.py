@@ -0,0 +1,150 @@
+"""
+API debug stream of a room
+
+APIInfoBroadcastData events carry whole prompts, scraped documents and
+optimized files. They are published on the room's own api-info channel, and
+only while a client listens to it (PUBSUB NUMSUB, checked at most every
+API_INFO_LISTENERS_CHECK_INTERVAL per room and process).
+
+Long strings and lists in the event data are truncated before publishing.
+When API_INFO_STREAM_MAXLEN is set, the full events are also kept in a
+capped Redis Stream per room, and the published event carries the stream id,
+so clients fetch the full body only when they need it.
+"""
+import time
+from logging import getLogger
+from typing import Any
+
+from redis.exceptions import RedisError
+
+from src.chat.schemas import APIInfoBroadcastData
+from src.config import settings
+from src.constants import Environment
+from src.metrics import observe_redis_publish
+from src.redis_client import pub_sub_manager
+
+logger = getLogger(__name__)
+
+API_INFO_PREFIX = "api-info"
+TRUNCATION_MARK = "…"
+# bounds the listener checks cache, it is cleared when full
+MAX_CHECKED_ROOMS = 1024
+
+# room id -> (checked at, has listeners)
+_listeners_checks: dict[str, tuple[float, bool]] = {}
+
+
+def api_info_channel(room_id: str) -> str:
+    return f"{API_INFO_PREFIX}:{room_id}"
+
+
+def api_info_stream_key(room_id: str) -> str:
+    return f"{API_INFO_PREFIX}:stream:{room_id}"
+
+
+def truncate_data(value: Any) -> tuple[Any, bool]:
+    """
+    Value with its long strings and lists cut, and whether anything was cut
+    """
+    if isinstance(value, str):
+        if len(value) <= settings.API_INFO_MAX_FIELD_LENGTH:
+            return value, False
+        return value[: settings.API_INFO_MAX_FIELD_LENGTH] + TRUNCATION_MARK, True
+
+    if isinstance(value, dict):
+        truncated = False
+        result = {}
+        for key, item in value.items():
+            result[key], item_truncated = truncate_data(item)
+            truncated = truncated or item_truncated
+        return result, truncated
+
+    if isinstance(value, (list, tuple)):
+        truncated = len(value) > settings.API_INFO_MAX_ITEMS
+        items = []
+        for item in value[: settings.API_INFO_MAX_ITEMS]:
+            item, item_truncated = truncate_data(item)
+            items.append(item)
+            truncated = truncated or item_truncated
+        return items, truncated
+
+    return value, False
+
+
+async def has_api_info_listeners(room_id: str | None) -> bool:
+    if not room_id or settings.ENVIRONMENT == Environment.DEBUG:
+        return False
+
+    now = time.monotonic()
+    checked = _listeners_checks.get(room_id)
+    if checked and now - checked[0] < settings.API_INFO_LISTENERS_CHECK_INTERVAL:
+        return checked[1]
+
+    try:
+        [(_, count)] = await pub_sub_manager.get_connection().pubsub_numsub(
+            api_info_channel(room_id)
+        )
+    except RedisError as e:
+        logger.error(f"Failed to check API info listeners of room {room_id}: {e}")
+        return False
+
+    if len(_listeners_checks) >= MAX_CHECKED_ROOMS:
+        _listeners_checks.clear()
+    _listeners_checks[room_id] = (now, count > 0)
+    return count > 0
+
+
+async def publish_api_info(
+    info: APIInfoBroadcastData, exclude: set[str] | None = None
+) -> None:
+    """
+    Publishes the event on the api-info channel of its room, if anyone listens
+    """
+    if not await has_api_info_listeners(info.room_id):
+        return
+
+    redis = pub_sub_manager.get_connection()
+    try:
+        event_id = None
+        if settings.API_INFO_STREAM_MAXLEN:
+            stream_key = api_info_stream_key(info.room_id)
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.xadd(
+                    stream_key,
+                    {"event": info.model_dump_json(exclude=exclude)},
+                    maxlen=settings.API_INFO_STREAM_MAXLEN,
+                    approximate=True,
+                )
+                pipe.expire(stream_key, settings.API_INFO_STREAM_TTL)
+                event_id, _ = await pipe.execute()
+
+        data, truncated = truncate_data(info.data)
+        message = info.model_copy(
+            update={"data": data, "truncated": truncated, "event_id": event_id}
+        )
+        channel = api_info_channel(info.room_id)
+        payload = message.model_dump_json(exclude=exclude)
+        await redis.publish(channel, payload)
+        observe_redis_publish(channel, payload)
+    except RedisError as e:
+        logger.error(f"Failed to publish API info of room {info.room_id}: {e}")
+
+
+async def get_api_info_event(room_id: str, event_id: str) -> str | None:
+    """
+    Full event kept in the room's stream, as JSON
+    """
+    try:
+        entries = await pub_sub_manager.get_connection().xrange(
+            api_info_stream_key(room_id), min=event_id, max=event_id, count=1
+        )
+    except RedisError as e:
+        # also raised for ids that are not stream ids
+        logger.warning(f"Failed to read API info {event_id} of room {room_id}: {e}")
+        return None
+
+    if not entries:
+        return None
+
+    _, fields = entries[0]
+    return fields["event"]
@@ -1,19 +1,14 @@
-import json
 import logging
 import time
-from asyncio import get_event_loop
+from asyncio import Semaphore, gather, shield
 from concurrent.futures import CancelledError
 from datetime import datetime
-from functools import lru_cache
-from typing import Optional
+from uuid import uuid4
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_anthropic import ChatAnthropic
+from celery.result import AsyncResult
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableWithMessageHistory
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
 from openai import AsyncClient, Client
 from openai.types.chat import (
     ChatCompletionAssistantMessageParam,
@@ -22,12 +17,13 @@ from openai.types.chat import (
     ChatCompletionToolMessageParam,
     ChatCompletionUserMessageParam,
 )
-from pydantic.v1 import SecretStr
 
 from src.annotations.messaging import create_message_for_ai_history
 from src.auth.schemas import UserDB
+from src.chat.api_info import publish_api_info
 from src.chat.config import settings as chat_settings
 from src.chat.constants import (
+    BOT_ANSWER_JOB,
     FILE_PATTERN,
     MAIN_SYSTEM_PROMPT,
     MODEL_NAME,
@@ -37,6 +33,7 @@ from src.chat.constants import (
     VALUABLE_PAGE_CONTENT_PROMPT,
 )
 from src.chat.content_cleaner import clean_html_input
+from src.chat.generation import GenerationSession, generation_registry
 from src.chat.redis_history import get_message_history
 from src.chat.schemas import (
     APIInfoBroadcastData,
@@ -52,18 +49,25 @@ from src.chat.service import (
     update_message_in_db,
     update_room_in_db,
 )
-from src.database import database
+from src.config import settings
+from src.constants import TaskRunner
+from src.jobs.queue import cancel_job, enqueue_job
+from src.latency.service import create_message_generation_in_db
+from src.latency.timer import GenerationTimer
 from src.listener.constants import (
     bot_message_creation_finished_info,
-    listener_room_name,
     optimizing_user_file_content_info,
     room_changed_info,
     user_file_updated_info,
 )
 from src.listener.schemas import WSEventMessage
+from src.listener.topics import publish_room_event
+from src.metrics import time_llm_request
 from src.redis_client import pub_sub_manager
 from src.scraping.downloaders import download_and_extract_content_from_url
 from src.tasks import celery_app
+from src.tokenizer.splitter import split_text
+from src.tokenizer.tiktoken import count_content_tokens
 from src.user_files.constants import UserFileSourceType
 from src.user_files.schemas import NewUserFileContent, UserFileDB
 from src.user_files.service import (
@@ -71,33 +75,30 @@ from src.user_files.service import (
     get_specific_user_file_from_db,
     optimize_file_content_in_db,
 )
-from src.user_models.constants import KNOWN_CONTEXT_WINDOWS, NON_STREAMABLE_MODELS
+from src.user_models.clients import (
+    get_chat_model,
+    get_default_chat_model,
+    get_openai_clients,
+)
+from src.user_models.constants import NON_STREAMABLE_MODELS
 from src.user_models.schemas import UserModelOut
-from src.user_models.service import decrypt_api_key, get_model_by_uuid
+from src.user_models.service import get_model_by_uuid
+from src.worker import worker_runtime
 
 logger = logging.getLogger(__name__)
 
 
 class BotAI:
-    _instance: Optional["BotAI"] = None
-
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
-
     def __init__(self, user_id: int = 0, room_id: str = "0"):
         self.user_id: int = user_id
         self.room_id: str = room_id
 
-        self.async_client: AsyncClient = AsyncClient(api_key=chat_settings.CHATGPT_KEY)
-        self.client: Client = Client(api_key=chat_settings.CHATGPT_KEY)
+        self.async_client: AsyncClient
+        self.client: Client
+        self.async_client, self.client = get_openai_clients()
 
-        self.stop_generation_flag = False  # Flag to control generation process
-        self.llm_model = ChatOpenAI(  # type: ignore
-            model=MODEL_NAME,
-            openai_api_key=chat_settings.CHATGPT_KEY,
-        )
+        self.llm_model = get_default_chat_model(MODEL_NAME)
+        self.provider = "openai"
         self.selected_model = MODEL_NAME
 
     async def set_llm_model(
@@ -118,36 +119,19 @@ class BotAI:
 
         self.selected_model = selected_model or MODEL_NAME
         user_model: UserModelOut = UserModelOut(**dict(user_model_db))
+        model = selected_model or user_model.defaultSelected
 
-        if user_model.provider.lower() == "openai":
-            logger.info(
-                "Setting OpenAI model %s", selected_model or user_model.defaultSelected
-            )
-            self.llm_model = ChatOpenAI(  # type: ignore
-                model=selected_model or user_model.defaultSelected,
-                openai_api_key=decrypt_api_key(user_model.api_key),
-                temperature=1,
-            )
-            return
-        if user_model.provider.lower() == "claude":
-            logger.info(
-                "Setting ClaudeAI model %s",
-                selected_model or user_model.defaultSelected,
-            )
-            self.llm_model = ChatAnthropic(  # type: ignore
-                model=selected_model or user_model.defaultSelected,
-                api_key=SecretStr(decrypt_api_key(user_model.api_key)),
-            )
-            return
-        if user_model.provider.lower() == "groq":
-            logger.info(
-                "Setting Groq model %s", selected_model or user_model.defaultSelected
-            )
-            self.llm_model = ChatGroq(  # type: ignore
-                model_name=selected_model or user_model.defaultSelected,
-                groq_api_key=decrypt_api_key(user_model.api_key),
-            )
-            return
+        logger.info("Setting %s model %s", user_model.provider, model)
+        llm_model = get_chat_model(
+            user_model.provider,
+            model,
+            user_model.api_key,
+            # OpenAI models were always run with temperature 1
+            temperature=1 if user_model.provider.lower() == "openai" else None,
+        )
+        if llm_model:
+            self.llm_model = llm_model
+            self.provider = user_model.provider
 
     async def type_cast(
         self, message: MessageDB, user_id: int, room_id: str
@@ -236,7 +220,16 @@ class BotAI:
 
         return messages
 
-    async def stream_bot_response(self, input_message: str, user_id: int, room_id: str):
+    async def stream_bot_response(
+        self,
+        input_message: str,
+        user_id: int,
+        room_id: str,
+        timer: GenerationTimer | None = None,
+    ):
+        """
+        Chunks of the answer, marked on `timer` as they come from the model
+        """
         logger.info("Starting bot response streaming")
         messages_history = await self.load_messages_history(user_id, room_id)
         db_room = await get_room_by_id_from_db(room_id)
@@ -277,21 +270,30 @@ class BotAI:
 
         if self.selected_model not in NON_STREAMABLE_MODELS:
             try:
-                async for chunk in with_message_history.astream(
-                    {"input": input_message},
-                    config={"configurable": {"session_id": str(room_id)}},
-                ):
-                    yield chunk
+                with time_llm_request(self.provider, self.selected_model) as llm_timer:
+                    if timer:
+                        timer.llm = llm_timer
+                    async for chunk in with_message_history.astream(
+                        {"input": input_message},
+                        config={"configurable": {"session_id": str(room_id)}},
+                    ):
+                        llm_timer.chunk()
+                        yield chunk
             except Exception as exc:
                 logger.error(f"Error while streaming bot response: {exc}")
                 yield str(exc)
         else:
             try:
                 start_time = time.time()
-                output = await with_message_history.ainvoke(
-                    {"input": input_message},
-                    config={"configurable": {"session_id": str(room_id)}},
-                )
+                with time_llm_request(self.provider, self.selected_model) as llm_timer:
+                    if timer:
+                        timer.llm = llm_timer
+                    output = await with_message_history.ainvoke(
+                        {"input": input_message},
+                        config={"configurable": {"session_id": str(room_id)}},
+                    )
+                    # the whole answer comes as a single chunk
+                    llm_timer.chunk()
                 elapsed_time = time.time() - start_time
                 yield f"""**I was thinking about your question for {elapsed_time:.2f} seconds.**  
                 {output}"""
@@ -336,49 +338,44 @@ class BotAI:
     async def update_chat_title(self, input_message: str, room_id: str, user_id: int):
         start_time = time.time()
         # show sent message in the room
-        await pub_sub_manager.publish(
-            room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="sent",
-                    data={
-                        "type": "update-room-title",
-                        "template": TITLE_PROMPT,
-                        "input": {
-                            "query": input_message,
-                        },
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="sent",
+                data={
+                    "type": "update-room-title",
+                    "template": TITLE_PROMPT,
+                    "input": {
+                        "query": input_message,
                     },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+                },
+                model=self.selected_model,
+            )
         )
 
         name: str | None = await self.get_title_from_content(input_message)
 
         # show log message for user
-        await pub_sub_manager.publish(
-            room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="recd",
-                    elapsed_time=time.time() - start_time,
-                    data={
-                        "type": "update-room-title",
-                        "recd_name": name,
-                    },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="recd",
+                elapsed_time=time.time() - start_time,
+                data={
+                    "type": "update-room-title",
+                    "recd_name": name,
+                },
+                model=self.selected_model,
+            )
         )
 
+        room = None
         if name:
-            await update_room_in_db(
+            room = await update_room_in_db(
                 RoomUpdateInputDetails(
                     room_id=room_id,
                     user_id=user_id,
@@ -387,15 +384,12 @@ class BotAI:
                 update_share=False,
                 update_visibility=False,
             )
-        await pub_sub_manager.publish(
-            listener_room_name,
-            json.dumps(
-                WSEventMessage(
-                    type=room_changed_info,
-                    id=room_id,
-                    source="update-room-title",
-                ).model_dump(mode="json")
+        await publish_room_event(
+            room_id,
+            WSEventMessage(
+                type=room_changed_info, id=room_id, source="update-room-title"
             ),
+            room,
         )
 
     @staticmethod
@@ -528,7 +522,11 @@ class BotAI:
         )
 
     async def create_bot_answer(
-        self, data_dict: dict, room_id: str, user_db_input: dict
+        self,
+        data_dict: dict,
+        room_id: str,
+        user_db_input: dict,
+        session: GenerationSession | None = None,
     ) -> str | None:
         user_db = UserDB(**user_db_input)
         raw_content = data_dict["content"]
@@ -539,26 +537,22 @@ class BotAI:
             logger.info(f"File pattern found in content: {raw_content}")
             await pub_sub_manager.publish(
                 room_id,
-                json.dumps(
-                    WSEventMessage(
-                        type=optimizing_user_file_content_info,
-                        id=room_id,
-                        source="update-user-file-content",
-                    ).model_dump(mode="json")
-                ),
+                WSEventMessage(
+                    type=optimizing_user_file_content_info,
+                    id=room_id,
+                    source="update-user-file-content",
+                ).model_dump_json(),
             )
             raw_content = await self.get_updated_file_content(
                 raw_content, room_id, user_db.id
             )
             await pub_sub_manager.publish(
                 room_id,
-                json.dumps(
-                    WSEventMessage(
-                        type=user_file_updated_info,
-                        id=room_id,
-                        source="update-user-file-content",
-                    ).model_dump(mode="json")
-                ),
+                WSEventMessage(
+                    type=user_file_updated_info,
+                    id=room_id,
+                    source="update-user-file-content",
+                ).model_dump_json(),
             )
 
         # clean input html
@@ -569,43 +563,40 @@ class BotAI:
         bot_content: MessageDetails | None = None
         bot_answer = ""
         start_time = time.time()  # Record the start time
+        timer = GenerationTimer()
+        saved = True
 
         # show sent message in the room
-        await pub_sub_manager.publish(
-            room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="sent",
-                    data={
-                        "template": MAIN_SYSTEM_PROMPT,
-                        "input": {
-                            "query": content,
-                        },
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="sent",
+                data={
+                    "template": MAIN_SYSTEM_PROMPT,
+                    "input": {
+                        "query": content,
                     },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+                },
+                model=self.selected_model,
+            )
         )
-        try:
-            async for message in self.stream_bot_response(content, user_db.id, room_id):
-                if self.stop_generation_flag:
-                    # Check the flag before processing each message
-                    break
 
+        async def _stream_answer() -> None:
+            nonlocal message_uuid, bot_content, bot_answer, saved
+            async for message in self.stream_bot_response(
+                content, user_db.id, room_id, timer
+            ):
                 bot_answer += message
                 await pub_sub_manager.publish(
                     room_id,
-                    json.dumps(
-                        BroadcastData(
-                            type="message",
-                            message=message,
-                            room_id=room_id,
-                            created_by="bot",
-                        ).model_dump(mode="json")
-                    ),
+                    BroadcastData(
+                        type="message",
+                        message=message,
+                        room_id=room_id,
+                        created_by="bot",
+                    ).model_dump_json(),
                 )
 
                 # create bot message in db
@@ -619,67 +610,101 @@ class BotAI:
                     user_id=user_db.id,
                     elapsed_time=time.time() - start_time,
                 )
+                # a stop request must not interrupt the write itself
                 if not message_uuid:
-                    db_mess = await create_message_in_db(bot_content)
+                    db_mess = await shield(create_message_in_db(bot_content))
                     if not db_mess:
-                        return None
+                        saved = False
+                        return
                     message_uuid = str(db_mess["uuid"])
                 else:
-                    await update_message_in_db(message_uuid, bot_content)
+                    await shield(update_message_in_db(message_uuid, bot_content))
+
+        try:
+            if session:
+                # stops at the pending chunk as soon as the session is cancelled
+                await session.run(_stream_answer())
+            else:
+                await _stream_answer()
+            if not saved:
+                return None
         except Exception as e:
             # Log any exceptions
             logger.error(f"An error occurred in create_bot_answer: {e}")
 
         elapsed_time = time.time() - start_time
+        if message_uuid:
+            await self.save_generation_stats(
+                timer, message_uuid, bot_answer, room_id, user_db.id
+            )
+
         # show log message for user
-        await pub_sub_manager.publish(
-            room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id,
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="recd",
-                    elapsed_time=elapsed_time,
-                    data=bot_content.model_dump(
-                        exclude={"sender_picture", "content_html", "content_dict"},
-                        mode="json",
-                    )
-                    if bot_content
-                    else {},
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id,
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="recd",
+                elapsed_time=elapsed_time,
+                data=bot_content.model_dump(
+                    exclude={"sender_picture", "content_html", "content_dict"},
+                    mode="json",
+                )
+                if bot_content
+                else {},
+                model=self.selected_model,
+            )
         )
         logger.info(f"Chat response time: {elapsed_time} seconds")
 
-        creation_finished_info = json.dumps(
-            BroadcastData(
-                type=bot_message_creation_finished_info,
-                message="",
-                room_id=room_id,
-                created_by="bot",
-            ).model_dump(mode="json")
-        )
+        creation_finished_info = BroadcastData(
+            type=bot_message_creation_finished_info,
+            message="",
+            room_id=room_id,
+            created_by="bot",
+        ).model_dump_json()
         logger.info(
             "Sending message '%s' to the room %s", creation_finished_info, room_id
         )
         await pub_sub_manager.publish(room_id, creation_finished_info)
         logger.info("Message sent to the room %s", room_id)
 
-        await pub_sub_manager.publish(
-            listener_room_name,
-            json.dumps(
-                WSEventMessage(
-                    type=bot_message_creation_finished_info,
-                    id=room_id,
-                    source="bot-message-creation-finished",
-                ).model_dump(mode="json")
+        await publish_room_event(
+            room_id,
+            WSEventMessage(
+                type=bot_message_creation_finished_info,
+                id=room_id,
+                source="bot-message-creation-finished",
             ),
         )
 
         return bot_answer
 
+    async def save_generation_stats(
+        self,
+        timer: GenerationTimer,
+        message_uuid: str,
+        bot_answer: str,
+        room_id: str,
+        user_id: int,
+    ) -> None:
+        generation = timer.get_input(
+            message_uuid=message_uuid,
+            room_id=room_id,
+            user_id=user_id,
+            provider=self.provider,
+            model=self.selected_model,
+            tokens=count_content_tokens(bot_answer),
+        )
+        if not generation:
+            return
+
+        try:
+            await create_message_generation_in_db(generation)
+        except Exception as e:
+            # the stats must never fail the answer
+            logger.error(f"Failed to save generation stats of {message_uuid}: {e}")
+
     async def optimize_content(
         self, content: str | None, room_id: str | None, user_id: int | None
     ) -> str | None:
@@ -687,63 +712,60 @@ class BotAI:
             return None
 
         start = time.time()
-        await pub_sub_manager.publish(
-            room_id or "",
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id or "",
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="sent",
-                    data={
-                        "template": OPTIMIZE_CONTENT_PROMPT,
-                        "input": {
-                            "query": content,
-                        },
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id or "",
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="sent",
+                data={
+                    "template": OPTIMIZE_CONTENT_PROMPT,
+                    "input": {
+                        "query": content,
                     },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+                },
+                model=self.selected_model,
+            )
         )
         logger.info("Content: %s", content)
 
-        splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=KNOWN_CONTEXT_WINDOWS.get(self.selected_model, 4096),
-            chunk_overlap=0,
-        )
-        splits: list[str] = splitter.split_text(content)
-        optimized_content: str | None = None
-        for index, split in enumerate(splits):
-            logger.info("Processing split %s out of %s", index + 1, len(splits))
-            bot_response = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": OPTIMIZE_CONTENT_PROMPT},
-                    {"role": "user", "content": split},
-                ],
-                user=str(user_id or 0),
+        splits: list[str] = split_text(content, self.selected_model)
+        semaphore = Semaphore(chat_settings.OPTIMIZE_CONTENT_CONCURRENCY)
+
+        async def _optimize_split(index: int, split: str) -> str | None:
+            async with semaphore:
+                logger.info("Processing split %s out of %s", index + 1, len(splits))
+                with time_llm_request("openai", MODEL_NAME):
+                    bot_response = await self.async_client.chat.completions.create(
+                        model=MODEL_NAME,
+                        messages=[
+                            {"role": "system", "content": OPTIMIZE_CONTENT_PROMPT},
+                            {"role": "user", "content": split},
+                        ],
+                        user=str(user_id or 0),
+                    )
+                return bot_response.choices[0].message.content
+
+        # splits are optimized concurrently, the results keep the split order
+        optimized_splits = await gather(
+            *[_optimize_split(index, split) for index, split in enumerate(splits)]
+        )
+        optimized_content: str | None = (
+            "".join([split for split in optimized_splits if split]) or None
+        )
+
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id or "",
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="recd",
+                elapsed_time=time.time() - start,
+                data={
+                    "recd_optimized_content": optimized_content,
+                },
+                model=self.selected_model,
             )
-            if optimized_content and bot_response.choices[0].message.content:
-                optimized_content += bot_response.choices[0].message.content
-                continue
-
-            optimized_content = bot_response.choices[0].message.content
-
-        await pub_sub_manager.publish(
-            room_id or "",
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id or "",
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="recd",
-                    elapsed_time=time.time() - start,
-                    data={
-                        "recd_optimized_content": optimized_content,
-                    },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
         )
 
         return optimized_content
@@ -752,50 +774,45 @@ class BotAI:
         self, url: str, room_id: str | None = None, user_id: int | None = None
     ) -> str | None:
         start = time.time()
-        await pub_sub_manager.publish(
-            room_id or "",
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id or "",
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="sent",
-                    data={
-                        "template": TITLE_FROM_URL_PROMPT,
-                        "input": {
-                            "query": url,
-                        },
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id or "",
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="sent",
+                data={
+                    "template": TITLE_FROM_URL_PROMPT,
+                    "input": {
+                        "query": url,
                     },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+                },
+                model=self.selected_model,
+            )
         )
 
-        bot_response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": TITLE_FROM_URL_PROMPT},
-                {"role": "user", "content": url},
-            ],
-            user=str(user_id or 0),
-        )
+        with time_llm_request("openai", MODEL_NAME):
+            bot_response = self.client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": TITLE_FROM_URL_PROMPT},
+                    {"role": "user", "content": url},
+                ],
+                user=str(user_id or 0),
+            )
         title: str | None = bot_response.choices[0].message.content
 
-        await pub_sub_manager.publish(
-            room_id or "",
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id or "",
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="recd",
-                    elapsed_time=time.time() - start,
-                    data={
-                        "recd_title": title,
-                    },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id or "",
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="recd",
+                elapsed_time=time.time() - start,
+                data={
+                    "recd_title": title,
+                },
+                model=self.selected_model,
+            )
         )
 
         return title
@@ -810,7 +827,8 @@ class BotAI:
         chain = prompt | llm | parser
 
         try:
-            return chain.invoke({"input": content})
+            with time_llm_request(self.provider, self.selected_model):
+                return chain.invoke({"input": content})
         except Exception as e:
             logger.error(f"An error occurred in get_title_from_content: {e}")
             return None
@@ -819,78 +837,132 @@ class BotAI:
         self, content: str, room_id: str | None, user_id: int | None
     ) -> str | None:
         start = time.time()
-        await pub_sub_manager.publish(
-            room_id or "",
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id or "",
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="sent",
-                    data={
-                        "template": VALUABLE_PAGE_CONTENT_PROMPT,
-                        "input": {
-                            "query": content,
-                        },
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id or "",
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="sent",
+                data={
+                    "template": VALUABLE_PAGE_CONTENT_PROMPT,
+                    "input": {
+                        "query": content,
                     },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+                },
+                model=self.selected_model,
+            )
         )
 
-        bot_response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": VALUABLE_PAGE_CONTENT_PROMPT},
-                {"role": "user", "content": content},
-            ],
-            user=str(user_id or "0"),
-            temperature=0.0,
-        )
+        with time_llm_request("openai", MODEL_NAME):
+            bot_response = self.client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": VALUABLE_PAGE_CONTENT_PROMPT},
+                    {"role": "user", "content": content},
+                ],
+                user=str(user_id or "0"),
+                temperature=0.0,
+            )
         valuable_content: str | None = bot_response.choices[0].message.content
 
-        await pub_sub_manager.publish(
-            room_id or "",
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id or "",
-                    date=datetime.now().isoformat(),
-                    api=f"{self.selected_model} API",
-                    type="recd",
-                    elapsed_time=time.time() - start,
-                    data={
-                        "recd_valuable_content": valuable_content,
-                    },
-                    model=self.selected_model,
-                ).model_dump(mode="json")
-            ),
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id or "",
+                date=datetime.now().isoformat(),
+                api=f"{self.selected_model} API",
+                type="recd",
+                elapsed_time=time.time() - start,
+                data={
+                    "recd_valuable_content": valuable_content,
+                },
+                model=self.selected_model,
+            )
         )
 
         return valuable_content
 
 
+async def _create_bot_answer(
+    data_dict: dict, room_id: str, user_db: dict, generation_id: str | None = None
+):
+    bot = BotAI(user_id=user_db["id"], room_id=room_id)
+    await bot.set_llm_model(
+        user_model_uuid=data_dict.get("user_model_uuid"),
+        selected_model=data_dict.get("selectedModel"),
+    )
+    async with generation_registry.open(
+        generation_id or uuid4().hex, room_id, bot
+    ) as session:
+        return await bot.create_bot_answer(
+            data_dict=data_dict, room_id=room_id, user_db_input=user_db, session=session
+        )
+
+
+async def create_bot_answer_job(payload: dict):
+    return await _create_bot_answer(**payload)
+
+
+async def schedule_bot_answer(data_dict: dict, room_id: str, user_db: UserDB) -> str:
+    """
+    Run the bot answer with the configured task runner and return the task id
+
+    The task id is also the id of the generation session of the answer.
+    """
+    generation_id = uuid4().hex
+    if settings.TASK_RUNNER == TaskRunner.ASYNCIO:
+        return await enqueue_job(
+            BOT_ANSWER_JOB,
+            {
+                "data_dict": data_dict,
+                "room_id": room_id,
+                "user_db": user_db.model_dump(mode="json"),
+                "generation_id": generation_id,
+            },
+            job_id=generation_id,
+        )
+
+    result = create_bot_answer_task.apply_async(
+        args=[data_dict, room_id, user_db.model_dump(), generation_id],
+        task_id=generation_id,
+        countdown=0,
+    )
+    return result.task_id
+
+
+async def cancel_bot_answer(task_id: str | None, room_id: str) -> None:
+    """
+    Stop the generation of the given task, or of every answer in the room
+    """
+    if not task_id:
+        await generation_registry.request_cancel(room_id=room_id)
+        return
+
+    await generation_registry.request_cancel(generation_id=task_id)
+    # make sure a task which is still queued doesn't start
+    if settings.TASK_RUNNER == TaskRunner.ASYNCIO:
+        await cancel_job(task_id)
+        return
+
+    AsyncResult(task_id, app=celery_app).revoke()
+
+
 @celery_app.task
-def create_bot_answer_task(data_dict: dict, room_id: str, user_db: dict):
+def create_bot_answer_task(
+    data_dict: dict, room_id: str, user_db: dict, generation_id: str | None = None
+):
     logger.info("Data dict: %s", data_dict)
     logger.info("Room id: %s", room_id)
     logger.info("User db: %s", user_db)
     try:
-        loop = get_event_loop()
-        loop.run_until_complete(database.connect())
-        logger.info("Connected to database")
-        loop.run_until_complete(
-            bot_ai.set_llm_model(
-                user_model_uuid=data_dict.get("user_model_uuid"),
-                selected_model=data_dict.get("selectedModel"),
-            )
-        )
-        bot_answer = loop.run_until_complete(
-            bot_ai.create_bot_answer(
-                data_dict=data_dict, room_id=room_id, user_db_input=user_db
-            )
+        bot_answer = worker_runtime.run(
+            _create_bot_answer(
+                data_dict=data_dict,
+                room_id=room_id,
+                user_db=user_db,
+                generation_id=generation_id,
+            ),
+            name="create_bot_answer_task",
         )
-        logger.info("Got users from database")
-        loop.run_until_complete(database.disconnect())
         return {
             "status": "OK",
             "bot_answer": bot_answer,
@@ -900,9 +972,14 @@ def create_bot_answer_task(data_dict: dict, room_id: str, user_db: dict):
         return {"status": "Stopped"}
 
 
-@lru_cache()
 def get_bot_ai() -> BotAI:
+    """
+    BotAI with the default model, for helpers outside of a chat answer
+
+    Built per call rather than at import, so its clients come from the pool
+    of the running event loop.
+    """
     return BotAI()
 
 
-bot_ai: BotAI = get_bot_ai()
+worker_runtime.add_shutdown_callback(generation_registry.close)
@@ -8,6 +8,8 @@ class ChatConfig(BaseSettings):
     CLAUDE_KEY: str = ""
     GROQ_KEY: str = ""
 
+    OPTIMIZE_CONTENT_CONCURRENCY: int = 4
+
 
 @lru_cache()
 def get_settings():
@@ -4,6 +4,7 @@ class ErrorCode:
     ROOM_IS_NOT_SHARED = "Room is not shared for you"
     NOT_SAME_ORGANIZATIONS = "You are from different organization"
     ROOM_CANNOT_BE_CREATED = "Room cannot be created"
+    API_INFO_EVENT_DOES_NOT_EXIST = "API info event with this id does not exist!"
 
 
 MODEL_NAME = "gpt-4o-2024-05-13"
@@ -63,3 +64,9 @@ Output: Only information strictly connected to "How to make a cake" and nothing
 FILE_PATTERN = "<<file:"
 MAX_TOKENS = 15900
 DEFAULT_ROOM_NAME = "New Chat"
+BOT_ANSWER_JOB = "create_bot_answer"
+GENERATION_CANCEL_CHANNEL = "generation:cancel"
+
+
+def get_generation_cancelled_key(generation_id: str) -> str:
+    return f"generation:cancelled:{generation_id}"
@@ -20,3 +20,7 @@ class NotTheSameOrganizations(BadRequest):
 
 class RoomCannotBeCreated(BadRequest):
     DETAIL = ErrorCode.ROOM_CANNOT_BE_CREATED
+
+
+class APIInfoEventDoesNotExist(NotFound):
+    DETAIL = ErrorCode.API_INFO_EVENT_DOES_NOT_EXIST
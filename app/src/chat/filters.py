@@ -55,7 +55,7 @@ async def get_query_filtered_by_visibility(
         case VisibilityChoices.ORGANIZATION:
             query = get_organization_rooms_query(organization_uuid)
         case None:
-            query = await get_user_and_organization_rooms_query(user_id)
+            query = get_user_and_organization_rooms_query(user_id)
 
     if message_content_ilike:
         query = query.join(Message, Message.room_id == Room.uuid)
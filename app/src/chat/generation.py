@@ -0,0 +1,212 @@
+"""
+Bot answer generation sessions
+
+Every bot answer runs in its own session, holding the BotAI with the model
+selected for it, the room and a cancellation token. Sessions are kept in a
+per-process registry keyed by the generation id (the Celery task id or the
+job id) and by room. Stop requests are published on a Redis channel, so
+the process running the generation cancels only the matching session. A
+stop for a generation id is also kept in a short-lived key, checked once
+the session is listening, so a stop sent before the generation started is
+not lost.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Coroutine
+
+from src.chat.constants import GENERATION_CANCEL_CHANNEL, get_generation_cancelled_key
+from src.config import settings
+from src.redis_client import pub_sub_manager
+from src.serialization import json_dumps, json_loads
+
+if TYPE_CHECKING:
+    from src.chat.bot_ai import BotAI
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationSession:
+    generation_id: str
+    room_id: str
+    bot: "BotAI"
+    cancelled: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancelled.is_set()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    async def run(self, coroutine: Coroutine[Any, Any, Any]) -> bool:
+        """
+        Run the coroutine until it returns or the session is cancelled
+
+        On cancellation the coroutine is cancelled at the await it is waiting
+        on, e.g. the next chunk of the LLM stream. Returns False if it did not
+        run to completion.
+        """
+        if self.is_cancelled:
+            coroutine.close()
+            logger.info(f"Generation {self.generation_id} cancelled before it started")
+            return False
+
+        task = asyncio.ensure_future(coroutine)
+        cancel_waiter = asyncio.ensure_future(self.cancelled.wait())
+        try:
+            await asyncio.wait(
+                {task, cancel_waiter}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            cancel_waiter.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        if task.cancelled():
+            logger.info(f"Generation {self.generation_id} cancelled")
+            return False
+
+        # re-raise errors of the coroutine
+        task.result()
+        return True
+
+
+class GenerationRegistry:
+    def __init__(self) -> None:
+        self.sessions: dict[str, GenerationSession] = {}
+        self.room_sessions: dict[str, set[str]] = {}
+        self._listener: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+
+    def get(self, generation_id: str) -> GenerationSession | None:
+        return self.sessions.get(generation_id)
+
+    def get_room_sessions(self, room_id: str) -> list[GenerationSession]:
+        return [
+            self.sessions[generation_id]
+            for generation_id in self.room_sessions.get(room_id, set())
+        ]
+
+    @asynccontextmanager
+    async def open(
+        self, generation_id: str, room_id: str, bot: "BotAI"
+    ) -> AsyncIterator[GenerationSession]:
+        self._ensure_listener()
+        session = GenerationSession(
+            generation_id=generation_id, room_id=room_id, bot=bot
+        )
+        self.sessions[generation_id] = session
+        self.room_sessions.setdefault(room_id, set()).add(generation_id)
+        try:
+            await self._check_cancelled(session)
+            yield session
+        finally:
+            self.sessions.pop(generation_id, None)
+            room_sessions = self.room_sessions.get(room_id)
+            if room_sessions is not None:
+                room_sessions.discard(generation_id)
+                if not room_sessions:
+                    del self.room_sessions[room_id]
+
+    def cancel(
+        self, generation_id: str | None = None, room_id: str | None = None
+    ) -> int:
+        """
+        Cancel the sessions of this process with the given generation id or room
+        """
+        if generation_id:
+            session = self.get(generation_id)
+            sessions = [session] if session else []
+        else:
+            sessions = self.get_room_sessions(room_id or "")
+
+        for session in sessions:
+            session.cancel()
+        return len(sessions)
+
+    async def request_cancel(
+        self, generation_id: str | None = None, room_id: str | None = None
+    ) -> None:
+        """
+        Cancel the matching sessions in every process
+        """
+        self.cancel(generation_id=generation_id, room_id=room_id)
+        if generation_id:
+            # set before publishing, see `_check_cancelled`
+            await pub_sub_manager.get_connection().set(
+                get_generation_cancelled_key(generation_id),
+                1,
+                ex=settings.GENERATION_CANCEL_TTL,
+            )
+        await pub_sub_manager.publish(
+            GENERATION_CANCEL_CHANNEL,
+            json_dumps({"generation_id": generation_id, "room_id": room_id}),
+        )
+
+    async def _check_cancelled(self, session: GenerationSession) -> None:
+        """
+        Cancel the session if it was stopped before this process listened
+
+        Stops published once the channel is subscribed reach the listener,
+        earlier ones have set the key before being published.
+        """
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=5.0)
+        except asyncio.TimeoutError:
+            logger.warning("Generation cancel listener is not subscribed yet")
+
+        cancelled = await pub_sub_manager.get_connection().exists(
+            get_generation_cancelled_key(session.generation_id)
+        )
+        if cancelled:
+            session.cancel()
+
+    def _ensure_listener(self) -> None:
+        loop = asyncio.get_running_loop()
+        if (
+            self._listener is None
+            or self._listener.done()
+            or self._listener.get_loop() is not loop
+        ):
+            self._subscribed = asyncio.Event()
+            self._listener = loop.create_task(self._listen_for_cancellations())
+
+    async def _listen_for_cancellations(self) -> None:
+        pubsub = pub_sub_manager.get_connection().pubsub()
+        await pubsub.subscribe(GENERATION_CANCEL_CHANNEL)
+        try:
+            # the subscription is live once the server confirmed it
+            while await pubsub.get_message(timeout=1.0) is None:
+                pass
+            self._subscribed.set()
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if not message:
+                    continue
+                try:
+                    self.cancel(**json_loads(message["data"]))
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Invalid generation cancel message: {e}")
+        except Exception as e:
+            logger.error(f"Generation cancel listener stopped: {e}")
+            raise
+        finally:
+            await pubsub.unsubscribe(GENERATION_CANCEL_CHANNEL)
+            await pubsub.close()
+
+    async def close(self) -> None:
+        if self._listener is None:
+            return
+
+        self._listener.cancel()
+        await asyncio.gather(self._listener, return_exceptions=True)
+        self._listener = None
+
+
+generation_registry = GenerationRegistry()
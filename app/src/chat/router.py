@@ -1,22 +1,35 @@
-import json
 import logging
 from json import JSONDecodeError
 
-from celery.result import AsyncResult
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from fastapi import (
+    APIRouter,
+    Depends,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from fastapi_filter import FilterDepends
 
 from src.active_room_users.service import (
     clean_user_from_active_rooms,
     create_active_room_user_in_db,
 )
+from src.auth.context import AuthContext, get_auth_context, get_auth_contexts
 from src.auth.exceptions import AuthRequired, UserNotFound
 from src.auth.jwt import parse_jwt_user_data, parse_jwt_user_data_optional
 from src.auth.schemas import JWTData, UserDB
-from src.auth.service import get_user_by_id, get_user_by_token
-from src.chat.bot_ai import bot_ai, create_bot_answer_task
+from src.auth.service import get_user_by_token
+from src.chat.api_info import api_info_channel, get_api_info_event
+from src.chat.bot_ai import cancel_bot_answer, schedule_bot_answer
 from src.chat.constants import MODEL_NAME
-from src.chat.exceptions import RoomAlreadyExists, RoomCannotBeCreated, RoomDoesNotExist
+from src.chat.exceptions import (
+    APIInfoEventDoesNotExist,
+    RoomAlreadyExists,
+    RoomCannotBeCreated,
+    RoomDoesNotExist,
+)
 from src.chat.filters import RoomFilter, get_query_filtered_by_visibility
 from src.chat.pagination import add_room_data
 from src.chat.redis_history import get_message_history
@@ -39,6 +52,7 @@ from src.chat.schemas import (
     RoomUpdateInputDetails,
 )
 from src.chat.service import (
+    clone_messages_in_db,
     create_message_in_db,
     create_room_in_db,
     delete_messages_from_db,
@@ -48,28 +62,38 @@ from src.chat.service import (
     get_room_by_id_from_db,
     get_room_messages_from_db,
     get_room_messages_to_specific_message,
+    get_room_version_from_db,
+    get_rooms_version_from_db,
     update_room_in_db,
 )
 from src.chat.sorting import sort_paginated_items
-from src.chat.validators import is_room_private, not_shared_for_organization
+from src.chat.validators import (
+    is_room_private,
+    not_shared_for_organization,
+    user_can_access_room,
+)
+from src.conditional import check_not_modified, get_last_modified, get_version_etag
 from src.config import settings
 from src.constants import Environment
+from src.database import database
 from src.datetime_utils import aware_datetime_field
 from src.elapsed_time.service import get_room_elapsed_time_by_messages
 from src.listener.constants import (
     bot_message_creation_finished_info,
-    listener_room_name,
     room_changed_info,
     stop_generation_finished_info,
 )
+from src.listener.hub import listener_hub
 from src.listener.manager import ws_manager
 from src.listener.schemas import WSEventMessage
-from src.organizations.security import is_user_in_organization
+from src.listener.topics import publish_room_event
+from src.metrics import WEBSOCKET_CONNECTIONS
 from src.pagination_utils import enrich_paginated_items
 from src.redis_client import pub_sub_manager
-from src.tasks import celery_app
+from src.serialization import json_dumps, json_loads
 from src.token_usage.schemas import TokenUsageDBWithSummedValues
 from src.token_usage.service import get_room_token_usages_by_messages
+from src.tracing import start_span
 from src.user_models.constants import get_available_models
 
 router = APIRouter()
@@ -79,15 +103,16 @@ logger = logging.getLogger(__name__)
 
 @router.get("/rooms")
 async def get_rooms(
+    request: Request,
+    response: Response,
     visibility: str | None = None,
     organization_uuid: str | None = None,
     name__ilike: str | None = None,
     room_filter: RoomFilter = FilterDepends(RoomFilter),
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if organization_uuid and not await is_user_in_organization(
-        jwt_data.user_id, str(organization_uuid)
-    ):
+    if organization_uuid and not auth.is_in_organization(str(organization_uuid)):
         # User is not in the organization
         # thus he cannot see the rooms
         raise RoomDoesNotExist()
@@ -102,7 +127,17 @@ async def get_rooms(
     filtered_query = room_filter.filter(query)
     sorted_query = room_filter.sort(filtered_query)
 
-    from src.database import database
+    # the rooms are built with a query per room, skip that if nothing changed
+    version = [dict(record) for record in await get_rooms_version_from_db(sorted_query)]
+    etag = get_version_etag(
+        jwt_data.user_id,
+        sorted(request.query_params.multi_items()),
+        sorted(auth.organization_uuids),
+        version,
+    )
+    last_modified = get_last_modified(*[record["updated_at"] for record in version])
+    if not_modified := check_not_modified(request, response, etag, last_modified):
+        return not_modified
 
     rooms_db = await database.fetch_all(sorted_query)
     rooms = [RoomDBWithTokenUsageAndMessages(**dict(room)) for room in rooms_db]
@@ -117,11 +152,11 @@ async def get_rooms(
 
 @router.get("/organization-rooms/{organization_uuid}", response_model=list[RoomDB])
 async def get_rooms_by_organization(
-    organization_uuid: str, jwt_data: JWTData = Depends(parse_jwt_user_data)
+    organization_uuid: str,
+    jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if not organization_uuid or not await is_user_in_organization(
-        jwt_data.user_id, organization_uuid
-    ):
+    if not organization_uuid or not auth.is_in_organization(organization_uuid):
         # User is not in the organization
         # thus he cannot see the rooms
         return []
@@ -134,6 +169,8 @@ async def get_rooms_by_organization(
 @router.get("/room/{room_id}", response_model=RoomDetails)
 async def get_room_with_messages(
     room_id: str,
+    request: Request,
+    response: Response,
     user_join: bool = False,
     jwt_data: JWTData | None = Depends(parse_jwt_user_data_optional),
 ):
@@ -143,33 +180,39 @@ async def get_room_with_messages(
 
     room_schema = RoomDB(**dict(room))
 
-    if room_schema.share:
-        user_schema = None
-        if jwt_data:
-            user = await get_user_by_id(jwt_data.user_id)
-            if user:
-                user_schema = UserDB(**dict(user))
-    else:
+    # the requesting user and the room owner are resolved together
+    contexts = await get_auth_contexts(
+        room_schema.user_id, *([jwt_data.user_id] if jwt_data else [])
+    )
+    owner_context = contexts.get(room_schema.user_id)
+    if not owner_context:
+        raise UserNotFound()
+
+    if not room_schema.share:
         if not jwt_data:
             raise AuthRequired()
 
-        user = await get_user_by_id(jwt_data.user_id)
-        if not user:
+        user_context = contexts.get(jwt_data.user_id)
+        if not user_context:
             raise UserNotFound()
-        user_schema = UserDB(**dict(user))
 
-        if is_room_private(room_schema, user_schema.id):
+        if is_room_private(room_schema, user_context.user_id):
             raise RoomDoesNotExist()
 
-        if await not_shared_for_organization(room_schema, user_schema.id):
+        if not_shared_for_organization(room_schema, user_context, owner_context):
             raise RoomDoesNotExist()
 
     if user_join and jwt_data:
         await create_active_room_user_in_db(room_id, jwt_data.user_id)
 
-    room_owner_user = await get_user_by_id(room_schema.user_id)
-    if not room_owner_user:
-        raise UserNotFound()
+    version = await get_room_version_from_db(room_id)
+    if version:
+        etag = get_version_etag(room_id, dict(version))
+        last_modified = get_last_modified(
+            version["updated_at"], version["messages_updated_at"]
+        )
+        if not_modified := check_not_modified(request, response, etag, last_modified):
+            return not_modified
 
     messages = await get_room_messages_from_db(room_id)
     messages_schema: list[MessageDBWithTokenUsage] = [
@@ -239,9 +282,10 @@ async def get_room_with_messages(
 async def create_room(
     room_data: RoomCreateInput,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if room_data.organization_uuid and not await is_user_in_organization(
-        jwt_data.user_id, str(room_data.organization_uuid)
+    if room_data.organization_uuid and not auth.is_in_organization(
+        str(room_data.organization_uuid)
     ):
         # User is not in the organization
         # thus he cant share the room with the organization
@@ -264,9 +308,10 @@ async def update_room(
     room_id: str,
     room_data: RoomUpdate,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if room_data.organization_uuid and not await is_user_in_organization(
-        jwt_data.user_id, str(room_data.organization_uuid)
+    if room_data.organization_uuid and not auth.is_in_organization(
+        str(room_data.organization_uuid)
     ):
         # User is not in the organization
         # thus he cannot see the rooms
@@ -277,21 +322,19 @@ async def update_room(
         room_id=room_id,
         user_id=jwt_data.user_id,
     )
+    # the audience of the previous visibility is told too
+    previous_room = await get_room_by_id_from_db(room_id)
     room = await update_room_in_db(room_update_details)
 
     if not room:
         raise RoomDoesNotExist()
 
     if settings.ENVIRONMENT != Environment.TESTING:
-        await pub_sub_manager.publish(
-            listener_room_name,
-            json.dumps(
-                WSEventMessage(
-                    type=room_changed_info,
-                    id=room_id,
-                    source="room_update",
-                ).model_dump(mode="json")
-            ),
+        await publish_room_event(
+            room_id,
+            WSEventMessage(type=room_changed_info, id=room_id, source="room_update"),
+            previous_room,
+            room,
         )
 
     return RoomDB(**dict(room))
@@ -319,32 +362,24 @@ async def clone_room(
     chat_data.user_id = jwt_data.user_id
     chat_data.name = f"Copy of {chat_data.name}"
     chat_data.visibility = "just_me"
-    created_chat = await create_room_in_db(chat_data)
-    if not created_chat:
-        raise RoomAlreadyExists()
-    for message in messages:
-        message_detail = MessageDetails(
-            created_by=message["created_by"],
-            room_id=str(created_chat["uuid"]),
-            content=message["content"],
-            user_id=message["user_id"],
-            sender_picture=message["sender_picture"],
-            content_html=message["content_html"],
-            elapsed_time=message["elapsed_time"],
-            content_dict=message["content_dict"],
+    async with database.transaction():
+        created_chat = await create_room_in_db(chat_data)
+        if not created_chat:
+            raise RoomAlreadyExists()
+        await clone_messages_in_db(
+            [str(message["uuid"]) for message in messages],
+            str(created_chat["uuid"]),
         )
-        await create_message_in_db(message_detail)
 
     if settings.ENVIRONMENT != Environment.TESTING:
-        await pub_sub_manager.publish(
-            listener_room_name,
-            json.dumps(
-                WSEventMessage(
-                    type=room_changed_info,
-                    id=str(created_chat["uuid"]),
-                    source="room_clone",
-                ).model_dump(mode="json")
+        await publish_room_event(
+            str(created_chat["uuid"]),
+            WSEventMessage(
+                type=room_changed_info,
+                id=str(created_chat["uuid"]),
+                source="room_clone",
             ),
+            created_chat,
         )
 
     return CloneChatOutput(
@@ -362,10 +397,12 @@ async def get_messages(room_id: str, jwt_data: JWTData = Depends(parse_jwt_user_
 
 @router.delete("/messages", response_model=MessagesDeleteOutput)
 async def delete_messages(
-    input_data: MessagesDeleteInput, jwt_data: JWTData = Depends(parse_jwt_user_data)
+    input_data: MessagesDeleteInput,
+    jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if input_data.organization_uuid and not await is_user_in_organization(
-        jwt_data.user_id, str(input_data.organization_uuid)
+    if input_data.organization_uuid and not auth.is_in_organization(
+        str(input_data.organization_uuid)
     ):
         # User is not in the organization
         # thus he cannot see the rooms
@@ -375,14 +412,12 @@ async def delete_messages(
         room_id=input_data.room_id, date_from=input_data.date_from
     )
     if settings.ENVIRONMENT != Environment.TESTING:
-        await pub_sub_manager.publish(
-            listener_room_name,
-            json.dumps(
-                WSEventMessage(
-                    type=room_changed_info,
-                    id=input_data.room_id,
-                    source="messages_delete",
-                ).model_dump(mode="json")
+        await publish_room_event(
+            input_data.room_id,
+            WSEventMessage(
+                type=room_changed_info,
+                id=input_data.room_id,
+                source="messages_delete",
             ),
         )
 
@@ -405,12 +440,64 @@ async def delete_messages(
     return MessagesDeleteOutput(status="success")
 
 
+async def handle_user_message(data_dict: dict, room_id: str, user_db: UserDB) -> str:
+    """
+    Broadcasts and saves the user's message and schedules the bot answer,
+    the answer's task continues the trace of the message
+    """
+    with start_span("chat.message", room_id=room_id):
+        logger.info(f"User message received: {data_dict['content']}")
+        user_broadcast_data = BroadcastData(
+            type="message",
+            message=data_dict["content"],
+            message_html=data_dict.get("content_html"),
+            room_id=room_id,
+            sender_user_email=user_db.email,
+            created_by="user",
+            sender_name=user_db.name,
+            sender_picture=user_db.picture,
+        )
+        # broadcast message to all users in room
+        await pub_sub_manager.publish(room_id, user_broadcast_data.model_dump_json())
+        # create user message in db
+        content_to_db = MessageDetails(
+            created_by="user",
+            content=data_dict["content"],
+            content_html=data_dict.get("content_html"),
+            room_id=room_id,
+            user_id=user_db.id,
+            sender_picture=user_db.picture,
+        )
+        logger.info("Creating message in db")
+        await create_message_in_db(content_to_db)
+        logger.info("Message created in db")
+
+        # update room updated_at
+        room = await update_room_in_db(
+            RoomUpdateInputDetails(
+                room_id=room_id,
+                user_id=user_db.id,
+            ),
+            update_share=False,
+            update_visibility=False,
+        )
+        await publish_room_event(
+            room_id,
+            WSEventMessage(type=room_changed_info, id=room_id, source="new-message"),
+            room,
+        )
+
+        logger.info("Creating bot answer task")
+
+        task_id = await schedule_bot_answer(data_dict, room_id, user_db)
+        logger.info(f"Task ID: {task_id}")
+        return task_id
+
+
 @router.websocket("/ws/{room_id}")
 async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
     token = websocket.query_params.get("token")
     user_db: UserDB = await get_user_by_token(token)
-    bot_ai.user_id = user_db.id
-    bot_ai.room_id = room_id
 
     await websocket.accept()
     logger.info("Adding user to room")
@@ -422,7 +509,7 @@ async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
     logger.info("Broadcast info about user joined room")
     await pub_sub_manager.publish(
         room_id,
-        json.dumps(
+        json_dumps(
             {
                 "type": "user_joined",
                 "user_email": user_db.email,
@@ -432,15 +519,16 @@ async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
         ),
     )
     task_id = None
+    WEBSOCKET_CONNECTIONS.labels("chat").inc()
     try:
         while True:
             # get user message
             data = await websocket.receive_text()
-            data_dict = json.loads(data)
+            data_dict = json_loads(data)
             if data_dict["type"] == "user_typing":
                 await pub_sub_manager.publish(
                     room_id,
-                    json.dumps(
+                    json_dumps(
                         {
                             "type": "typing",
                             "content": f"{user_db.name}",
@@ -449,92 +537,27 @@ async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
                     ),
                 )
             if data_dict["type"] == "message":
-                logger.info(f"User message received: {data_dict['content']}")
-                bot_ai.stop_generation_flag = False
-                user_broadcast_data = BroadcastData(
-                    type="message",
-                    message=data_dict["content"],
-                    message_html=data_dict.get("content_html"),
-                    room_id=room_id,
-                    sender_user_email=user_db.email,
-                    created_by="user",
-                    sender_name=user_db.name,
-                    sender_picture=user_db.picture,
-                )
-                # broadcast message to all users in room
-                await pub_sub_manager.publish(
-                    room_id, json.dumps(user_broadcast_data.model_dump(mode="json"))
-                )
-                # create user message in db
-                content_to_db = MessageDetails(
-                    created_by="user",
-                    content=data_dict["content"],
-                    content_html=data_dict.get("content_html"),
-                    room_id=room_id,
-                    user_id=user_db.id,
-                    sender_picture=user_db.picture,
-                )
-                logger.info("Creating message in db")
-                await create_message_in_db(content_to_db)
-                logger.info("Message created in db")
-                await pub_sub_manager.publish(
-                    listener_room_name,
-                    json.dumps(
-                        WSEventMessage(
-                            type=room_changed_info,
-                            id=room_id,
-                            source="new-message",
-                        ).model_dump(mode="json")
-                    ),
-                )
-
-                # update room updated_at
-                await update_room_in_db(
-                    RoomUpdateInputDetails(
-                        room_id=room_id,
-                        user_id=user_db.id,
-                    ),
-                    update_share=False,
-                    update_visibility=False,
-                )
-
-                # make sure to update correct room id
-                bot_ai.room_id = room_id
-                logger.info("Creating bot answer task")
-
-                # apply async
-                result = create_bot_answer_task.apply_async(
-                    args=[data_dict, room_id, user_db.model_dump()],
-                    countdown=0,
-                )
-                logger.info(f"Task ID: {result.task_id}")
-                task_id = result.task_id
+                task_id = await handle_user_message(data_dict, room_id, user_db)
             if data_dict["type"] == "stop_generation":
-                # Set the flag to stop generation
-                result = AsyncResult(task_id, app=celery_app)
-                result.revoke(terminate=True)
-
-                bot_ai.stop_generation_flag = True
+                # stop only the answer generated for this connection
+                await cancel_bot_answer(task_id, room_id)
+                task_id = None
 
                 await pub_sub_manager.publish(
                     room_id,
-                    json.dumps(
-                        WSEventMessage(
-                            type=stop_generation_finished_info,
-                            id=room_id,
-                            source="stop_generation",
-                        ).model_dump(mode="json")
-                    ),
+                    WSEventMessage(
+                        type=stop_generation_finished_info,
+                        id=room_id,
+                        source="stop_generation",
+                    ).model_dump_json(),
                 )
                 await pub_sub_manager.publish(
                     room_id,
-                    json.dumps(
-                        WSEventMessage(
-                            type=bot_message_creation_finished_info,
-                            id=room_id,
-                            source="bot-message-creation-finished",
-                        ).model_dump(mode="json")
-                    ),
+                    WSEventMessage(
+                        type=bot_message_creation_finished_info,
+                        id=room_id,
+                        source="bot-message-creation-finished",
+                    ).model_dump_json(),
                 )
 
                 continue  # Skip the rest of the loop for this message
@@ -543,7 +566,7 @@ async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
         await clean_user_from_active_rooms(user_db.id)
         await pub_sub_manager.publish(
             room_id,
-            json.dumps(
+            json_dumps(
                 {
                     "type": "user_left",
                     "user_email": user_db.email,
@@ -553,15 +576,7 @@ async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
             ),
         )
         logger.info("WebSocket connection closed")
-        await pub_sub_manager.publish(
-            listener_room_name,
-            json.dumps(
-                WSEventMessage(
-                    type=room_changed_info,
-                    id=listener_room_name,
-                ).model_dump(mode="json")
-            ),
-        )
+        # publishes the room change of the user leaving
         await ws_manager.remove_user_from_room(
             room_id=room_id, websocket=websocket, user=user_db
         )
@@ -572,3 +587,46 @@ async def room_websocket_endpoint(websocket: WebSocket, room_id: str):
     except Exception as e:
         # Handle other exceptions
         logger.error(f"An unexpected error occurred: {e}")
+    finally:
+        WEBSOCKET_CONNECTIONS.labels("chat").dec()
+
+
+@router.websocket("/ws/{room_id}/api-info")
+async def room_api_info_websocket_endpoint(websocket: WebSocket, room_id: str):
+    """
+    API debug stream of the room, its events are published only while a
+    client listens here
+    """
+    try:
+        user_db = await get_user_by_token(websocket.query_params.get("token"))
+    except UserNotFound:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    if not await user_can_access_room(room_id, user_db.id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await listener_hub.serve(
+        websocket, [api_info_channel(room_id)], endpoint="api-info"
+    )
+
+
+@router.get("/room/{room_id}/api-info/{event_id}")
+async def get_room_api_info_event(
+    room_id: str,
+    event_id: str,
+    jwt_data: JWTData | None = Depends(parse_jwt_user_data_optional),
+):
+    """
+    Full body of a truncated API debug event
+    """
+    if not await user_can_access_room(room_id, jwt_data.user_id if jwt_data else None):
+        raise RoomDoesNotExist()
+
+    event = await get_api_info_event(room_id, event_id)
+    if not event:
+        raise APIInfoEventDoesNotExist()
+
+    return Response(event, media_type="application/json")
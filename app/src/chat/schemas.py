@@ -1,12 +1,13 @@
 from datetime import datetime
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from src.auth.schemas import UserDB
 from src.chat.constants import MODEL_NAME
 from src.chat.enums import VisibilityChoices
 from src.token_usage.schemas import TokenUsageDBWithSummedValues
+from src.tracing import get_trace_id
 
 
 # Room schemas
@@ -140,6 +141,8 @@ class BroadcastData(BaseModel):
     sender_picture: str | None = None
     sender_name: str | None = None
     message_html: str | None = None
+    # trace of the request which caused the message
+    trace_id: str | None = Field(default_factory=get_trace_id)
 
 
 class APIInfoBroadcastData(BaseModel):
@@ -150,6 +153,9 @@ class APIInfoBroadcastData(BaseModel):
     data: dict
     elapsed_time: float | None = None
     model: str = MODEL_NAME
+    # set when the data was cut, the full event is fetched by its event_id
+    truncated: bool = False
+    event_id: str | None = None
 
 
 class ConnectMessage(BaseModel):
@@ -11,13 +11,18 @@ from sqlalchemy import (
     case,
     cast,
     delete,
+    distinct,
     func,
     insert,
+    literal,
     or_,
     select,
+    true,
+    union_all,
     update,
 )
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.sql.dml import Insert
 from sqlalchemy.sql.selectable import Select
 
 from src.chat.enums import VisibilityChoices
@@ -26,10 +31,15 @@ from src.chat.schemas import (
     RoomCreateInputDetails,
     RoomUpdateInputDetails,
 )
-from src.database import ActiveRoomUsers, Message, Room, TokenUsage, database
-from src.organizations.service import get_organizations_by_user_id_from_db
+from src.database import (
+    ActiveRoomUsers,
+    Message,
+    OrganizationUser,
+    Room,
+    TokenUsage,
+    database,
+)
 from src.token_usage.service import (
-    create_token_usage_in_db,
     get_token_usage_input_from_message,
     update_token_usage_in_db,
 )
@@ -126,46 +136,49 @@ def get_organization_rooms_query(organization_uuid: str | None) -> Select:
 #     )
 #
 #     return select_query
-async def get_user_and_organization_rooms_query(user_id: int) -> Select:
-    where_clause = (and_(*get_user_rooms_where_clause(user_id)),)
-
-    # get user organizations
-    organizations: list[Record] = await get_organizations_by_user_id_from_db(user_id)
-    for organization in organizations:
-        if not organization["uuid"]:
-            continue
-
-        where_clause += (  # type: ignore
-            and_(*get_organizations_rooms_where_clause(organization["uuid"])),
-        )
-
-    # Define the subquery to fetch active user IDs for each room
-    subquery = (
-        select(
-            ActiveRoomUsers.room_uuid,
-            func.array_agg(ActiveRoomUsers.user_id).label("active_user_ids"),
-        ).group_by(ActiveRoomUsers.room_uuid)
-    ).subquery()
+def get_user_and_organization_rooms_query(user_id: int) -> Select:
+    """
+    Rooms of the user and of the user's organizations, in one query
+
+    The organizations are a semi-join on organization_user, evaluated once
+    as an array, so both sides of the OR can use the room indexes.
+    Active users are aggregated only for the selected rooms.
+    """
+    # ARRAY(SELECT ...) is evaluated once, before the room scan
+    user_organization_uuids = func.array(
+        select(OrganizationUser.organization_uuid)
+        .where(OrganizationUser.auth_user_id == user_id)
+        .scalar_subquery()
+    )
+    active_users = (
+        select(func.array_agg(ActiveRoomUsers.user_id).label("active_user_ids"))
+        .where(ActiveRoomUsers.room_uuid == Room.uuid)
+        .lateral("active_users")
+    )
 
-    # Construct the main select query
     select_query = (
-        select(Room, subquery.c.active_user_ids)
+        select(Room, active_users.c.active_user_ids)
+        .outerjoin(active_users, true())
         .where(
-            or_(*where_clause),
+            or_(
+                and_(*get_user_rooms_where_clause(user_id)),
+                and_(
+                    Room.visibility == VisibilityChoices.ORGANIZATION,
+                    Room.organization_uuid == any_(user_organization_uuids),
+                ),
+            )
         )
-        .select_from(Room)
-        .outerjoin(subquery, Room.uuid == subquery.c.room_uuid)
         # order by whether the user is in the room first, then by number of active users
         .order_by(
             case(
                 (
-                    user_id == any_(subquery.c.active_user_ids),
+                    user_id == any_(active_users.c.active_user_ids),
                     "0",
                 ),  # Cast the output to string
                 else_="1",  # Cast the else output to string
             ),
             cast(
-                func.coalesce(func.array_length(subquery.c.active_user_ids, 1), 0),
+                func.coalesce(func.array_length(active_users.c.active_user_ids, 1), 0),
                 Integer,
             ).desc(),
         )
@@ -243,6 +256,53 @@ async def get_room_messages_from_db(room_id: str) -> list[Record]:
     return await database.fetch_all(select_query)
 
 
+async def get_room_version_from_db(room_id: str) -> Record | None:
+    """
+    Version stamp of a room with its messages, for conditional requests
+    """
+    select_query = (
+        select(
+            Room.updated_at,
+            func.count(Message.uuid).label("messages_count"),
+            func.max(Message.updated_at).label("messages_updated_at"),
+        )
+        .outerjoin(Message, Message.room_id == Room.uuid)
+        .where(Room.uuid == room_id)
+        .group_by(Room.uuid)
+    )
+
+    return await database.fetch_one(select_query)
+
+
+async def get_rooms_version_from_db(rooms_query: Select) -> list[Record]:
+    """
+    Version stamp of the rooms selected by the query, with their messages
+    and active users: counts, to notice deletions, and the latest updates
+    """
+    rooms = rooms_query.with_only_columns(Room.uuid).order_by(None).subquery()
+    room_uuids = select(rooms.c.uuid)
+
+    select_query = union_all(
+        select(
+            literal("rooms").label("kind"),
+            func.count(distinct(Room.uuid)).label("count"),
+            func.max(Room.updated_at).label("updated_at"),
+        ).where(Room.uuid.in_(room_uuids)),
+        select(
+            literal("messages"),
+            func.count(Message.uuid),
+            func.max(Message.updated_at),
+        ).where(Message.room_id.in_(room_uuids)),
+        select(
+            literal("active_users"),
+            func.count(ActiveRoomUsers.id),
+            func.max(ActiveRoomUsers.updated_at),
+        ).where(ActiveRoomUsers.room_uuid.in_(room_uuids)),
+    )
+
+    return await database.fetch_all(select_query)
+
+
 async def get_room_messages_to_specific_message(
     room_id: str, message_id: str | None
 ) -> list[Record]:
@@ -283,24 +343,97 @@ async def get_message_by_id_from_db(message_id: str) -> Record | None:
         return None
 
 
-async def create_message_in_db(user_message: MessageDetails) -> Record | None:
+def get_create_message_query(user_message: MessageDetails) -> Insert:
+    """
+    Insert of the message and its token usage in one statement
+    """
     token_usage_input = get_token_usage_input_from_message(user_message)
-    token_usage: Record | None = await create_token_usage_in_db(token_usage_input)
-
-    if not token_usage:
-        logger.error("Token usage could not be created")
-        return None
+    token_usage = (
+        insert(TokenUsage)
+        .values(**token_usage_input.model_dump())
+        .returning(TokenUsage.id)
+        .cte("new_token_usage")
+    )
 
     insert_values = {
         "uuid": uuid.uuid4(),
         **user_message.model_dump(),
-        "token_usage_id": token_usage["id"],
+        "token_usage_id": select(token_usage.c.id).scalar_subquery(),
     }
 
-    insert_query = insert(Message).values(insert_values).returning(Message)
-    message = await database.fetch_one(insert_query)
+    return (
+        insert(Message)
+        .values(insert_values)
+        # sqlalchemy2-stubs predate Insert.add_cte (SQLAlchemy 1.4.21)
+        .add_cte(token_usage)  # type: ignore[attr-defined]
+        .returning(Message)
+    )
+
+
+async def create_message_in_db(user_message: MessageDetails) -> Record | None:
+    return await database.fetch_one(get_create_message_query(user_message))
+
+
+async def clone_messages_in_db(message_uuids: list[str], room_id: str) -> None:
+    """
+    Copy the messages, with their token usage, to the room
+
+    Token usage rows are copied, not recomputed, in a data-modifying CTE of
+    the message INSERT ... SELECT, so the whole clone is one statement.
+    The messages keep their timestamps, which keeps them in order.
+    """
+    if not message_uuids:
+        return
+
+    source = (
+        select(
+            Message,
+            case(
+                (
+                    Message.token_usage_id.is_not(None),
+                    TokenUsage.__table__.c.id.default.next_value(),
+                )
+            ).label("new_token_usage_id"),
+        )
+        .where(Message.uuid.in_(message_uuids))
+        .cte("source")
+    )
+    token_usage_copy = (
+        insert(TokenUsage)
+        .from_select(
+            ["id", "count", "value", "type"],
+            select(
+                source.c.new_token_usage_id,
+                TokenUsage.count,
+                TokenUsage.value,
+                TokenUsage.type,
+            )
+            .select_from(source)
+            .join(TokenUsage, TokenUsage.id == source.c.token_usage_id),
+        )
+        .cte("token_usage_copy")
+    )
+
+    copied_columns = [
+        column.name
+        for column in Message.__table__.columns
+        if column.name not in ("uuid", "room_id", "token_usage_id")
+    ]
+    insert_query = (
+        insert(Message).from_select(
+            ["uuid", "room_id", "token_usage_id", *copied_columns],
+            select(
+                func.gen_random_uuid(),
+                literal(room_id, Room.uuid.type),
+                source.c.new_token_usage_id,
+                *[source.c[name] for name in copied_columns],
+            ),
+        )
+        # sqlalchemy2-stubs predate Insert.add_cte (SQLAlchemy 1.4.21)
+        .add_cte(token_usage_copy)  # type: ignore[attr-defined]
+    )
 
-    return message
+    await database.execute(insert_query)
 
 
 async def update_message_in_db(
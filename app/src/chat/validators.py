@@ -1,9 +1,7 @@
-from sqlalchemy import select
-
+from src.auth.context import AuthContext, get_auth_contexts
 from src.chat.enums import VisibilityChoices
 from src.chat.schemas import RoomDB
-from src.database import OrganizationUser, database
-from src.organizations.schemas import OrganizationUserDB
+from src.chat.service import get_room_by_id_from_db
 
 
 def is_room_private(room_schema: RoomDB, user_id: int) -> bool:
@@ -14,54 +12,53 @@ def is_room_private(room_schema: RoomDB, user_id: int) -> bool:
     )
 
 
-async def in_the_same_org(room_user_id: int, user_id: int) -> bool:
+def in_the_same_org(room_owner: AuthContext, user: AuthContext) -> bool:
     """
     this is a total mess because of the way we understand organizations
     in Figma there is only a button to share a room with an organization
     there is no way to select with which organizations to share a room
     thus we have to check if the user is in the same organization as the room owner
     """
+    # TEMPORARY SOLUTION
+    # ROOM_SCHEMA.VISIBILITY SHOULD BE A LIST OF ORGANIZATION IDS
+    # THEN WE CAN JUST CHECK IF ANY OF USER ORGS IS IN THAT LIST
+    return user.shares_organization_with(room_owner)
 
-    # get room owner's organizations
-    room_owner_organizations_query = select(OrganizationUser).where(
-        OrganizationUser.auth_user_id == room_user_id
-    )
-    org_users_db = await database.fetch_all(room_owner_organizations_query)
-    room_owners_org_users = [
-        OrganizationUserDB(**dict(org_user)) for org_user in org_users_db
-    ]
 
-    # get user's organizations
-    user_organizations_query = select(OrganizationUser).where(
-        OrganizationUser.auth_user_id == user_id
+def not_shared_for_organization(
+    room_schema: RoomDB, user: AuthContext, room_owner: AuthContext
+) -> bool:
+    return (
+        room_schema.visibility == VisibilityChoices.ORGANIZATION
+        and not room_schema.share
+        and not in_the_same_org(room_owner, user)
     )
-    user_org_users_db = await database.fetch_all(user_organizations_query)
-    user_org_users = [
-        OrganizationUserDB(**dict(org_user)) for org_user in user_org_users_db
-    ]
 
-    # TEMPORARY SOLUTION
-    # PROBABLY THERE IS A BETTER WAY TO DO THIS
-    # ROOM_SCHEMA.VISIBILITY SHOULD BE A LIST OF ORGANIZATION IDS
-    # THEN WE CAN JUST CHECK IF ANY OF USER ORGS IS IN THAT LIST
 
-    # if any of the user's organizations is in the room owner's organizations
+def can_access_room(
+    room_schema: RoomDB, user: AuthContext | None, room_owner: AuthContext
+) -> bool:
+    if room_schema.share:
+        return True
+    if not user or is_room_private(room_schema, user.user_id):
+        return False
 
-    same_org = False
-    for user_org in user_org_users:
-        for room_owner_org in room_owners_org_users:
-            if user_org.organization_uuid == room_owner_org.organization_uuid:
-                same_org = True
-    if not user_org_users and not room_owners_org_users:
-        same_org = True
+    return not not_shared_for_organization(room_schema, user, room_owner)
 
-    return same_org
 
+async def user_can_access_room(room_id: str, user_id: int | None) -> bool:
+    room = await get_room_by_id_from_db(room_id)
+    if not room:
+        return False
 
-async def not_shared_for_organization(room_schema: RoomDB, user_id: int) -> bool:
-    same_org = await in_the_same_org(room_schema.user_id, user_id)
-    return (
-        room_schema.visibility == VisibilityChoices.ORGANIZATION
-        and not room_schema.share
-        and not same_org
+    room_schema = RoomDB(**dict(room))
+    # the user and the room owner are resolved together
+    contexts = await get_auth_contexts(
+        room_schema.user_id, *([user_id] if user_id else [])
     )
+    room_owner = contexts.get(room_schema.user_id)
+    if not room_owner:
+        return False
+
+    user = contexts.get(user_id) if user_id else None
+    return can_access_room(room_schema, user, room_owner)
@@ -0,0 +1,147 @@
+"""
+Conditional GET support
+
+Read-heavy endpoints compute a version stamp of what they return, from
+updated_at columns and row counts, which is much cheaper than building the
+response. The stamp becomes the ETag, and a matching If-None-Match is
+answered with 304 before the response is built.
+
+ConditionalRequestMiddleware covers the other GET endpoints: it answers 304
+when the ETag of a response matches, and adds an ETag hashed from the body
+to JSON responses without one, which saves the bytes but not the work.
+Streaming responses and responses marked "Cache-Control: no-store"
+(secrets) are never hashed.
+"""
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils import etag_matches, get_etag
+
+CACHE_CONTROL = "private, no-cache"
+# headers a 304 response carries over from the full response
+NOT_MODIFIED_HEADERS = (b"etag", b"last-modified", b"cache-control", b"vary")
+
+
+def get_version_etag(*parts: Any) -> str:
+    return get_etag(json.dumps(parts, default=str))
+
+
+def get_last_modified(*timestamps: datetime | None) -> str | None:
+    values = [
+        timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+        for timestamp in timestamps
+        if timestamp
+    ]
+    if not values:
+        return None
+    return format_datetime(max(values).astimezone(timezone.utc), usegmt=True)
+
+
+def get_validator_headers(etag: str, last_modified: str | None = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: str | None = None,
+) -> Response | None:
+    """
+    Returns the 304 response if the client has the current version, otherwise
+    sets the validators on the response the endpoint is going to build
+    """
+    headers = get_validator_headers(etag, last_modified)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+class ConditionalRequestMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        # "passthrough", "not_modified" (the body is dropped) or "buffering"
+        state = "passthrough"
+        start: Message = {}
+        body = b""
+
+        async def send_not_modified(headers: MutableHeaders) -> None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [
+                        (name, value)
+                        for name, value in headers.raw
+                        if name in NOT_MODIFIED_HEADERS
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+
+        async def conditional_send(message: Message) -> None:
+            nonlocal state, start, body
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                is_ok = message["status"] == 200
+                if is_ok and "etag" in headers:
+                    state = "passthrough"
+                    if etag_matches(if_none_match, headers["etag"]):
+                        state = "not_modified"
+                        await send_not_modified(headers)
+                        return
+                elif (
+                    is_ok
+                    and scope["method"] == "GET"
+                    and headers.get("content-type", "").startswith("application/json")
+                    and "no-store" not in headers.get("cache-control", "")
+                    # streaming responses have no length and are never buffered
+                    and "content-length" in headers
+                ):
+                    state = "buffering"
+                    start = message
+                    return
+
+                await send(message)
+                return
+
+            if state == "not_modified":
+                return
+            if state == "passthrough" or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body += message.get("body", b"")
+            if message.get("more_body", False):
+                return
+
+            headers = MutableHeaders(scope=start)
+            headers["ETag"] = get_etag(body)
+            headers.setdefault("Cache-Control", CACHE_CONTROL)
+            if etag_matches(if_none_match, headers["etag"]):
+                await send_not_modified(headers)
+                return
+
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, conditional_send)
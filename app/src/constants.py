@@ -27,3 +27,15 @@ class Environment(str, Enum):
     @property
     def is_deployed(self) -> bool:
         return self in (self.STAGING, self.PRODUCTION)
+
+
+class TaskRunner(str, Enum):
+    CELERY = "CELERY"
+    ASYNCIO = "ASYNCIO"
+
+    @classmethod
+    def _missing_(cls, value: object) -> "TaskRunner | None":
+        # TASK_RUNNER=asyncio is accepted as well
+        if isinstance(value, str) and value.upper() in cls.__members__:
+            return cls[value.upper()]
+        return None
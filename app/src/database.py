@@ -1,7 +1,9 @@
 import uuid
+from logging import getLogger
 from typing import Any
 
-from databases import Database
+from databases import Database as BaseDatabase
+from databases.interfaces import Record
 from sqlalchemy import (
     JSON,
     Boolean,
@@ -10,6 +12,7 @@ from sqlalchemy import (
     Float,
     ForeignKey,
     Identity,
+    Index,
     Integer,
     LargeBinary,
     MetaData,
@@ -26,6 +29,9 @@ from sqlalchemy_utils.types import TSVectorType
 from src.config import get_settings
 from src.constants import DB_NAMING_CONVENTION
 from src.db_types import AwareDateTime
+from src.metrics import time_db_query
+
+logger = getLogger(__name__)
 
 settings = get_settings()
 
@@ -34,8 +40,40 @@ if settings.ENVIRONMENT.is_testing:
 else:
     DATABASE_URL = settings.DATABASE_URL
 
+
+class Database(BaseDatabase):
+    """
+    Database timing and tracing its queries by statement name, see src.metrics
+    """
+
+    async def fetch_all(self, query, values: dict | None = None) -> list[Record]:
+        with time_db_query(query):
+            return await super().fetch_all(query, values)
+
+    async def fetch_one(self, query, values: dict | None = None) -> Record | None:
+        with time_db_query(query):
+            return await super().fetch_one(query, values)
+
+    async def fetch_val(
+        self, query, values: dict | None = None, column: Any = 0
+    ) -> Any:
+        with time_db_query(query):
+            return await super().fetch_val(query, values, column=column)
+
+    async def execute(self, query, values: dict | None = None) -> Any:
+        with time_db_query(query):
+            return await super().execute(query, values)
+
+    async def execute_many(self, query, values: list) -> None:
+        with time_db_query(query):
+            return await super().execute_many(query, values)
+
+
 database = Database(
-    DATABASE_URL.unicode_string(), force_rollback=settings.ENVIRONMENT.is_testing
+    DATABASE_URL.unicode_string(),
+    force_rollback=settings.ENVIRONMENT.is_testing,
+    min_size=settings.DATABASE_POOL_MIN_SIZE,
+    max_size=settings.DATABASE_POOL_MAX_SIZE,
 )
 engine = create_engine(DATABASE_URL.unicode_string())
 metadata = MetaData(naming_convention=DB_NAMING_CONVENTION)
@@ -60,6 +98,7 @@ class OrganizationUser(Base):
         UniqueConstraint(
             "organization_uuid", "auth_user_id", name="uq_org_user_org_user"
         ),
+        Index("organization_user_auth_user_id_idx", "auth_user_id"),
     )
 
 
@@ -144,6 +183,13 @@ class Room(Base):
         ForeignKey("organization.uuid", ondelete="CASCADE"), nullable=True
     )
 
+    __table_args__ = (
+        Index("room_user_id_visibility_idx", "user_id", "visibility"),
+        Index(
+            "room_organization_uuid_visibility_idx", "organization_uuid", "visibility"
+        ),
+    )
+
     # Define a relationship to access active users
     # active_user: relationship = relationship("ActiveRoomUsers", backref="room")
 
@@ -182,6 +228,11 @@ class Message(Base):
     # Add the search vector
     search_vector = Column(TSVectorType("content"))
 
+    __table_args__ = (
+        Index("message_room_id_created_at_idx", "room_id", "created_at"),
+        Index("message_token_usage_id_idx", "token_usage_id"),
+    )
+
 
 class Organization(Base):
     __tablename__ = "organization"
@@ -264,6 +315,32 @@ class TokenUsage(Base):
     created_at = Column(AwareDateTime, server_default=func.now(), nullable=False)
 
 
+class MessageGeneration(Base):
+    __tablename__ = "message_generation"
+
+    id = Column(Integer, Identity(), primary_key=True)
+    message_uuid = Column(
+        ForeignKey("message.uuid", ondelete="CASCADE"), nullable=False, unique=True
+    )
+    room_id = Column(ForeignKey("room.uuid", ondelete="CASCADE"), nullable=False)
+    user_id = Column(ForeignKey("auth_user.id", ondelete="CASCADE"), nullable=False)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    time_to_first_token = Column(Float, nullable=False)
+    mean_chunk_gap = Column(Float, nullable=True)
+    max_chunk_gap = Column(Float, nullable=True)
+    chunks = Column(Integer, nullable=False)
+    tokens = Column(Integer, nullable=False)
+    tokens_per_second = Column(Float, nullable=True)
+    duration = Column(Float, nullable=False)
+    created_at = Column(AwareDateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("message_generation_room_id_created_at_idx", "room_id", "created_at"),
+        Index("message_generation_user_id_created_at_idx", "user_id", "created_at"),
+    )
+
+
 class ActiveRoomUsers(Base):
     __tablename__ = "active_room_user"
 
@@ -280,6 +357,7 @@ class ActiveRoomUsers(Base):
 
     __table_args__ = (
         UniqueConstraint("room_uuid", "user_id", name="uq_active_room_user"),
+        Index("active_room_user_user_id_idx", "user_id"),
     )
 
 
@@ -311,6 +389,8 @@ class UserFile(Base):
         server_onupdate=func.now(),
     )
 
+    __table_args__ = (Index("user_file_user_source_value_idx", "user", "source_value"),)
+
 
 class UserModel(Base):
     __tablename__ = "user_model"
@@ -321,6 +401,14 @@ class UserModel(Base):
     api_key = Column(String, nullable=False)
     default = Column(Boolean, server_default="false", nullable=False)
     user = Column(ForeignKey("auth_user.id", ondelete="NO ACTION"), nullable=False)
+    updated_at = Column(  # type: ignore
+        AwareDateTime,
+        onupdate=func.now(),
+        server_default=func.now(),
+        server_onupdate=func.now(),
+    )
+
+    __table_args__ = (Index("user_model_user_idx", "user"),)
 
 
 class OrganizationModel(Base):
@@ -335,6 +423,10 @@ class OrganizationModel(Base):
     )
     created_at = Column(AwareDateTime, server_default=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index("organization_model_organization_uuid_idx", "organization_uuid"),
+    )
+
 
 user_model_organization: relationship = relationship(
     "organization",
@@ -347,3 +439,30 @@ organization_user_model: relationship = relationship(
     secondary="organization_models",
     back_populates="organizations_model",
 )
+
+
+async def check_indexes() -> list[str]:
+    """
+    Warn about indexes declared on the models that are missing in the
+    database or left invalid by a failed concurrent build
+    """
+    expected = {
+        index.name for table in Base.metadata.tables.values() for index in table.indexes
+    }
+    rows = await database.fetch_all(
+        """
+        SELECT index_class.relname AS name
+        FROM pg_index
+        JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+        JOIN pg_namespace ON pg_namespace.oid = index_class.relnamespace
+        WHERE pg_namespace.nspname = current_schema() AND pg_index.indisvalid
+        """
+    )
+    missing = sorted(expected - {row["name"] for row in rows})
+    if missing:
+        logger.warning(
+            f"Missing or invalid database indexes: {', '.join(missing)}. "
+            "Run `alembic upgrade head` or rebuild them."
+        )
+
+    return missing
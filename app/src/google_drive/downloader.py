@@ -1,27 +1,26 @@
-import json
-import os
 from datetime import datetime
-from io import BytesIO
 from logging import getLogger
 from time import time
+from typing import AsyncIterator
 
-import PyPDF2
-import requests
-from PyPDF2 import PdfReader
-from requests import get
-
-from src.annotations.fingerprint import fingerprint
 from src.auth.schemas import UserDB
+from src.chat.api_info import publish_api_info
 from src.chat.schemas import APIInfoBroadcastData
-from src.redis_client import pub_sub_manager
-from src.scraping.content_loaders import read_docx_from_bytes
-from src.utils import get_root_path
+from src.scraping.async_downloader import DownloadError, async_downloader
+from src.scraping.extraction import (
+    PdfDocument,
+    PdfInfo,
+    extract_docx_text,
+    extract_pdf_text,
+    get_pdf_info,
+    iter_pdf_pages,
+)
 
 logger = getLogger(__name__)
 
 
 async def get_google_drive_file_details(
-    file_id: str | int | None, user_db: UserDB
+    file_id: str | int | None, user_db: UserDB, stream: bool = False
 ) -> dict:
     if user_db.credentials is None:
         logger.error("User credentials are missing")
@@ -35,7 +34,7 @@ async def get_google_drive_file_details(
 
     # Get the file information
     # ------------------------
-    file_info = get_google_file_info(file_id, headers)
+    file_info = await get_google_file_info(file_id, headers)
     # ------------------------
 
     # Get the file content
@@ -48,6 +47,7 @@ async def get_google_drive_file_details(
             f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media",
             headers,
             get_urn=True,
+            stream=stream,
         )
     elif any(
         [
@@ -58,15 +58,12 @@ async def get_google_drive_file_details(
     ):
         url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
         logger.info(f"Downloading and extracting docx file from: {url}")
-        response = get(
-            url,
-            headers=headers,
-            stream=True,
-        )
-        if response.status_code != 200:
-            logger.error(f"Failed to download file: {url}")
+        try:
+            with await async_downloader.download(url, headers=headers) as downloaded:
+                text = await extract_docx_text(downloaded)
+        except DownloadError as e:
+            logger.error(f"Failed to download file: {e}")
             return {}
-        text = read_docx_from_bytes(response.content)
         details = {
             "content": text,
         }
@@ -76,15 +73,13 @@ async def get_google_drive_file_details(
         ]
     ):
         url = f"https://www.googleapis.com/drive/v3/files/{file_id}/export?mimeType=text/plain"
-        data = get(
-            url,
-            headers=headers,
-        )
-        if data.status_code != 200:
-            logger.error(f"Failed to download file: {url}")
+        try:
+            with await async_downloader.download(url, headers=headers) as downloaded:
+                text = downloaded.text()
+        except DownloadError as e:
+            logger.error(f"Failed to download file: {e}")
             return {}
 
-        text = data.text.encode("utf-8").decode("utf-8")
         details = {
             "content": text,
         }
@@ -92,15 +87,12 @@ async def get_google_drive_file_details(
         # New code to handle text/plain files
         url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
         logger.info(f"Downloading and extracting text file from: {url}")
-        response = get(
-            url,
-            headers=headers,
-            stream=True,
-        )
-        if response.status_code != 200:
-            logger.error(f"Failed to download file: {url}")
+        try:
+            with await async_downloader.download(url, headers=headers) as downloaded:
+                text = downloaded.text()
+        except DownloadError as e:
+            logger.error(f"Failed to download file: {e}")
             return {"name": "Non-shared file"}
-        text = response.content.decode("utf-8")
         details = {
             "content": text,
         }
@@ -111,107 +103,121 @@ async def get_google_drive_file_details(
     }
 
 
-def get_google_file_info(file_id: str | int, headers: dict) -> dict:
+async def get_google_file_info(file_id: str | int, headers: dict) -> dict:
     url = f"https://www.googleapis.com/drive/v3/files/{file_id}"
-    file_info_response = requests.get(
-        url,
-        params={"fields": "*"},
-        headers=headers,
-    )
-    if file_info_response.status_code != 200:
+    try:
+        file_info = await async_downloader.get_json(
+            url, headers=headers, params={"fields": "*"}
+        )
+    except DownloadError:
         logger.error(f"Failed to download file info from: {url}")
         return {}
-    file_info = file_info_response.json()
     return file_info
 
 
 async def get_pdf_file_details(
-    url: str, headers: dict | None = None, get_urn: bool = False, room_id: str = ""
+    url: str,
+    headers: dict | None = None,
+    get_urn: bool = False,
+    room_id: str = "",
+    stream: bool = False,
 ) -> dict:
-    file_data_response = requests.get(url, headers=headers)
-    file_data_response.raise_for_status()
-    if file_data_response.status_code != 200:
-        logger.error(f"Failed to download file: {url}")
+    """
+    Download a PDF and extract its text, or with `stream` return the
+    `pages` async iterator instead of the joined `content`
+    """
+    try:
+        downloaded = await async_downloader.download(url, headers=headers)
+    except DownloadError as e:
+        logger.error(f"Failed to download file: {e}")
         return {}
 
+    document = PdfDocument(downloaded)
+    try:
+        details = await _get_pdf_file_details(document, get_urn, room_id, stream)
+    except BaseException:
+        document.close()
+        raise
+    if not stream:
+        document.close()
+    return details
+
+
+async def _get_pdf_file_details(
+    document: PdfDocument, get_urn: bool, room_id: str, stream: bool
+) -> dict:
+    url = document.downloaded.url
     logger.info(f"Downloaded file: {url}")
     start = time()
     # Extract the text content
-    pdf_reader: PdfReader = PyPDF2.PdfReader(BytesIO(file_data_response.content))
-    text_content = ""
-    for page_num in range(len(pdf_reader.pages)):
-        page = pdf_reader.pages[page_num]
-        extracted_page_text = page.extract_text()
-        text_content += extracted_page_text + " "
-
-    path_to_save = f"{get_root_path()}/annotations/temporary_{room_id}.pdf"
-    # save the file to `path_to_save`
-    with open(path_to_save, "wb") as f:
-        f.write(file_data_response.content)
-    logger.info(f"Extracted text content from PDF file in {time() - start}")
+    pdf_info = await get_pdf_info(document)
+    details: dict
+    if stream:
+        details = {"pages": _iter_pdf_file_pages(document, pdf_info.page_count)}
+    else:
+        text_content = await extract_pdf_text(document, pdf_info.page_count)
+        logger.info(f"Extracted text content from PDF file in {time() - start}")
+        details = {"content": text_content}
 
     if not get_urn:
-        return {"content": text_content}
+        return details
+
+    if not stream:
+        details["content"] = details["content"] or "Empty PDF file."
+    details["urn"] = await _get_pdf_urn(pdf_info, url, room_id)
+    return details
+
+
+async def _iter_pdf_file_pages(
+    document: PdfDocument, page_count: int
+) -> AsyncIterator[str]:
+    """
+    Pages of the PDF `document`, which is closed once done or once the
+    iterator is garbage collected
+    """
+    with document:
+        async for page in iter_pdf_pages(document, page_count):
+            yield page
 
+
+async def _get_pdf_urn(pdf_info: PdfInfo, url: str, room_id: str) -> str:
     # Calculate the fingerprint
     start = time()
     logger.info("Calculating the fingerprint for the PDF file")
     if room_id:
-        await pub_sub_manager.publish(
-            room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id,
-                    date=datetime.now().isoformat(),
-                    api="Fingerprint creation",
-                    type="sent",
-                    elapsed_time=time() - start,
-                    data={
-                        "url": url,
-                    },
-                ).model_dump(
-                    mode="json",
-                    exclude={
-                        "model",
-                    },
-                )
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id,
+                date=datetime.now().isoformat(),
+                api="Fingerprint creation",
+                type="sent",
+                elapsed_time=time() - start,
+                data={
+                    "url": url,
+                },
             ),
+            exclude={"model"},
         )
 
-    urn_fp = fingerprint(path_to_save)
+    urn_fp = pdf_info.fingerprint
 
-    # urn_fp = fingerprint_pypdf2(pdf_reader)
-    # urn_fp = fingerprint_fitz(path_to_save)
     # Construct the URN
     urn = f"urn:x-pdf:{urn_fp}"
     logger.info(f"Fingerprint for the PDF file: {urn} in {time() - start}")
 
     if room_id:
-        await pub_sub_manager.publish(
-            room_id,
-            json.dumps(
-                APIInfoBroadcastData(
-                    room_id=room_id,
-                    date=datetime.now().isoformat(),
-                    api="Fingerprint creation",
-                    type="recd",
-                    elapsed_time=time() - start,
-                    data={
-                        "urn": urn,
-                    },
-                ).model_dump(
-                    mode="json",
-                    exclude={
-                        "model",
-                    },
-                )
+        await publish_api_info(
+            APIInfoBroadcastData(
+                room_id=room_id,
+                date=datetime.now().isoformat(),
+                api="Fingerprint creation",
+                type="recd",
+                elapsed_time=time() - start,
+                data={
+                    "urn": urn,
+                },
             ),
+            exclude={"model"},
         )
 
-    # delete the file
-    os.remove(path_to_save)
-
-    return {
-        "content": text_content or "Empty PDF file.",
-        "urn": urn,
-    }
+    return urn
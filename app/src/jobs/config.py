@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings
+
+
+class JobsConfig(BaseSettings):
+    JOBS_STREAM_PREFIX: str = "jobs"
+    JOBS_CONSUMER_GROUP: str = "workers"
+    JOBS_STREAM_MAXLEN: int = 10_000
+
+    JOBS_CONCURRENCY: int = 200
+    JOBS_BLOCK_MS: int = 5_000
+    JOBS_VISIBILITY_TIMEOUT: int = 60  # seconds
+    JOBS_MAX_RETRIES: int = 3
+    JOBS_CANCEL_TTL: int = 60 * 60  # seconds
+    JOBS_SHUTDOWN_TIMEOUT: int = 30  # seconds
+
+
+@lru_cache()
+def get_settings():
+    return JobsConfig()
+
+
+settings = get_settings()
@@ -0,0 +1,15 @@
+from src.jobs.config import settings
+
+JOBS_CANCEL_CHANNEL = f"{settings.JOBS_STREAM_PREFIX}:cancel"
+
+
+def get_stream_name(job_name: str) -> str:
+    return f"{settings.JOBS_STREAM_PREFIX}:{job_name}"
+
+
+def get_dead_letter_stream_name(job_name: str) -> str:
+    return f"{settings.JOBS_STREAM_PREFIX}:{job_name}:dead"
+
+
+def get_cancelled_key(job_id: str) -> str:
+    return f"{settings.JOBS_STREAM_PREFIX}:cancelled:{job_id}"
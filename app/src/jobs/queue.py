@@ -0,0 +1,40 @@
+import json
+import logging
+from uuid import uuid4
+
+from src.jobs.config import settings
+from src.jobs.constants import JOBS_CANCEL_CHANNEL, get_cancelled_key, get_stream_name
+from src.redis_client import pub_sub_manager
+from src.tracing import TRACEPARENT_HEADER, get_traceparent
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_job(job_name: str, payload: dict, job_id: str | None = None) -> str:
+    """
+    Add a job to its Redis stream and return the job id
+    """
+    job_id = job_id or uuid4().hex
+    fields = {"job_id": job_id, "payload": json.dumps(payload), "attempt": 0}
+    # the runner continues the trace of the code which enqueued the job
+    traceparent = get_traceparent()
+    if traceparent:
+        fields[TRACEPARENT_HEADER] = traceparent
+    await pub_sub_manager.get_connection().xadd(
+        get_stream_name(job_name),
+        fields,  # type: ignore[arg-type]
+        maxlen=settings.JOBS_STREAM_MAXLEN,
+        approximate=True,
+    )
+    logger.info(f"Job {job_name} enqueued with id {job_id}")
+    return job_id
+
+
+async def cancel_job(job_id: str) -> None:
+    """
+    Cancel a running job, or skip it once it gets picked up
+    """
+    redis = pub_sub_manager.get_connection()
+    await redis.set(get_cancelled_key(job_id), 1, ex=settings.JOBS_CANCEL_TTL)
+    await redis.publish(JOBS_CANCEL_CHANNEL, job_id)
+    logger.info(f"Job {job_id} cancellation requested")
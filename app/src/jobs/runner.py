@@ -0,0 +1,287 @@
+"""
+asyncio-native job runner on top of Redis Streams consumer groups
+
+Each job type has its own stream. A runner process reads entries with
+XREADGROUP and runs up to JOBS_CONCURRENCY handlers at once on one loop.
+An entry is acknowledged once its handler returns. Entries left pending
+for longer than JOBS_VISIBILITY_TIMEOUT (a consumer died) are claimed
+again with XAUTOCLAIM, so running jobs refresh their idle time with a
+heartbeat. Failed jobs are re-enqueued up to their retry limit and then
+moved to a dead-letter stream. Jobs are cancelled by id over pub/sub.
+Jobs run in a span continuing the trace of the code which enqueued them.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from src.jobs.config import settings
+from src.jobs.constants import (
+    JOBS_CANCEL_CHANNEL,
+    get_cancelled_key,
+    get_dead_letter_stream_name,
+    get_stream_name,
+)
+from src.metrics import observe_task
+from src.tracing import TRACEPARENT_HEADER, start_span
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+
+
+@dataclass
+class JobDefinition:
+    name: str
+    handler: JobHandler
+    max_retries: int
+
+
+@dataclass
+class RunningJob:
+    job_name: str
+    entry_id: str
+    job_id: str
+    task: asyncio.Task
+
+
+class JobRunner:
+    def __init__(self, redis: Redis, consumer_name: str | None = None) -> None:
+        self.redis = redis
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self.jobs: dict[str, JobDefinition] = {}
+        self.running: dict[str, RunningJob] = {}  # by job id
+        self._slots = asyncio.Semaphore(settings.JOBS_CONCURRENCY)
+        self._stopping = asyncio.Event()
+
+    def register(
+        self, name: str, handler: JobHandler, max_retries: int | None = None
+    ) -> None:
+        self.jobs[name] = JobDefinition(
+            name=name,
+            handler=handler,
+            max_retries=(
+                settings.JOBS_MAX_RETRIES if max_retries is None else max_retries
+            ),
+        )
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        for job_name in self.jobs:
+            await self._create_group(job_name)
+
+        logger.info(
+            f"Job runner {self.consumer_name} started for: {', '.join(self.jobs)}"
+        )
+        workers = [
+            asyncio.create_task(self._listen_for_cancellations()),
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._reclaim_stale_jobs()),
+        ]
+        try:
+            await self._consume()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await self._drain()
+            logger.info(f"Job runner {self.consumer_name} stopped")
+
+    async def _create_group(self, job_name: str) -> None:
+        try:
+            await self.redis.xgroup_create(
+                get_stream_name(job_name),
+                settings.JOBS_CONSUMER_GROUP,
+                id="0",
+                mkstream=True,
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _consume(self) -> None:
+        streams = {get_stream_name(job_name): ">" for job_name in self.jobs}
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            # read as many entries as there are free slots
+            free_slots = max(settings.JOBS_CONCURRENCY - len(self.running), 1)
+            try:
+                response = await self.redis.xreadgroup(
+                    settings.JOBS_CONSUMER_GROUP,
+                    self.consumer_name,
+                    streams,  # type: ignore[arg-type]
+                    count=free_slots,
+                    block=settings.JOBS_BLOCK_MS,
+                )
+            except Exception:
+                self._slots.release()
+                raise
+
+            entries = [
+                (stream, entry_id, fields)
+                for stream, stream_entries in response or []
+                for entry_id, fields in stream_entries
+            ]
+            if not entries:
+                self._slots.release()
+                continue
+
+            for index, (stream, entry_id, fields) in enumerate(entries):
+                # the first entry uses the slot acquired above
+                if index:
+                    await self._slots.acquire()
+                self._start(self._job_name_from_stream(stream), entry_id, fields)
+
+    def _job_name_from_stream(self, stream: str) -> str:
+        return stream.removeprefix(f"{settings.JOBS_STREAM_PREFIX}:")
+
+    def _start(self, job_name: str, entry_id: str, fields: dict) -> None:
+        job_id = fields.get("job_id", entry_id)
+        task = asyncio.create_task(self._execute(job_name, entry_id, fields))
+        self.running[job_id] = RunningJob(job_name, entry_id, job_id, task)
+
+    async def _execute(self, job_name: str, entry_id: str, fields: dict) -> None:
+        job = self.jobs[job_name]
+        job_id = fields.get("job_id", entry_id)
+        attempt = int(fields.get("attempt", 0))
+        started_at: float | None = None
+        state = "success"
+        try:
+            if await self.redis.exists(get_cancelled_key(job_id)):
+                logger.info(f"Job {job_name} {job_id} was cancelled before start")
+                return
+
+            logger.info(f"Job {job_name} {job_id} started (attempt {attempt})")
+            started_at = time.perf_counter()
+            with start_span(
+                f"job {job_name}", fields.get(TRACEPARENT_HEADER), job_id=job_id
+            ):
+                await job.handler(json.loads(fields["payload"]))
+            logger.info(f"Job {job_name} {job_id} finished")
+        except asyncio.CancelledError:
+            state = "cancelled"
+            logger.info(f"Job {job_name} {job_id} cancelled")
+            if self._stopping.is_set() and not await self._is_cancelled(job_id):
+                # shutting down, leave it pending for another consumer
+                return
+        except Exception as e:
+            state = "failure"
+            logger.exception(f"Job {job_name} {job_id} failed: {e}")
+            await self._retry_or_bury(job, fields, attempt, str(e))
+        finally:
+            if started_at is not None:
+                observe_task("jobs", job_name, state, time.perf_counter() - started_at)
+            self.running.pop(job_id, None)
+            self._slots.release()
+
+        await self.redis.xack(
+            get_stream_name(job_name), settings.JOBS_CONSUMER_GROUP, entry_id
+        )
+
+    async def _is_cancelled(self, job_id: str) -> bool:
+        return bool(await self.redis.exists(get_cancelled_key(job_id)))
+
+    async def _retry_or_bury(
+        self, job: JobDefinition, fields: dict, attempt: int, reason: str
+    ) -> None:
+        if attempt < job.max_retries:
+            logger.info(f"Retrying job {job.name} {fields.get('job_id')}")
+            await self.redis.xadd(
+                get_stream_name(job.name),
+                {**fields, "attempt": attempt + 1},
+                maxlen=settings.JOBS_STREAM_MAXLEN,
+                approximate=True,
+            )
+            return
+
+        logger.error(f"Job {job.name} {fields.get('job_id')} moved to dead letters")
+        await self.redis.xadd(
+            get_dead_letter_stream_name(job.name),
+            {**fields, "reason": reason},
+            maxlen=settings.JOBS_STREAM_MAXLEN,
+            approximate=True,
+        )
+
+    async def _listen_for_cancellations(self) -> None:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(JOBS_CANCEL_CHANNEL)
+        try:
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if not message:
+                    continue
+                running_job = self.running.get(message["data"])
+                if running_job:
+                    running_job.task.cancel()
+        finally:
+            await pubsub.unsubscribe(JOBS_CANCEL_CHANNEL)
+            await pubsub.close()
+
+    async def _heartbeat(self) -> None:
+        """
+        Reset the idle time of running jobs so they are not claimed again
+        """
+        while True:
+            await asyncio.sleep(settings.JOBS_VISIBILITY_TIMEOUT / 3)
+            for job in list(self.running.values()):
+                await self.redis.xclaim(
+                    get_stream_name(job.job_name),
+                    settings.JOBS_CONSUMER_GROUP,
+                    self.consumer_name,
+                    min_idle_time=0,
+                    message_ids=[job.entry_id],
+                    justid=True,
+                )
+
+    async def _reclaim_stale_jobs(self) -> None:
+        """
+        Retry jobs of consumers which stopped without acknowledging them
+        """
+        while True:
+            await asyncio.sleep(settings.JOBS_VISIBILITY_TIMEOUT)
+            for job in self.jobs.values():
+                stream = get_stream_name(job.name)
+                _, entries, *_ = await self.redis.xautoclaim(
+                    stream,
+                    settings.JOBS_CONSUMER_GROUP,
+                    self.consumer_name,
+                    min_idle_time=settings.JOBS_VISIBILITY_TIMEOUT * 1000,
+                )
+                for entry_id, fields in entries:
+                    if not fields:
+                        # trimmed from the stream in the meantime
+                        await self.redis.xack(
+                            stream, settings.JOBS_CONSUMER_GROUP, entry_id
+                        )
+                        continue
+                    logger.warning(f"Reclaimed stale job {job.name} {entry_id}")
+                    await self._retry_or_bury(
+                        job,
+                        fields,
+                        int(fields.get("attempt", 0)),
+                        "visibility timeout",
+                    )
+                    await self.redis.xack(
+                        stream, settings.JOBS_CONSUMER_GROUP, entry_id
+                    )
+
+    async def _drain(self) -> None:
+        if not self.running:
+            return
+
+        tasks = [job.task for job in self.running.values()]
+        logger.info(f"Waiting for {len(tasks)} running jobs")
+        _, pending = await asyncio.wait(tasks, timeout=settings.JOBS_SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
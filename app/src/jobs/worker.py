@@ -0,0 +1,52 @@
+"""
+Job runner process: python -m src.jobs.worker
+"""
+import asyncio
+import logging
+import signal
+
+from src.chat.bot_ai import create_bot_answer_job
+from src.chat.constants import BOT_ANSWER_JOB
+from src.chat.generation import generation_registry
+from src.config import settings
+from src.database import database
+from src.jobs.runner import JobRunner
+from src.metrics import start_metrics_server
+from src.redis_client import pub_sub_manager
+from src.scraping.async_downloader import async_downloader
+from src.user_models.clients import llm_client_pool
+
+logger = logging.getLogger(__name__)
+
+
+def register_jobs(runner: JobRunner) -> None:
+    # a re-run after the answer started streaming would post a second bot
+    # message in the room, failed or reclaimed answers go to dead letters
+    runner.register(BOT_ANSWER_JOB, create_bot_answer_job, max_retries=0)
+
+
+async def main() -> None:
+    start_metrics_server(settings.METRICS_PORT)
+    await database.connect()
+    logger.info("Connected to database")
+
+    runner = JobRunner(pub_sub_manager.get_connection())
+    register_jobs(runner)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, runner.stop)
+
+    try:
+        await runner.run()
+    finally:
+        await generation_registry.close()
+        await async_downloader.close()
+        await llm_client_pool.close()
+        await pub_sub_manager.disconnect()
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+import logging
+from datetime import datetime, timedelta
+
+import pytz
+from fastapi import APIRouter, Depends, Query
+
+from src.auth.jwt import parse_jwt_user_data, parse_jwt_user_data_optional
+from src.auth.schemas import JWTData
+from src.chat.exceptions import RoomDoesNotExist
+from src.chat.validators import user_can_access_room
+from src.latency.schemas import LatencyDashboard
+from src.latency.service import (
+    get_room_latency_dashboard,
+    get_user_latency_dashboard,
+)
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+def get_since(days: int = Query(7, ge=1, le=90)) -> datetime:
+    return datetime.now(pytz.utc) - timedelta(days=days)
+
+
+@router.get("/models", response_model=LatencyDashboard)
+async def get_models_latency(
+    since: datetime = Depends(get_since),
+    jwt_data: JWTData = Depends(parse_jwt_user_data),
+):
+    """
+    Latency of the answers to the user's messages, per model
+    """
+    return await get_user_latency_dashboard(jwt_data.user_id, since)
+
+
+@router.get("/rooms/{room_id}", response_model=LatencyDashboard)
+async def get_room_latency(
+    room_id: str,
+    since: datetime = Depends(get_since),
+    jwt_data: JWTData | None = Depends(parse_jwt_user_data_optional),
+):
+    """
+    Latency of the answers in the room, per model
+    """
+    if not await user_can_access_room(room_id, jwt_data.user_id if jwt_data else None):
+        raise RoomDoesNotExist()
+
+    return await get_room_latency_dashboard(room_id, since)
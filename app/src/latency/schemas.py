@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class MessageGenerationInput(BaseModel):
+    message_uuid: str
+    room_id: str
+    user_id: int
+    provider: str
+    model: str
+    # seconds
+    time_to_first_token: float
+    mean_chunk_gap: float | None = None
+    max_chunk_gap: float | None = None
+    chunks: int
+    tokens: int
+    tokens_per_second: float | None = None
+    duration: float
+
+
+class LatencyStats(BaseModel):
+    model: str | None = None  # None for all the models together
+    messages: int
+    time_to_first_token_avg: float | None = None
+    time_to_first_token_p50: float | None = None
+    time_to_first_token_p95: float | None = None
+    mean_chunk_gap_avg: float | None = None
+    max_chunk_gap_p95: float | None = None
+    tokens_per_second_avg: float | None = None
+    tokens_per_second_p50: float | None = None
+    duration_avg: float | None = None
+    duration_p95: float | None = None
+
+
+class LatencyDashboard(BaseModel):
+    since: datetime
+    total: LatencyStats
+    models: list[LatencyStats]
@@ -0,0 +1,83 @@
+from datetime import datetime
+from logging import getLogger
+
+from databases.interfaces import Record
+from sqlalchemy import func, insert, select
+
+from src.database import MessageGeneration, database
+from src.latency.schemas import LatencyDashboard, LatencyStats, MessageGenerationInput
+
+logger = getLogger(__name__)
+
+
+async def create_message_generation_in_db(
+    generation: MessageGenerationInput,
+) -> Record | None:
+    insert_query = (
+        insert(MessageGeneration)
+        .values(**generation.model_dump())
+        .returning(MessageGeneration)
+    )
+    return await database.fetch_one(insert_query)
+
+
+def _percentile(fraction: float, column):
+    return func.percentile_cont(fraction).within_group(column)
+
+
+async def get_latency_dashboard(since: datetime, *conditions) -> LatencyDashboard:
+    """
+    Latency stats of the messages generated since `since`, per model and for
+    all the models together
+    """
+    select_query = (
+        select(
+            MessageGeneration.model,
+            func.count().label("messages"),
+            func.avg(MessageGeneration.time_to_first_token).label(
+                "time_to_first_token_avg"
+            ),
+            _percentile(0.5, MessageGeneration.time_to_first_token).label(
+                "time_to_first_token_p50"
+            ),
+            _percentile(0.95, MessageGeneration.time_to_first_token).label(
+                "time_to_first_token_p95"
+            ),
+            func.avg(MessageGeneration.mean_chunk_gap).label("mean_chunk_gap_avg"),
+            _percentile(0.95, MessageGeneration.max_chunk_gap).label(
+                "max_chunk_gap_p95"
+            ),
+            func.avg(MessageGeneration.tokens_per_second).label(
+                "tokens_per_second_avg"
+            ),
+            _percentile(0.5, MessageGeneration.tokens_per_second).label(
+                "tokens_per_second_p50"
+            ),
+            func.avg(MessageGeneration.duration).label("duration_avg"),
+            _percentile(0.95, MessageGeneration.duration).label("duration_p95"),
+        )
+        .where(MessageGeneration.created_at >= since, *conditions)
+        # the row without a model sums up all the models
+        .group_by(func.rollup(MessageGeneration.model))
+        .order_by(MessageGeneration.model)
+    )
+    rows = await database.fetch_all(select_query)
+
+    total = LatencyStats(messages=0)
+    models: list[LatencyStats] = []
+    for row in rows:
+        stats = LatencyStats(**dict(row))
+        if stats.model is None:
+            total = stats
+        else:
+            models.append(stats)
+
+    return LatencyDashboard(since=since, total=total, models=models)
+
+
+async def get_room_latency_dashboard(room_id: str, since: datetime) -> LatencyDashboard:
+    return await get_latency_dashboard(since, MessageGeneration.room_id == room_id)
+
+
+async def get_user_latency_dashboard(user_id: int, since: datetime) -> LatencyDashboard:
+    return await get_latency_dashboard(since, MessageGeneration.user_id == user_id)
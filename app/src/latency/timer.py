@@ -0,0 +1,54 @@
+"""
+Latency and throughput of a streamed bot message
+
+The chunks are marked once, by the LLM request timer of the model stream,
+so the gaps between them don't include the database writes and broadcasts
+of each chunk. The time to first token is measured from the moment the
+answer was requested, so it includes what the user waits for before the
+model starts, such as loading the history. Tokens per second cover the
+stream after the first chunk, so they measure the model's throughput alone.
+"""
+import time
+
+from src.latency.schemas import MessageGenerationInput
+from src.metrics import LLMRequestTimer
+
+
+class GenerationTimer:
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        # set by the stream once the LLM request starts
+        self.llm: LLMRequestTimer | None = None
+
+    def get_input(
+        self,
+        message_uuid: str,
+        room_id: str,
+        user_id: int,
+        provider: str,
+        model: str,
+        tokens: int,
+    ) -> MessageGenerationInput | None:
+        """
+        Stats of the message, None when nothing was streamed
+        """
+        llm = self.llm
+        if llm is None or llm.first_chunk_at is None or llm.last_chunk_at is None:
+            return None
+
+        streaming_time = llm.last_chunk_at - llm.first_chunk_at
+        gaps = llm.chunks - 1
+        return MessageGenerationInput(
+            message_uuid=message_uuid,
+            room_id=room_id,
+            user_id=user_id,
+            provider=provider.lower(),
+            model=model,
+            time_to_first_token=llm.first_chunk_at - self.started_at,
+            mean_chunk_gap=llm.gaps_total / gaps if gaps else None,
+            max_chunk_gap=llm.max_gap if gaps else None,
+            chunks=llm.chunks,
+            tokens=tokens,
+            tokens_per_second=tokens / streaming_time if streaming_time > 0 else None,
+            duration=llm.last_chunk_at - self.started_at,
+        )
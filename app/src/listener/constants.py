@@ -3,6 +3,15 @@ template_changed_info = "template-changed"
 bot_message_creation_finished_info = "bot-message-creation-finished"
 user_file_updated_info = "user-file-updated"
 optimizing_user_file_content_info = "optimizing-user-file-content"
-listener_room_name = "listener"
 stop_generation_finished_info = "stop-generation-finished"
 user_model_changed_info = "user-model-changed"
+ping_info = "ping"
+pong_info = "pong"
+
+# invalidations, clients refetch once for a burst of them
+coalesced_event_types = (
+    room_changed_info,
+    template_changed_info,
+    user_file_updated_info,
+    user_model_changed_info,
+)
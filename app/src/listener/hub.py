@@ -0,0 +1,285 @@
+"""
+Listener hub
+
+Every listener websocket is served by a ListenerConnection with its own send
+queue, so a slow client never holds up the others. The hub keeps one Redis
+subscription per topic (see src.listener.topics), shared by all the
+connections of the process, and a single reader task that hands the
+messages of a topic only to its connections.
+
+Connections are pinged every LISTENER_PING_INTERVAL and closed when the
+client has sent nothing, not even a pong, for LISTENER_IDLE_TIMEOUT.
+Invalidation events with the same type and id are coalesced per connection:
+the latest one of a burst is sent LISTENER_COALESCE_WINDOW after the first,
+so clients refetch once per burst of writes, also when an event reaches
+them through several topics.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from pydantic import ValidationError
+from redis.asyncio.client import PubSub
+from starlette import status
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from src.config import settings
+from src.listener.constants import coalesced_event_types, ping_info, pong_info
+from src.listener.schemas import ListenerClientMessage, WSEventMessage
+from src.metrics import WEBSOCKET_SEND_QUEUE_DEPTH, track_websocket
+from src.redis_client import pub_sub_manager
+from src.serialization import json_loads
+
+logger = logging.getLogger(__name__)
+
+PING_MESSAGE = WSEventMessage(type=ping_info).model_dump_json()
+PONG_MESSAGE = WSEventMessage(type=pong_info).model_dump_json()
+
+
+class ListenerConnection:
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue(
+            maxsize=settings.LISTENER_QUEUE_SIZE
+        )
+        self.last_received = time.monotonic()
+        self.overflowed = asyncio.Event()
+        # latest payload and scheduled flush of every coalesced (type, id)
+        self._coalesced: dict[tuple[str, str | None], str] = {}
+        self._flushes: dict[tuple[str, str | None], asyncio.TimerHandle] = {}
+
+    def push(self, data: str, event: dict) -> None:
+        if event.get("type") not in coalesced_event_types:
+            self._enqueue(data)
+            return
+
+        key = (event["type"], event.get("id"))
+        if key not in self._coalesced:
+            self._flushes[key] = asyncio.get_running_loop().call_later(
+                settings.LISTENER_COALESCE_WINDOW, self._flush, key
+            )
+        self._coalesced[key] = data
+
+    def _flush(self, key: tuple[str, str | None]) -> None:
+        self._flushes.pop(key, None)
+        data = self._coalesced.pop(key, None)
+        if data is not None:
+            self._enqueue(data)
+
+    def _enqueue(self, data: str) -> None:
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # the client can't keep up, it catches up after reconnecting
+            self.overflowed.set()
+            return
+        WEBSOCKET_SEND_QUEUE_DEPTH.inc()
+
+    async def _send_events(self) -> None:
+        while True:
+            data = await self.queue.get()
+            WEBSOCKET_SEND_QUEUE_DEPTH.dec()
+            await self.websocket.send_text(data)
+
+    async def _receive(
+        self, on_message: Callable[[ListenerClientMessage], Awaitable[None]]
+    ) -> None:
+        while True:
+            data = await self.websocket.receive_text()
+            self.last_received = time.monotonic()
+            try:
+                message = ListenerClientMessage.model_validate_json(data)
+            except ValidationError as e:
+                logger.warning(f"Invalid listener message: {e}")
+                continue
+
+            if message.type == ping_info:
+                self._enqueue(PONG_MESSAGE)
+            elif message.type != pong_info:
+                await on_message(message)
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(settings.LISTENER_PING_INTERVAL)
+            if time.monotonic() - self.last_received > settings.LISTENER_IDLE_TIMEOUT:
+                return
+            self._enqueue(PING_MESSAGE)
+
+    async def run(
+        self, on_message: Callable[[ListenerClientMessage], Awaitable[None]]
+    ) -> None:
+        """
+        Serves the connection until the client disconnects, goes idle or
+        falls behind
+        """
+        keep_alive = asyncio.create_task(self._keep_alive())
+        tasks = [
+            asyncio.create_task(self._receive(on_message)),
+            asyncio.create_task(self._send_events()),
+            asyncio.create_task(self.overflowed.wait()),
+            keep_alive,
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for handle in self._flushes.values():
+                handle.cancel()
+            self._flushes.clear()
+            self._coalesced.clear()
+            WEBSOCKET_SEND_QUEUE_DEPTH.dec(self.queue.qsize())
+
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(
+                result, WebSocketDisconnect
+            ):
+                logger.warning(f"Listener connection failed: {result!r}")
+
+        if self.overflowed.is_set():
+            logger.warning("Closing listener connection that fell behind")
+            await self._close(status.WS_1013_TRY_AGAIN_LATER)
+        elif keep_alive.done() and not keep_alive.cancelled():
+            logger.info("Closing idle listener connection")
+            await self._close(status.WS_1001_GOING_AWAY)
+
+    async def _close(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+# handles the client messages of a connection other than ping and pong
+MessageHandler = Callable[[ListenerConnection, ListenerClientMessage], Awaitable[None]]
+
+
+class ListenerHub:
+    def __init__(self) -> None:
+        self.connections: dict[str, set[ListenerConnection]] = {}
+        self.topics: dict[ListenerConnection, set[str]] = {}
+        self._pubsub: PubSub | None = None
+        self._reader: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def serve(
+        self,
+        websocket: WebSocket,
+        topics: list[str],
+        on_message: MessageHandler | None = None,
+        endpoint: str = "listener",
+    ) -> None:
+        """
+        Serves an accepted websocket subscribed to the topics, client
+        messages other than ping and pong are passed to `on_message`
+
+        `endpoint` labels the connection in the websocket metrics.
+        """
+        connection = ListenerConnection(websocket)
+
+        async def handle_message(message: ListenerClientMessage) -> None:
+            if on_message:
+                await on_message(connection, message)
+
+        with track_websocket(endpoint):
+            await self.subscribe(connection, *topics)
+            try:
+                await connection.run(handle_message)
+            finally:
+                await self.remove(connection)
+
+    def get_topics(self, connection: ListenerConnection) -> set[str]:
+        return set(self.topics.get(connection, set()))
+
+    async def subscribe(self, connection: ListenerConnection, *topics: str) -> None:
+        async with self._lock:
+            new_topics = []
+            for topic in topics:
+                connections = self.connections.setdefault(topic, set())
+                if not connections:
+                    new_topics.append(topic)
+                connections.add(connection)
+                self.topics.setdefault(connection, set()).add(topic)
+
+            if new_topics:
+                if self._pubsub is None:
+                    self._pubsub = pub_sub_manager.get_connection().pubsub()
+                await self._pubsub.subscribe(*new_topics)
+                self._ensure_reader()
+
+    async def unsubscribe(self, connection: ListenerConnection, *topics: str) -> None:
+        async with self._lock:
+            unused_topics = []
+            connection_topics = self.topics.get(connection, set())
+            for topic in topics:
+                connection_topics.discard(topic)
+                connections = self.connections.get(topic)
+                if connections is None:
+                    continue
+                connections.discard(connection)
+                if not connections:
+                    del self.connections[topic]
+                    unused_topics.append(topic)
+
+            if not connection_topics:
+                self.topics.pop(connection, None)
+            if unused_topics and self._pubsub is not None:
+                await self._pubsub.unsubscribe(*unused_topics)
+
+    async def remove(self, connection: ListenerConnection) -> None:
+        await self.unsubscribe(connection, *self.get_topics(connection))
+
+    def _ensure_reader(self) -> None:
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(  # type: ignore
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except Exception as e:
+                # the reader serves every listener of the process, so it
+                # keeps going whatever the error
+                logger.error(f"Failed to read listener topics from Redis: {e!r}")
+                await asyncio.sleep(1)
+                continue
+
+            if not message:
+                continue
+            try:
+                self._deliver(message["channel"], message["data"])
+            except Exception as e:
+                logger.error(f"Failed to deliver listener event: {e!r}")
+
+    def _deliver(self, topic: str, data: str) -> None:
+        connections = self.connections.get(topic)
+        if not connections:
+            return
+
+        # parsed once for all connections, the payload is forwarded as it is
+        try:
+            event = json_loads(data)
+        except ValueError as e:
+            logger.error(f"Invalid listener event on {topic}: {e}")
+            return
+
+        for connection in list(connections):
+            connection.push(data, event)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+        self.connections.clear()
+        self.topics.clear()
+
+
+listener_hub = ListenerHub()
@@ -1,5 +1,4 @@
 import asyncio
-import json
 import logging
 
 from redis.exceptions import ConnectionError
@@ -8,9 +7,11 @@ from starlette.websockets import WebSocket, WebSocketState
 from src.auth.schemas import UserDB
 from src.config import settings
 from src.constants import Environment
-from src.listener.constants import listener_room_name, room_changed_info
+from src.listener.constants import room_changed_info
 from src.listener.schemas import WSEventMessage
+from src.listener.topics import publish_room_event
 from src.redis_client import pub_sub_manager
+from src.serialization import get_sender_email, json_dumps
 
 logger = logging.getLogger(__name__)
 
@@ -37,18 +38,10 @@ class WebSocketManager:
         if settings.ENVIRONMENT == Environment.DEBUG:
             return
 
-        logger.info("Adding info to global listener room that a room has changed")
-        logger.info("Rooms in listener room: %s", self.rooms)
-        await self.pubsub_client.publish(
-            listener_room_name,
-            json.dumps(
-                WSEventMessage(
-                    type=room_changed_info,
-                    id=room_id,
-                ).model_dump(mode="json")
-            ),
+        # the active users of the room changed
+        await publish_room_event(
+            room_id, WSEventMessage(type=room_changed_info, id=room_id)
         )
-        logger.info("Added info to global listener room that a room has changed")
 
         if room_id in self.rooms:
             # check if user is already in the room, no matter what the websocket is
@@ -94,7 +87,7 @@ class WebSocketManager:
         room_connections = self.rooms.get(room_id, [])
         for room_user, _ in room_connections:
             logger.info(f"Sending user joined message to {room_user.email}")
-            message = json.dumps(
+            message = json_dumps(
                 {
                     "type": "user_joined",
                     "user_email": room_user.email,
@@ -142,19 +135,13 @@ class WebSocketManager:
                     ]
                     break
 
-            await self.pubsub_client.publish(
-                listener_room_name,
-                json.dumps(
-                    WSEventMessage(
-                        type=room_changed_info,
-                        id=room_id,
-                    ).model_dump(mode="json")
-                ),
+            await publish_room_event(
+                room_id, WSEventMessage(type=room_changed_info, id=room_id)
             )
 
             room_connections = self.rooms.get(room_id, [])
             for room_user, _ in room_connections:
-                message = json.dumps(
+                message = json_dumps(
                     {
                         "type": "user_left",
                         "user_email": user.email,
@@ -172,23 +159,27 @@ class WebSocketManager:
     async def _pubsub_data_reader(self, pubsub_subscriber):
         while True:
             try:
-                message = await pubsub_subscriber.get_message(ignore_subscribe_messages=True)
+                message = await pubsub_subscriber.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
                 if message is None:
                     continue
 
-                logger.info(f"Received message from {message['channel']}: {message['data']}")
+                logger.debug("Received message from %s", message["channel"])
                 room_id = message["channel"]
-                data = json.loads(message["data"])
+                # the payload is forwarded as it is, only the sender is decoded
+                data = message["data"]
+                sender_email = get_sender_email(data)
 
                 # Broadcast to all connections in the room
                 for connection in self.rooms.get(room_id, []):
                     conn_user, socket = connection
                     has_email = hasattr(conn_user, "email")
-                    if has_email and conn_user.email == data.get("sender_user_email"):
+                    if has_email and sender_email and conn_user.email == sender_email:
                         continue  # Skip sending the message back to the sender
 
                     if socket.application_state == WebSocketState.CONNECTED:
-                        await socket.send_json(data)
+                        await socket.send_text(data)
 
             except ConnectionError as e:
                 logger.error(f"Failed to read from Redis: {e}")
@@ -1,27 +1,65 @@
-import asyncio
 import logging
 
-from fastapi import APIRouter
-from starlette.websockets import WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, status
+from starlette.websockets import WebSocket
 
-from src.listener.constants import listener_room_name
-from src.listener.manager import ws_manager
+from src.auth.context import AuthContext, get_auth_context_by_user_id
+from src.auth.exceptions import UserNotFound
+from src.auth.service import get_user_by_token
+from src.chat.validators import user_can_access_room
+from src.listener.hub import ListenerConnection, listener_hub
+from src.listener.schemas import ListenerClientMessage
+from src.listener.topics import get_auth_context_topics, room_topic
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
 
+async def subscribe_to_room(
+    connection: ListenerConnection, auth: AuthContext, room_id: str
+) -> None:
+    if not await user_can_access_room(room_id, auth.user_id):
+        logger.info(f"User {auth.user_id} cannot listen to room {room_id}")
+        return
+
+    await listener_hub.subscribe(connection, room_topic(room_id))
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    await ws_manager.add_user_to_room(room_id=listener_room_name, websocket=websocket)
-    q: asyncio.Queue = asyncio.Queue(maxsize=1000)
+    """
+    Pushes the listener events of the user and of the user's organizations
+
+    Events of a room are pushed after the client sends
+    {"type": "subscribe", "room_id": ...}, until it sends "unsubscribe".
+    The server sends {"type": "ping"} regularly and closes the connection
+    when the client sends nothing for LISTENER_IDLE_TIMEOUT, so clients
+    answer with {"type": "pong"}, or ping on their own.
+    """
     try:
-        while True:
-            data = await q.get()
-            await websocket.send_json(data)
-    except WebSocketDisconnect:
-        await ws_manager.remove_user_from_room(
-            room_id=listener_room_name, websocket=websocket
-        )
+        user_db = await get_user_by_token(websocket.query_params.get("token"))
+    except UserNotFound:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    auth = await get_auth_context_by_user_id(user_db.id)
+    if not auth:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    async def on_message(
+        connection: ListenerConnection, message: ListenerClientMessage
+    ) -> None:
+        if not message.room_id:
+            return
+
+        room_id = str(message.room_id)
+        if message.type == "subscribe":
+            await subscribe_to_room(connection, auth, room_id)
+        else:
+            await listener_hub.unsubscribe(connection, room_topic(room_id))
+
+    await websocket.accept()
+    await listener_hub.serve(websocket, get_auth_context_topics(auth), on_message)
+    logger.info(f"Listener of user {auth.user_id} disconnected")
@@ -1,7 +1,19 @@
-from pydantic import BaseModel
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from src.tracing import get_trace_id
 
 
 class WSEventMessage(BaseModel):
     type: str
     id: str | None = None
     source: str | None = None
+    # trace of the request which caused the event
+    trace_id: str | None = Field(default_factory=get_trace_id)
+
+
+class ListenerClientMessage(BaseModel):
+    type: Literal["subscribe", "unsubscribe", "ping", "pong"]
+    room_id: UUID | None = None
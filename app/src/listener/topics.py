@@ -0,0 +1,105 @@
+"""
+Listener topics
+
+Listener events are published only on the topics of the clients whose
+visible data changed: a user's own data on the user topic, data shared with
+an organization on the organization topic, and room changes also on the
+room topic, which clients subscribe to while they have the room open.
+"""
+from logging import getLogger
+from typing import Any, Mapping
+
+from databases.interfaces import Record
+
+from src.auth.context import AuthContext
+from src.chat.enums import VisibilityChoices
+from src.chat.service import get_room_by_id_from_db
+from src.config import settings
+from src.constants import Environment
+from src.listener.schemas import WSEventMessage
+from src.metrics import observe_redis_publish
+from src.redis_client import pub_sub_manager
+
+logger = getLogger(__name__)
+
+TOPIC_PREFIX = "listener"
+
+
+def user_topic(user_id: int | str) -> str:
+    return f"{TOPIC_PREFIX}:user:{user_id}"
+
+
+def organization_topic(organization_uuid: Any) -> str:
+    return f"{TOPIC_PREFIX}:organization:{organization_uuid}"
+
+
+def room_topic(room_id: Any) -> str:
+    return f"{TOPIC_PREFIX}:room:{room_id}"
+
+
+def get_visibility_topics(
+    user_id: int, visibility: str | None, organization_uuid: Any = None
+) -> list[str]:
+    """
+    Topics of the users who see an object owned by `user_id`, rooms and
+    templates share the visibility rules
+    """
+    topics = [user_topic(user_id)]
+    if visibility == VisibilityChoices.ORGANIZATION and organization_uuid:
+        topics.append(organization_topic(organization_uuid))
+    return topics
+
+
+def get_auth_context_topics(auth: AuthContext) -> list[str]:
+    """
+    Topics a listener of the user is subscribed to when it connects
+    """
+    return [
+        user_topic(auth.user_id),
+        *(organization_topic(uuid) for uuid in sorted(auth.organization_uuids)),
+    ]
+
+
+async def publish_listener_event(event: WSEventMessage, *topics: str) -> None:
+    """
+    Publishes the event once on every topic, in one round trip
+    """
+    if settings.ENVIRONMENT == Environment.DEBUG or not topics:
+        return
+
+    message = event.model_dump_json()
+    unique_topics = list(dict.fromkeys(topics))
+    logger.info("Publishing listener event %s on %s", message, unique_topics)
+    async with pub_sub_manager.get_connection().pipeline(transaction=False) as pipe:
+        for topic in unique_topics:
+            pipe.publish(topic, message)
+        await pipe.execute()
+
+    for topic in unique_topics:
+        observe_redis_publish(topic, message)
+
+
+async def publish_room_event(
+    room_id: str, event: WSEventMessage, *rooms: Record | Mapping | None
+) -> None:
+    """
+    Publishes a room event on the room topic and on the topics of the users
+    who see the room in their listing
+
+    Pass the room records the caller already has, e.g. the room before and
+    after a visibility change, so both audiences are told. Without any, the
+    room is loaded.
+    """
+    records: list[Record | Mapping] = [room for room in rooms if room]
+    if not records:
+        room = await get_room_by_id_from_db(room_id)
+        records = [room] if room else []
+
+    topics = [room_topic(room_id)]
+    for record in records:
+        topics.extend(
+            get_visibility_topics(
+                record["user_id"], record["visibility"], record["organization_uuid"]
+            )
+        )
+    await publish_listener_event(event, *topics)
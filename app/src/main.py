@@ -6,12 +6,14 @@ from typing import AsyncGenerator
 import pytz
 import sentry_sdk
 from fastapi import Depends, FastAPI, Header, Request
+from fastapi.responses import ORJSONResponse
 from fastapi_pagination import Page
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from redis import asyncio as aioredis
 from sqlalchemy.exc import SQLAlchemyError
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 from starlette.staticfiles import StaticFiles
 
 from src.annotations.router import router as annotations_router
@@ -20,12 +22,20 @@ from src.auth.jwt import parse_jwt_user_data
 from src.auth.router import router as auth_router
 from src.auth.schemas import JWTData
 from src.chat.router import router as chat_router
+from src.conditional import ConditionalRequestMiddleware
 from src.config import app_configs, settings
-from src.database import database
+from src.database import check_indexes, database
+from src.latency.router import router as latency_router
+from src.listener.hub import listener_hub
 from src.listener.router import router as listener_router
+from src.metrics import get_metrics_registry
 from src.organizations.router import router as organization_router
+from src.scraping.async_downloader import async_downloader
+from src.scraping.extraction import shutdown_executor
 from src.templates.router import router as template_router
+from src.tracing import TRACEPARENT_HEADER, TracingMiddleware
 from src.user_files.router import router as user_files_router
+from src.user_models.clients import llm_client_pool
 from src.user_models.router import router as user_models_router
 
 
@@ -39,15 +49,24 @@ async def lifespan(_application: FastAPI) -> AsyncGenerator:
     )
     redis_client = aioredis.Redis(connection_pool=pool)
     await database.connect()
+    try:
+        await check_indexes()
+    except Exception as e:
+        # the self-check must never prevent the app from starting
+        logger.error(f"Failed to check database indexes: {e}")
 
     yield
 
     # Shutdown
     await database.disconnect()
     await redis_client.close()
+    await async_downloader.close()
+    await llm_client_pool.close()
+    await listener_hub.close()
+    shutdown_executor()
 
 
-app = FastAPI(**app_configs, lifespan=lifespan)
+app = FastAPI(**app_configs, default_response_class=ORJSONResponse, lifespan=lifespan)
 
 
 def convert_datetime_to_iso_8601_with_z_suffix(dt: datetime) -> datetime:
@@ -61,6 +80,9 @@ Page.model_config["json_encoders"] = {
     datetime: convert_datetime_to_iso_8601_with_z_suffix
 }
 
+# innermost, so it sees the responses before the CORS and session headers
+app.add_middleware(ConditionalRequestMiddleware)
+
 SECRET_KEY = auth_settings.SECRET_KEY
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
 
@@ -71,8 +93,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=("GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"),
     allow_headers=settings.CORS_HEADERS,
+    expose_headers=[TRACEPARENT_HEADER],
 )
 
+# outermost, so the span covers the whole request
+app.add_middleware(TracingMiddleware)
+
 logger = logging.getLogger(__name__)
 
 
@@ -104,6 +130,13 @@ async def healthcheck(db_error: bool = Header(False)) -> dict[str, str]:
         return {"status": "error", "message": str(e)}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    return Response(
+        generate_latest(get_metrics_registry()), media_type=CONTENT_TYPE_LATEST
+    )
+
+
 if settings.ENVIRONMENT.is_deployed:
     sentry_sdk.init(
         dsn=settings.SENTRY_DSN,
@@ -118,5 +151,6 @@ app.include_router(listener_router, prefix="/listener", tags=["Listener"])
 app.include_router(user_files_router, prefix="/user-files", tags=["User_files"])
 app.include_router(annotations_router, prefix="/annotations", tags=["Annotations"])
 app.include_router(user_models_router, prefix="/user-models", tags=["User_models"])
+app.include_router(latency_router, prefix="/latency", tags=["Latency"])
 
 app.mount(settings.MEDIA_DIR, StaticFiles(directory="media"), name=settings.MEDIA_DIR)
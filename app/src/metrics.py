@@ -0,0 +1,220 @@
+"""
+Prometheus metrics of the API and the workers
+
+The API serves them on /metrics, the Celery and job workers on METRICS_PORT
+when it is set.
+
+Processes forked by gunicorn or by Celery's prefork pool don't share memory,
+so with PROMETHEUS_MULTIPROC_DIR set every process writes its samples to
+files in that directory and the registry of `get_metrics_registry` adds them
+up at scrape time. The directory has to be emptied before the server starts
+(see scripts/start-prod.sh), and the files of exited processes are marked
+dead, so their gauges are dropped.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+from sqlalchemy.sql.elements import ClauseElement, TextClause
+from sqlalchemy.sql.expression import Join
+
+from src.tracing import tracer
+
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending an LLM request to its first streamed chunk",
+    ["provider", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60),
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Total duration of LLM requests, streamed or not",
+    ["provider", "model"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of database queries, with the wait for a pool connection",
+    ["statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+REDIS_PUBLISHED_MESSAGES = Counter(
+    "redis_published_messages",
+    "Messages published on Redis channels",
+    ["channel"],
+)
+REDIS_PUBLISH_PAYLOAD_BYTES = Histogram(
+    "redis_publish_payload_bytes",
+    "Size of the messages published on Redis channels",
+    ["channel"],
+    buckets=(128, 512, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections",
+    "Open websocket connections of the worker",
+    ["endpoint"],
+    multiprocess_mode="liveall",
+)
+WEBSOCKET_SEND_QUEUE_DEPTH = Gauge(
+    "websocket_send_queue_depth",
+    "Messages waiting in the send queues of the worker's listener connections",
+    multiprocess_mode="liveall",
+)
+TASK_DURATION = Histogram(
+    "task_duration_seconds",
+    "Duration of background tasks",
+    ["runner", "task", "state"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def get_metrics_registry() -> CollectorRegistry:
+    """
+    Registry with the samples of all the processes in multiprocess mode,
+    the default one otherwise
+    """
+    if not is_multiprocess():
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def start_metrics_server(port: int | None) -> None:
+    if port:
+        start_http_server(port, registry=get_metrics_registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid)
+
+
+def get_statement_name(query: ClauseElement | str) -> str:
+    """
+    Kind and table of a query, e.g. "select:room", raw SQL is "raw"
+    """
+    if not isinstance(query, ClauseElement) or isinstance(query, TextClause):
+        return "raw"
+
+    kind = getattr(query, "__visit_name__", "query")
+    table = getattr(query, "table", None)
+    if table is None and hasattr(query, "get_final_froms"):
+        froms = query.get_final_froms()
+        table = froms[0] if froms else None
+    # joins are named after their leftmost table
+    while isinstance(table, Join):
+        table = table.left
+
+    name = getattr(table, "name", None)
+    return f"{kind}:{name}" if name else kind
+
+
+def get_channel_kind(channel: str) -> str:
+    """
+    Channel without its id, e.g. "listener:user", plain ids are rooms
+    """
+    return channel.rsplit(":", 1)[0] if ":" in channel else "room"
+
+
+def observe_redis_publish(channel: str, message: str) -> None:
+    kind = get_channel_kind(channel)
+    REDIS_PUBLISHED_MESSAGES.labels(kind).inc()
+    REDIS_PUBLISH_PAYLOAD_BYTES.labels(kind).observe(len(message))
+
+
+@contextmanager
+def time_db_query(query: ClauseElement | str) -> Iterator[None]:
+    """
+    Times and traces a database query
+    """
+    statement = get_statement_name(query)
+    start = time.perf_counter()
+    try:
+        with tracer.span("db", statement=statement):
+            yield
+    finally:
+        DB_QUERY_DURATION.labels(statement).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_websocket(endpoint: str) -> Iterator[None]:
+    connections = WEBSOCKET_CONNECTIONS.labels(endpoint)
+    connections.inc()
+    try:
+        yield
+    finally:
+        connections.dec()
+
+
+class LLMRequestTimer:
+    def __init__(self, provider: str, model: str) -> None:
+        self.labels: tuple[str, str] = (provider.lower(), model)
+        self.started_at = time.perf_counter()
+        self.first_chunk_at: float | None = None
+        self.last_chunk_at: float | None = None
+        self.chunks = 0
+        self.gaps_total = 0.0
+        self.max_gap = 0.0
+        # not made current, the LLM call is a leaf and its stream is consumed
+        # by code which has spans of its own
+        self.span = tracer.start("llm", provider=self.labels[0], model=model)
+
+    def chunk(self) -> None:
+        """
+        Marks a streamed chunk, the first one sets the time to first token
+        """
+        now = time.perf_counter()
+        if self.last_chunk_at is None:
+            self.first_chunk_at = now
+            time_to_first_token = self.first_chunk_at - self.started_at
+            LLM_TIME_TO_FIRST_TOKEN.labels(*self.labels).observe(time_to_first_token)
+            self.span.set_attribute("time_to_first_token", time_to_first_token)
+        else:
+            gap = now - self.last_chunk_at
+            self.gaps_total += gap
+            self.max_gap = max(self.max_gap, gap)
+        self.last_chunk_at = now
+        self.chunks += 1
+
+    def finish(self, error: BaseException | None = None) -> None:
+        LLM_REQUEST_DURATION.labels(*self.labels).observe(
+            time.perf_counter() - self.started_at
+        )
+        tracer.end(self.span, error)
+
+
+@contextmanager
+def time_llm_request(provider: str, model: str) -> Iterator[LLMRequestTimer]:
+    """
+    Times and traces an LLM request, streaming callers mark every chunk on
+    the timer
+    """
+    timer = LLMRequestTimer(provider, model)
+    error: BaseException | None = None
+    try:
+        yield timer
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        timer.finish(error)
+
+
+def observe_task(runner: str, task: str, state: str, duration: float) -> None:
+    TASK_DURATION.labels(runner, task, state.lower()).observe(duration)
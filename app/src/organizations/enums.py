@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class MembershipStatus(str, Enum):
+    ADDED = "added"
+    ALREADY_MEMBER = "already_member"
+    USER_NOT_FOUND = "user_not_found"
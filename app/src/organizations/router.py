@@ -4,10 +4,9 @@ import os
 from fastapi import APIRouter, Depends, UploadFile
 from starlette import status
 
-from src.auth.exceptions import UserNotFound
+from src.auth.context import AuthContext, get_auth_context
 from src.auth.jwt import parse_jwt_admin_data, parse_jwt_user_data
 from src.auth.schemas import JWTData, UserDBNoSecrets
-from src.auth.service import get_user_by_id
 from src.config import settings
 from src.organizations.exceptions import (
     OrganizationAlreadyExists,
@@ -36,8 +35,6 @@ from src.organizations.schemas import (
 from src.organizations.security import (
     check_admin_count_before_deletion,
     check_user_count_before_deletion,
-    is_user_in_organization,
-    is_user_organization_admin,
 )
 from src.organizations.service import (
     add_admins_to_organization_in_db,
@@ -48,6 +45,7 @@ from src.organizations.service import (
     delete_organization_from_db,
     delete_users_from_organization_in_db,
     get_admins_from_organization_by_id_from_db,
+    get_membership_statuses_message,
     get_organization_by_id_from_db,
     get_organizations_by_user_id_from_db,
     get_organizations_from_db,
@@ -77,11 +75,11 @@ async def get_organizations(jwt_data: JWTData = Depends(parse_jwt_admin_data)):
 
 # Temporary function
 @router.get("/domain-organizations", response_model=list[OrganizationDB])
-async def get_organizations_by_domain(jwt_data: JWTData = Depends(parse_jwt_user_data)):
-    user = await get_user_by_id(jwt_data.user_id)
-    if not user:
-        raise UserNotFound()
-    user_email = user["email"]
+async def get_organizations_by_domain(
+    jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
+):
+    user_email = auth.user.email
     user_domain = user_email.split("@")[1]
     organizations = await get_organizations_from_db_by_domain(user_domain)
 
@@ -110,16 +108,20 @@ async def add_users_by_emails(
     organization_uuid: str,
     users_data: AddUserToOrganizationByEmails,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
     # check if user is an admin of the organization
-    if not await is_user_organization_admin(jwt_data.user_id, organization_uuid):
+    if not auth.is_organization_admin(organization_uuid):
         raise UserCannotAddUserToOrganization()
 
-    users_status = await add_users_to_organization_in_db_by_emails(
+    statuses = await add_users_to_organization_in_db_by_emails(
         organization_uuid, users_data.emails, users_data.as_admin
     )
 
-    return AddUsersToOrganizationOutput(status=users_status)
+    return AddUsersToOrganizationOutput(
+        status=get_membership_statuses_message(organization_uuid, statuses),
+        emails=statuses,
+    )
 
 
 @router.get("/user-organizations", response_model=list[OrganizationDB])
@@ -134,9 +136,11 @@ async def get_user_organizations(jwt_data: JWTData = Depends(parse_jwt_user_data
 
 @router.get("/{organization_uuid}", response_model=OrganizationDetails)
 async def get_organization_by_id(
-    organization_uuid: str, jwt_data: JWTData = Depends(parse_jwt_user_data)
+    organization_uuid: str,
+    jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if not await is_user_in_organization(jwt_data.user_id, organization_uuid):
+    if not auth.is_in_organization(organization_uuid):
         raise OrganizationDoesNotExist()
 
     organization = await get_organization_by_id_from_db(organization_uuid)
@@ -171,12 +175,10 @@ async def get_organization_by_id(
 async def create_organization(
     organization_data: OrganizationCreate,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
     # Temporary
-    user = await get_user_by_id(jwt_data.user_id)
-    if not user:
-        raise UserNotFound()
-    user_email = user["email"]
+    user_email = auth.user.email
     user_domain = user_email.split("@")[1]
     organization_data_details = OrganizationCreateDetails(
         **organization_data.model_dump()
@@ -205,8 +207,9 @@ async def update_organization(
     organization_uuid: str,
     organization_data: OrganizationUpdate,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if not await is_user_organization_admin(jwt_data.user_id, organization_uuid):
+    if not auth.is_organization_admin(organization_uuid):
         raise UserCannotUpdateOrganization()
     organization = await update_organization_in_db(organization_uuid, organization_data)
     if not organization:
@@ -220,8 +223,9 @@ async def set_organization_image(
     organization_uuid: str,
     picture: UploadFile,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if not await is_user_organization_admin(jwt_data.user_id, organization_uuid):
+    if not auth.is_organization_admin(organization_uuid):
         raise UserCannotUpdateOrganization()
     organization = await get_organization_by_id_from_db(organization_uuid)
     if not organization:
@@ -244,8 +248,9 @@ async def set_organization_image(
 async def delete_organization(
     organization_uuid: str,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if not await is_user_organization_admin(jwt_data.user_id, organization_uuid):
+    if not auth.is_organization_admin(organization_uuid):
         raise UserCannotDeleteOrganization()
 
     # make sure to delete all users from the organization
@@ -273,8 +278,9 @@ async def add_user_permissions_to_organization(
     organization_uuid: str,
     data: AddUsersToOrganizationInput,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if not await is_user_organization_admin(jwt_data.user_id, organization_uuid):
+    if not auth.is_organization_admin(organization_uuid):
         raise UserCannotAddUserToOrganization()
 
     if data.user_ids:
@@ -298,16 +304,20 @@ async def add_new_users_to_organization(
     organization_uuid: str,
     data: AddNewUsersToOrganizationInput,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
     # check if user is an admin of the organization
-    if not await is_user_organization_admin(jwt_data.user_id, organization_uuid):
+    if not auth.is_organization_admin(organization_uuid):
         raise UserCannotAddUserToOrganization()
 
-    users_status = await add_users_to_organization_in_db_by_emails(
+    statuses = await add_users_to_organization_in_db_by_emails(
         organization_uuid, data.user_ids or data.admin_ids, bool(data.admin_ids)
     )
 
-    return AddUsersToOrganizationOutput(status=users_status)
+    return AddUsersToOrganizationOutput(
+        status=get_membership_statuses_message(organization_uuid, statuses),
+        emails=statuses,
+    )
 
 
 @router.post(
@@ -318,8 +328,9 @@ async def revoke_user_permissions_from_organization(
     organization_uuid: str,
     data: RemoveUsersFromOrganizationInput,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if not await is_user_organization_admin(jwt_data.user_id, organization_uuid):
+    if not auth.is_organization_admin(organization_uuid):
         raise UserCannotDeleteUserFromOrganization()
 
     if not await check_user_count_before_deletion(organization_uuid, data.user_ids):
@@ -4,6 +4,7 @@ from uuid import UUID
 from pydantic import BaseModel
 
 from src.auth.schemas import UserDBNoSecrets
+from src.organizations.enums import MembershipStatus
 
 
 class OrganizationBase(BaseModel):
@@ -53,6 +54,7 @@ class AddNewUsersToOrganizationInput(BaseModel):
 
 class AddUsersToOrganizationOutput(BaseModel):
     status: str
+    emails: dict[str, MembershipStatus] | None = None
 
 
 class RemoveUsersFromOrganizationInput(BaseModel):
@@ -1,7 +1,7 @@
 from sqlalchemy import select
-from sqlalchemy.exc import NoResultFound
 
-from src.auth.service import is_user_admin_by_id
+from src.auth.context import get_auth_context_by_user_id
+from src.auth.exceptions import UserNotFound
 from src.database import OrganizationAdmin, OrganizationUser, database
 
 
@@ -9,38 +9,19 @@ async def is_user_in_organization(user_id: int, organization_uuid: str) -> bool:
     if not organization_uuid:
         return True
 
-    # auth_user admin can do anything
-    if await is_user_admin_by_id(user_id):
-        return True
+    context = await get_auth_context_by_user_id(user_id)
+    if not context:
+        raise UserNotFound()
 
-    try:
-        select_query = select(OrganizationUser).where(
-            OrganizationUser.auth_user_id == user_id,
-            OrganizationUser.organization_uuid == organization_uuid,
-        )
-        record = await database.fetch_one(select_query)
-        return True if record else False
-    except NoResultFound:
-        return False
+    return context.is_in_organization(organization_uuid)
 
 
 async def is_user_organization_admin(user_id: int, organization_uuid: str) -> bool:
-    # look at function `is_user_in_organization` description
-    # if await is_user_admin_by_id(user_id):
-    #     return True
+    context = await get_auth_context_by_user_id(user_id)
+    if not context:
+        raise UserNotFound()
 
-    if not await is_user_in_organization(user_id, organization_uuid):
-        return False
-
-    try:
-        select_query = select(OrganizationAdmin).where(
-            OrganizationAdmin.auth_user_id == user_id,
-            OrganizationAdmin.organization_uuid == organization_uuid,
-        )
-        record = await database.fetch_one(select_query)
-        return True if record else False
-    except NoResultFound:
-        return False
+    return context.is_organization_admin(organization_uuid)
 
 
 async def check_admin_count_before_deletion(
@@ -4,12 +4,25 @@ from typing import Tuple
 
 from asyncpg import ForeignKeyViolationError, UniqueViolationError
 from databases.interfaces import Record
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import (
+    Integer,
+    any_,
+    bindparam,
+    delete,
+    insert,
+    literal,
+    select,
+    union,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import NoResultFound
 
+from src.auth.context import invalidate_auth_contexts
 from src.auth.exceptions import InvalidCredentials
-from src.auth.schemas import UserDB, UserDBNoSecrets
-from src.auth.service import get_user_by_email
+from src.auth.schemas import UserDB
+from src.auth.service import get_user_ids_by_emails
 from src.database import (
     Organization,
     OrganizationAdmin,
@@ -17,6 +30,7 @@ from src.database import (
     User,
     database,
 )
+from src.organizations.enums import MembershipStatus
 from src.organizations.schemas import (
     OrganizationCreate,
     OrganizationCreateDetails,
@@ -173,6 +187,18 @@ async def update_organization_picture(
         return None
 
 
+async def get_organization_member_ids(organization_uuid: str) -> list[int]:
+    select_query = union(
+        select(OrganizationUser.auth_user_id).where(
+            OrganizationUser.organization_uuid == organization_uuid
+        ),
+        select(OrganizationAdmin.auth_user_id).where(
+            OrganizationAdmin.organization_uuid == organization_uuid
+        ),
+    )
+    return [record["auth_user_id"] for record in await database.fetch_all(select_query)]
+
+
 # DELETE ORGANIZATION
 async def delete_organization_from_db(organization_uuid: str) -> Record | None:
     # check if organization exists
@@ -182,86 +208,100 @@ async def delete_organization_from_db(organization_uuid: str) -> Record | None:
         logger.info(f"Organization with uuid {organization_uuid} does not exist")
         return None
 
+    # memberships are removed by the cascade
+    member_ids = await get_organization_member_ids(organization_uuid)
+
     # delete organization from organization table
     delete_query = delete(Organization).where(Organization.uuid == organization_uuid)
     await database.execute(delete_query)
+    await invalidate_auth_contexts(member_ids)
     logger.info(f"Organization uuid: {organization_uuid} deleted")
     return org
 
 
 # ADD SPECIFIC
-async def add_users_to_organization_in_db(
-    organization_uuid: str, user_ids: list[int]
-) -> None:
-    insert_values = [
-        {
-            "organization_uuid": organization_uuid,
-            "auth_user_id": user_id,
-        }
-        for user_id in user_ids
-    ]
-
-    for value in insert_values:
-        insert_query = insert(OrganizationUser).values(value)
-        logger.info(
-            f"""Adding user {value['auth_user_id']}
-            to organization uuid: {organization_uuid}"""
+async def _add_members_to_organization(
+    table: type[OrganizationUser] | type[OrganizationAdmin],
+    organization_uuid: str,
+    user_ids: list[int],
+) -> set[int]:
+    """
+    Insert the memberships of existing users in one statement
+
+    Returns the ids of the users that were added, users already in the table
+    are skipped by ON CONFLICT DO NOTHING.
+    """
+    if not user_ids:
+        return set()
+
+    insert_query = (
+        pg_insert(table)
+        .from_select(
+            ["organization_uuid", "auth_user_id"],
+            select(literal(organization_uuid, Organization.uuid.type), User.id).where(
+                User.id == any_(bindparam("user_ids", user_ids, ARRAY(Integer)))
+            ),
         )
-        try:
-            await database.execute(insert_query)
-        except ForeignKeyViolationError:
-            logger.warning(f"Organization with uuid {organization_uuid} does not exist")
-            continue
-        except UniqueViolationError:
-            logger.info(f"User {value['auth_user_id']} already exists in organization")
-            continue
+        .on_conflict_do_nothing(index_elements=["organization_uuid", "auth_user_id"])
+        .returning(table.auth_user_id)
+    )
+    try:
+        added = await database.fetch_all(insert_query)
+    except ForeignKeyViolationError:
+        logger.warning(f"Organization with uuid {organization_uuid} does not exist")
+        return set()
 
-    logger.info(f"Adding users to organization uuid: {organization_uuid} finished")
+    added_ids = {record["auth_user_id"] for record in added}
+    await invalidate_auth_contexts(list(added_ids))
+    return added_ids
 
 
-async def add_admins_to_organization_in_db(
-    organization_uuid: str, admin_ids: list[int]
-) -> None:
-    insert_values = [
-        {
-            "organization_uuid": organization_uuid,
-            "auth_user_id": admin_id,
-        }
-        for admin_id in admin_ids
-    ]
+async def add_users_to_organization_in_db(
+    organization_uuid: str, user_ids: list[int]
+) -> set[int]:
+    added_ids = await _add_members_to_organization(
+        OrganizationUser, organization_uuid, user_ids
+    )
+    logger.info(
+        f"Added {len(added_ids)} of {len(user_ids)} users "
+        f"to organization uuid: {organization_uuid}"
+    )
+    return added_ids
 
-    for value in insert_values:
-        insert_query = insert(OrganizationAdmin).values(value)
-        logger.info(
-            f"""Adding admin {value['auth_user_id']}
-            to organization uuid: {organization_uuid}"""
-        )
-        try:
-            await database.execute(insert_query)
-        except ForeignKeyViolationError:
-            logger.warning(f"Organization with uuid {organization_uuid} does not exist")
-            continue
-        except UniqueViolationError:
-            logger.info(f"User {value['auth_user_id']} already exists in organization")
-            continue
 
-    logger.info(f"Adding admins to organization uuid: {organization_uuid} finished")
+async def add_admins_to_organization_in_db(
+    organization_uuid: str, admin_ids: list[int]
+) -> set[int]:
+    added_ids = await _add_members_to_organization(
+        OrganizationAdmin, organization_uuid, admin_ids
+    )
+    logger.info(
+        f"Added {len(added_ids)} of {len(admin_ids)} admins "
+        f"to organization uuid: {organization_uuid}"
+    )
+    return added_ids
 
 
 # DELETE ALL
 async def remove_all_users_from_organization_in_db(organization_uuid: str) -> None:
-    delete_query = delete(OrganizationUser).where(
-        OrganizationUser.organization_uuid == organization_uuid
+    delete_query = (
+        delete(OrganizationUser)
+        .where(OrganizationUser.organization_uuid == organization_uuid)
+        .returning(OrganizationUser.auth_user_id)
     )
-    await database.execute(delete_query)
+    removed = await database.fetch_all(delete_query)
+    await invalidate_auth_contexts([record["auth_user_id"] for record in removed])
     logger.info(f"All users removed from organization uuid: {organization_uuid}")
 
 
 async def remove_all_admins_from_organization_in_db(organization_uuid: str) -> None:
-    delete_query = delete(OrganizationAdmin).where(
-        OrganizationAdmin.organization_uuid == organization_uuid
+    delete_query = (
+        delete(OrganizationAdmin)
+        .where(OrganizationAdmin.organization_uuid == organization_uuid)
+        .returning(OrganizationAdmin.auth_user_id)
     )
-    await database.execute(delete_query)
+    removed = await database.fetch_all(delete_query)
+    await invalidate_auth_contexts([record["auth_user_id"] for record in removed])
     logger.info(f"All admins removed from organization uuid: {organization_uuid}")
 
 
@@ -274,6 +314,7 @@ async def delete_users_from_organization_in_db(
         OrganizationUser.auth_user_id.in_(user_ids),
     )
     await database.execute(delete_query)
+    await invalidate_auth_contexts(user_ids)
     logger.info(f"Users {user_ids} removed from organization uuid: {organization_uuid}")
 
 
@@ -285,6 +326,7 @@ async def delete_admins_from_organization_in_db(
         OrganizationAdmin.auth_user_id.in_(admin_ids),
     )
     await database.execute(delete_query)
+    await invalidate_auth_contexts(admin_ids)
     logger.info(
         f"Admins {admin_ids} removed from organization uuid: {organization_uuid}"
     )
@@ -318,25 +360,50 @@ async def add_users_to_organization_in_db_by_emails(
     organization_uuid: str,
     emails: list[str],
     as_admin: bool = False,
-) -> str:
-    user_ids = []
-    emails_added = []
-    emails_skipped = []
+) -> dict[str, MembershipStatus]:
+    """
+    Add the users with the given emails, returns the status of every email
+    """
+    emails = list(dict.fromkeys(emails))
+    user_ids = await get_user_ids_by_emails(emails)
     for email in emails:
-        user_db = await get_user_by_email(email)
-        if not user_db:
+        if email not in user_ids:
             # SO FAR
             # in future we will handle it by sending an invitation
             logger.warning(f"User with email {email} not found")
-            emails_skipped.append(email)
-            continue
-        emails_added.append(email)
-        user = UserDBNoSecrets(**dict(user_db))
-        user_ids.append(user.id)
 
-    await add_users_to_organization_in_db(organization_uuid, user_ids)
+    added_ids = await add_users_to_organization_in_db(
+        organization_uuid, list(user_ids.values())
+    )
     if as_admin:
-        await add_admins_to_organization_in_db(organization_uuid, user_ids)
+        added_ids |= await add_admins_to_organization_in_db(
+            organization_uuid, list(user_ids.values())
+        )
+
+    statuses = {}
+    for email in emails:
+        if email not in user_ids:
+            statuses[email] = MembershipStatus.USER_NOT_FOUND
+        elif user_ids[email] in added_ids:
+            statuses[email] = MembershipStatus.ADDED
+        else:
+            statuses[email] = MembershipStatus.ALREADY_MEMBER
+    return statuses
+
+
+def get_membership_statuses_message(
+    organization_uuid: str, statuses: dict[str, MembershipStatus]
+) -> str:
+    emails_added = [
+        email
+        for email, status in statuses.items()
+        if status != MembershipStatus.USER_NOT_FOUND
+    ]
+    emails_skipped = [
+        email
+        for email, status in statuses.items()
+        if status == MembershipStatus.USER_NOT_FOUND
+    ]
 
     return f"""Users: {','.join(emails_added)}
     added to organization uuid: {organization_uuid}
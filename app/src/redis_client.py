@@ -7,6 +7,7 @@ from redis.asyncio import Redis
 
 from src.config import settings
 from src.constants import Environment
+from src.metrics import observe_redis_publish
 from src.models import ORJSONModel
 
 logger = logging.getLogger(__name__)
@@ -108,6 +109,18 @@ class RedisPubSubManager:
         if settings.ENVIRONMENT == Environment.DEBUG:
             return
 
+        redis_connection = self.get_connection()
+        logger.info("Publishing message to channel %s a message %s", room_id, message)
+        await redis_connection.publish(room_id, message)
+        observe_redis_publish(room_id, message)
+
+    def get_connection(self) -> aioredis.Redis:
+        """
+        Returns the Redis connection, creating its pool on first use.
+
+        Returns:
+            aioredis.Redis: Redis connection object.
+        """
         if not self.redis_connection:
             logger.error("Redis client %s", redis_client)
 
@@ -117,8 +130,7 @@ class RedisPubSubManager:
             )
             self.redis_connection = aioredis.Redis(connection_pool=pool)
 
-        logger.info("Publishing message to channel %s a message %s", room_id, message)
-        await self.redis_connection.publish(room_id, message)
+        return self.redis_connection
 
     async def subscribe(self, room_id: str) -> aioredis.Redis:
         """
@@ -0,0 +1,230 @@
+import asyncio
+import io
+import tempfile
+from logging import getLogger
+from typing import IO, Any
+
+import httpx
+
+from src.config import settings
+from src.tracing import TracingTransport
+
+logger = getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _roll_over_to_disk(buffer: io.BytesIO) -> IO[bytes]:
+    """
+    Named temporary file holding the buffer, deleted once closed
+    """
+    named: IO[bytes] = tempfile.NamedTemporaryFile(prefix="download-")
+    try:
+        named.write(buffer.getbuffer())
+    except BaseException:
+        named.close()
+        raise
+    buffer.close()
+    return named
+
+
+class DownloadError(Exception):
+    def __init__(self, url: str, message: str) -> None:
+        super().__init__(f"{message}: {url}")
+        self.url = url
+
+
+class DownloadTooLarge(DownloadError):
+    pass
+
+
+class DownloadedFile:
+    """
+    Body of a finished download, in memory or, past
+    SCRAPING_SPOOL_MAX_MEMORY_SIZE, in a named temporary file whose `path`
+    other processes can open
+    """
+
+    def __init__(
+        self,
+        url: str,
+        content_type: str,
+        encoding: str | None,
+        size: int,
+        file: IO[bytes],
+        path: str | None = None,
+    ) -> None:
+        self.url = url
+        self.content_type = content_type
+        self.encoding = encoding
+        self.size = size
+        self.file = file
+        self.path = path
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def stream(self) -> IO[bytes]:
+        """
+        The body itself as a seekable stream, without copying it
+        """
+        self.file.seek(0)
+        return self.file
+
+    def text(self) -> str:
+        return self.read().decode(self.encoding or "utf-8", errors="replace")
+
+    def to_named_file(self, suffix: str = "") -> IO[bytes]:
+        """
+        Copy of the body in a named temporary file, for code which needs a
+        path while the body is held in memory; the file is deleted once
+        closed
+        """
+        named: IO[bytes] = tempfile.NamedTemporaryFile(suffix=suffix)
+        try:
+            self.file.seek(0)
+            while chunk := self.file.read(COPY_CHUNK_SIZE):
+                named.write(chunk)
+            named.flush()
+        except BaseException:
+            named.close()
+            raise
+        return named
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "DownloadedFile":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class AsyncDownloader:
+    """
+    Shared httpx client for every outgoing scraping request
+
+    The client is bound to the event loop it was created on, so it is
+    recreated lazily when used from another loop (e.g. a Celery task).
+    """
+
+    def __init__(self) -> None:
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(
+                settings.SCRAPING_READ_TIMEOUT,
+                connect=settings.SCRAPING_CONNECT_TIMEOUT,
+            ),
+            # the pool limits belong to the transport once it is given
+            transport=TracingTransport(
+                limits=httpx.Limits(
+                    max_connections=settings.SCRAPING_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SCRAPING_MAX_KEEPALIVE,
+                )
+            ),
+            headers={"User-Agent": settings.SCRAPING_USER_AGENT},
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = self._build_client()
+            self._loop = loop
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    async def get_content_type(self, url: str, headers: dict | None = None) -> str:
+        """
+        Get the content type of the resource, falling back to a streamed GET
+        when the server does not answer HEAD requests
+        """
+        try:
+            response = await self.client.head(url, headers=headers)
+            if response.status_code < 400:
+                return response.headers.get("Content-Type", "")
+            async with self.client.stream("GET", url, headers=headers) as response:
+                return response.headers.get("Content-Type", "")
+        except httpx.HTTPError as e:
+            raise DownloadError(url, f"Failed to get content type ({e})") from e
+
+    async def get_json(
+        self, url: str, headers: dict | None = None, params: dict | None = None
+    ) -> Any:
+        try:
+            response = await self.client.get(url, headers=headers, params=params)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise DownloadError(url, f"Failed to download ({e})") from e
+        return response.json()
+
+    async def download(
+        self,
+        url: str,
+        headers: dict | None = None,
+        max_size: int | None = None,
+    ) -> DownloadedFile:
+        """
+        Stream the response body into memory, rolling over to a named
+        temporary file past SCRAPING_SPOOL_MAX_MEMORY_SIZE
+
+        Raises DownloadTooLarge as soon as the body exceeds `max_size` bytes,
+        whether announced by Content-Length or discovered while reading.
+        """
+        max_size = max_size or settings.SCRAPING_MAX_DOWNLOAD_SIZE
+        file: IO[bytes] = io.BytesIO()
+        path: str | None = None
+        try:
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code != 200:
+                    raise DownloadError(
+                        url, f"Unexpected status {response.status_code}"
+                    )
+
+                content_length = response.headers.get("Content-Length")
+                if content_length and int(content_length) > max_size:
+                    raise DownloadTooLarge(url, f"File exceeds {max_size} bytes")
+
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_size:
+                        raise DownloadTooLarge(url, f"File exceeds {max_size} bytes")
+                    if (
+                        isinstance(file, io.BytesIO)
+                        and size > settings.SCRAPING_SPOOL_MAX_MEMORY_SIZE
+                    ):
+                        file = _roll_over_to_disk(file)
+                        path = file.name
+                    file.write(chunk)
+
+                file.flush()
+                file.seek(0)
+                return DownloadedFile(
+                    url=str(response.url),
+                    content_type=response.headers.get("Content-Type", ""),
+                    encoding=response.charset_encoding,
+                    size=size,
+                    file=file,
+                    path=path,
+                )
+        except httpx.HTTPError as e:
+            file.close()
+            raise DownloadError(url, f"Failed to download ({e})") from e
+        except BaseException:
+            file.close()
+            raise
+
+
+async_downloader = AsyncDownloader()
@@ -1,29 +1,22 @@
-from io import BytesIO
 from logging import getLogger
 
-from docx import Document
 from langchain_community.document_transformers import BeautifulSoupTransformer
+from langchain_core.documents import Document as LangchainDocument
 
-logger = getLogger(__name__)
-
+from src.scraping.async_downloader import DownloadError, async_downloader
 
-def read_docx_from_bytes(content):
-    try:
-        doc = Document(BytesIO(content))
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
-    except Exception as e:
-        logger.error(f"Failed to read docx file: {e}")
-        return None
+logger = getLogger(__name__)
 
 
 async def get_content_from_url(url: str):
-    from langchain_community.document_loaders import AsyncHtmlLoader
+    try:
+        with await async_downloader.download(url) as downloaded:
+            html = downloaded.text()
+    except DownloadError as e:
+        logger.error(f"Failed to download html page: {e}")
+        return ""
 
-    loader: AsyncHtmlLoader = AsyncHtmlLoader([url])
-    docs = loader.load()
+    docs = [LangchainDocument(page_content=html, metadata={"source": url})]
 
     bs_transformer: BeautifulSoupTransformer = BeautifulSoupTransformer()
     docs_transformed = bs_transformer.transform_documents(docs)
@@ -1,10 +1,10 @@
 import asyncio
 from logging import getLogger
 
-from requests import get, head
-
 from src.google_drive.downloader import get_pdf_file_details
-from src.scraping.content_loaders import get_content_from_url, read_docx_from_bytes
+from src.scraping.async_downloader import DownloadError, async_downloader
+from src.scraping.content_loaders import get_content_from_url
+from src.scraping.extraction import extract_docx_text
 from src.youtube.service import YouTubeService
 
 logger = getLogger(__name__)
@@ -13,22 +13,34 @@ youtube_service: YouTubeService = YouTubeService()
 
 
 async def download_and_extract_content_from_url(
-    url: str, get_urn: bool = False, room_id: str = ""
+    url: str, get_urn: bool = False, room_id: str = "", stream: bool = False
+) -> dict | None:
+    """
+    With `stream`, PDFs return a `pages` async iterator instead of `content`
+    """
+    try:
+        return await _download_and_extract_content_from_url(
+            url, get_urn, room_id, stream
+        )
+    except DownloadError as e:
+        logger.error(f"Failed to download file: {e}")
+        return None
+
+
+async def _download_and_extract_content_from_url(
+    url: str, get_urn: bool, room_id: str, stream: bool
 ) -> dict | None:
     logger.info(f"Checking content type of: {url}")
-    response = head(url, allow_redirects=True, stream=True)
-    content_type = response.headers.get("Content-Type", "")
+    content_type = await async_downloader.get_content_type(url)
     logger.info(f"Content type of {url}: {content_type}")
 
     if "text/plain" in content_type:
         logger.info(f"Downloading and extracting txt file from: {url}")
-        response = get(url, stream=True)
-        if response.status_code != 200:
-            logger.error(f"Failed to download file: {url}")
-            return None
+        with await async_downloader.download(url) as downloaded:
+            text = downloaded.text()
 
         return {
-            "content": response.text,
+            "content": text,
             "content_type": "text/plain",
         }
     elif (
@@ -37,19 +49,20 @@ async def download_and_extract_content_from_url(
         in content_type
     ):
         logger.info(f"Downloading and extracting docx file from: {url}")
-        response = get(url, stream=True)
-        if response.status_code != 200:
-            logger.error(f"Failed to download file: {url}")
+        with await async_downloader.download(url) as downloaded:
+            docx_text = await extract_docx_text(downloaded)
+        if docx_text is None:
             return None
 
-        text = read_docx_from_bytes(response.content)
         return {
-            "content": text,
+            "content": docx_text,
             "content_type": "application/msword",
         }
     elif "application/pdf" in content_type:
         logger.info(f"Downloading and extracting pdf file from: {url}")
-        details = await get_pdf_file_details(url=url, get_urn=get_urn, room_id=room_id)
+        details = await get_pdf_file_details(
+            url=url, get_urn=get_urn, room_id=room_id, stream=stream
+        )
         if not details:
             logger.error(f"Failed to download file: {url}")
             # return "Empty PDF file."
@@ -58,6 +71,13 @@ async def download_and_extract_content_from_url(
                 "content_type": "application/pdf",
             }
 
+        if stream:
+            return {
+                "pages": details["pages"],
+                "content_type": "application/pdf",
+                "urn": details.get("urn", ""),
+            }
+
         text = details.get("content", "")
         return {
             "content": text,
@@ -70,7 +90,7 @@ async def download_and_extract_content_from_url(
             logger.error(f"Failed to get YouTube link from: {url}")
             return None
         logger.info(f"Downloading and extracting YT transcription from: {link}")
-        content = youtube_service.get_video_transcription(link)
+        content = await youtube_service.get_video_transcription(link)
 
         return {
             "content": content,
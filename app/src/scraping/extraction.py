@@ -0,0 +1,259 @@
+"""
+CPU-bound document text extraction, kept off the event loop
+
+Work runs in a process pool. Processes that cannot have children (Celery
+prefork workers are daemonic) fall back to a thread pool. The worker
+functions only import PyPDF2/python-docx, so spawned children stay light.
+
+In process, a PDF is parsed once, straight from the download, and its page
+ranges are extracted from that reader one at a time. Worker processes
+memory-map the file the download was spooled to, read-only, and parse it
+once per worker. Only a download still held in memory is copied to a
+temporary file for them.
+"""
+import asyncio
+import mmap
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from logging import getLogger
+from time import time
+from typing import IO, TYPE_CHECKING, AsyncIterator, Iterator, NamedTuple, cast
+
+from docx import Document
+from PyPDF2 import PdfReader
+
+from src.annotations.fingerprint import fingerprint
+from src.config import settings
+
+if TYPE_CHECKING:
+    from src.scraping.async_downloader import DownloadedFile
+
+logger = getLogger(__name__)
+
+_executor: Executor | None = None
+# parsed PDF of the worker process
+_local = threading.local()
+
+
+class PdfInfo(NamedTuple):
+    page_count: int
+    fingerprint: str
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.EXTRACTION_USE_PROCESSES and not (
+            multiprocessing.current_process().daemon
+        ):
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.EXTRACTION_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXTRACTION_MAX_WORKERS,
+                thread_name_prefix="extraction",
+            )
+    return _executor
+
+
+def uses_processes() -> bool:
+    return isinstance(get_executor(), ProcessPoolExecutor)
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+@contextmanager
+def get_worker_path(downloaded: "DownloadedFile") -> Iterator[str]:
+    """
+    Path worker processes read the download from: its spool file, or as a
+    fallback for downloads held in memory, a temporary copy
+    """
+    if downloaded.path:
+        yield downloaded.path
+        return
+
+    with downloaded.to_named_file() as file:
+        yield file.name
+
+
+def read_docx(source: str | IO[bytes]) -> str | None:
+    try:
+        doc = Document(source)
+        return "".join([paragraph.text + "\n" for paragraph in doc.paragraphs])
+    except Exception as e:
+        logger.error(f"Failed to read docx file: {e}")
+        return None
+
+
+def _get_pdf_reader(path: str) -> PdfReader:
+    """
+    Reader of the memory-mapped PDF, parsed once per worker and document;
+    ranges of the same document landing on the same worker reuse it
+    """
+    stat = os.stat(path)
+    # temporary file names can be reused once deleted, the inode and the
+    # modification time tell documents apart
+    key = (path, stat.st_ino, stat.st_mtime_ns)
+    cached = getattr(_local, "pdf", None)
+    if cached is not None and cached[0] == key:
+        return cached[2]
+    if cached is not None:
+        _local.pdf = None
+        cached[1].close()
+
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # the map is read like any binary file, without copying it
+        reader = PdfReader(cast(IO[bytes], mapped))
+    except BaseException:
+        mapped.close()
+        raise
+    _local.pdf = (key, mapped, reader)
+    return reader
+
+
+def read_pdf_info(path: str) -> PdfInfo:
+    reader = _get_pdf_reader(path)
+    return PdfInfo(len(reader.pages), fingerprint(reader, reader.stream))
+
+
+def read_reader_pages(
+    reader: PdfReader, start: int, stop: int, deadline: float
+) -> list[str]:
+    """
+    Extract text of pages [start, stop), stopping early past `deadline`
+    """
+    pages: list[str] = []
+    for page_num in range(start, stop):
+        if time() > deadline:
+            logger.warning(f"PDF extraction budget exceeded at page {page_num}")
+            break
+        pages.append(reader.pages[page_num].extract_text())
+    return pages
+
+
+def read_pdf_pages(path: str, start: int, stop: int, deadline: float) -> list[str]:
+    return read_reader_pages(_get_pdf_reader(path), start, stop, deadline)
+
+
+async def run_in_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+
+async def extract_docx_text(downloaded: "DownloadedFile") -> str | None:
+    if not uses_processes():
+        return await run_in_executor(read_docx, downloaded.stream())
+
+    with get_worker_path(downloaded) as path:
+        return await run_in_executor(read_docx, path)
+
+
+class PdfDocument:
+    """
+    A downloaded PDF being extracted, owns the download until closed
+    """
+
+    def __init__(self, downloaded: "DownloadedFile") -> None:
+        self.downloaded = downloaded
+        self.in_process = not uses_processes()
+        self.reader: PdfReader | None = None
+        self._resources = ExitStack()
+        self._resources.callback(downloaded.close)
+        self._path: str | None = None
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._path = self._resources.enter_context(get_worker_path(self.downloaded))
+        return self._path
+
+    def _parse(self) -> PdfInfo:
+        stream = self.downloaded.stream()
+        self.reader = PdfReader(stream)
+        return PdfInfo(len(self.reader.pages), fingerprint(self.reader, stream))
+
+    def close(self) -> None:
+        self.reader = None
+        self._resources.close()
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+async def get_pdf_info(document: PdfDocument) -> PdfInfo:
+    if document.in_process:
+        return await run_in_executor(document._parse)
+    return await run_in_executor(read_pdf_info, document.path)
+
+
+async def iter_pdf_pages(
+    document: PdfDocument, page_count: int | None = None
+) -> AsyncIterator[str]:
+    """
+    Yield the text of each page in order, as soon as its page range is done
+
+    Page ranges of EXTRACTION_PAGES_PER_TASK are extracted in parallel by
+    worker processes, at most EXTRACTION_MAX_WORKERS queued at a time, or
+    one after the other from the reader parsed in process. At most
+    EXTRACTION_MAX_PAGES pages are read and no range is started once
+    EXTRACTION_TIME_BUDGET seconds have passed.
+    """
+    if page_count is None or (document.in_process and document.reader is None):
+        page_count = (await get_pdf_info(document)).page_count
+
+    last_page = min(page_count, settings.EXTRACTION_MAX_PAGES)
+    step = settings.EXTRACTION_PAGES_PER_TASK
+    deadline = time() + settings.EXTRACTION_TIME_BUDGET
+    starts = iter(range(0, last_page, step))
+    futures: deque[asyncio.Future[list[str]]] = deque()
+
+    def submit_next() -> None:
+        start = next(starts, None)
+        if start is None or time() > deadline:
+            return
+
+        stop = min(start + step, last_page)
+        if document.in_process:
+            # a reader must not be used by two threads at once
+            future = run_in_executor(
+                read_reader_pages, document.reader, start, stop, deadline
+            )
+        else:
+            future = run_in_executor(
+                read_pdf_pages, document.path, start, stop, deadline
+            )
+        futures.append(asyncio.ensure_future(future))
+
+    for _ in range(1 if document.in_process else settings.EXTRACTION_MAX_WORKERS):
+        submit_next()
+
+    try:
+        while futures:
+            pages = await futures.popleft()
+            submit_next()
+            for page in pages:
+                yield page
+        if time() > deadline:
+            logger.warning("PDF extraction time budget exceeded")
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+async def extract_pdf_text(document: PdfDocument, page_count: int | None = None) -> str:
+    return " ".join([page async for page in iter_pdf_pages(document, page_count)])
@@ -0,0 +1,35 @@
+"""
+JSON encoding on the hot paths
+
+Pub/sub payloads built from pydantic models are encoded with
+`model_dump_json`, plain values with orjson. Subscribers forward the encoded
+payloads to the websockets as they are, instead of decoding and encoding
+them again for every socket.
+"""
+from typing import Any
+
+import orjson
+
+SENDER_KEY = '"sender_user_email"'
+
+
+def json_dumps(value: Any) -> str:
+    return orjson.dumps(value, default=str).decode()
+
+
+def json_loads(data: str | bytes) -> Any:
+    return orjson.loads(data)
+
+
+def get_sender_email(data: str) -> str | None:
+    """
+    Sender of a broadcast payload, payloads without one are not decoded
+    """
+    if SENDER_KEY not in data:
+        return None
+
+    try:
+        payload = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return None
+    return payload.get("sender_user_email") if isinstance(payload, dict) else None
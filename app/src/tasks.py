@@ -1,8 +1,10 @@
 import logging
 
 from celery import Celery
+from celery.signals import before_task_publish
 
 from src.config import get_settings
+from src.tracing import TRACEPARENT_HEADER, get_traceparent
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -11,7 +13,12 @@ celery_app: Celery = Celery(
     "tasks",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["src.tasks", "src.chat.bot_ai", "src.annotations.background_tasks"],
+    include=[
+        "src.tasks",
+        "src.worker",
+        "src.chat.bot_ai",
+        "src.annotations.background_tasks",
+    ],
 )
 
 
@@ -25,6 +32,14 @@ def your_task():
     return {"status": "OK"}
 
 
+@before_task_publish.connect
+def add_traceparent_header(headers: dict, **kwargs) -> None:
+    # the worker continues the trace of the code which sent the task
+    traceparent = get_traceparent()
+    if traceparent:
+        headers[TRACEPARENT_HEADER] = traceparent
+
+
 # Schedule the task to run every minute
 # celery_app.conf.beat_schedule = {
 #     "every-minute-task": {
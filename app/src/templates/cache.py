@@ -0,0 +1,83 @@
+import json
+from hashlib import sha256
+from logging import getLogger
+
+from redis.exceptions import RedisError
+
+from src.config import settings
+from src.redis_client import pub_sub_manager
+
+logger = getLogger(__name__)
+
+TEMPLATE_LISTING_KEY_PREFIX = "templates:listing"
+TEMPLATE_LISTING_VERSION_KEY_PREFIX = "templates:listing:version"
+
+
+class TemplateListingCache:
+    """
+    Redis cache of the serialized template listings of every user
+
+    Versions are kept per audience, the listener topics of the user and of
+    each organization. Keys include the versions of the user and of their
+    organizations, and a template change bumps only the versions of the
+    audience which sees the template, so other users keep their listings.
+    Entries expire after TEMPLATE_LISTING_CACHE_TTL.
+    """
+
+    @staticmethod
+    def _version_key(topic: str) -> str:
+        return f"{TEMPLATE_LISTING_VERSION_KEY_PREFIX}:{topic}"
+
+    async def get_key(
+        self, user_id: int, topics: list[str], variant: str
+    ) -> str | None:
+        """
+        Key of the listing of the user for the variant (filters, organizations),
+        `topics` being the audiences the user belongs to
+        """
+        try:
+            redis = pub_sub_manager.get_connection()
+            versions = await redis.mget([self._version_key(topic) for topic in topics])
+        except RedisError as e:
+            logger.error(f"Failed to read template listing versions: {e}")
+            return None
+
+        variant_hash = sha256(
+            json.dumps([variant, [version or "0" for version in versions]]).encode()
+        ).hexdigest()
+        return f"{TEMPLATE_LISTING_KEY_PREFIX}:{user_id}:{variant_hash}"
+
+    async def get(self, key: str) -> str | None:
+        try:
+            return await pub_sub_manager.get_connection().get(key)
+        except RedisError as e:
+            logger.error(f"Failed to read cached template listing {key}: {e}")
+            return None
+
+    async def set(self, key: str, listing: str) -> None:
+        try:
+            await pub_sub_manager.get_connection().set(
+                key, listing, ex=settings.TEMPLATE_LISTING_CACHE_TTL
+            )
+        except RedisError as e:
+            logger.error(f"Failed to cache template listing {key}: {e}")
+
+    async def invalidate(self, *topics: str) -> None:
+        """
+        Invalidates the listings of the audiences (listener topics)
+        """
+        if not topics:
+            return
+
+        try:
+            async with pub_sub_manager.get_connection().pipeline(
+                transaction=False
+            ) as pipe:
+                for topic in set(topics):
+                    pipe.incr(self._version_key(topic))
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to invalidate template listings: {e}")
+
+
+template_listing_cache = TemplateListingCache()
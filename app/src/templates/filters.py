@@ -49,4 +49,4 @@ async def get_query_filtered_by_visibility(  # type: ignore
         case VisibilityChoices.ORGANIZATION:
             return get_organization_templates_query(organization_uuid)
         case None:
-            return await get_user_and_organization_templates_query(user_id)
+            return get_user_and_organization_templates_query(user_id)
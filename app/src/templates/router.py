@@ -2,19 +2,25 @@ import json
 import logging
 
 from asyncpg import InvalidTextRepresentationError
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response, status
 from fastapi_filter import FilterDepends
 
 from src.annotations.constants import TEXT_SELECTOR_PROMPT_TEMPLATE
+from src.auth.context import AuthContext, get_auth_context
 from src.auth.jwt import parse_jwt_user_data
 from src.auth.schemas import JWTData
 from src.config import settings
 from src.constants import Environment
-from src.listener.constants import listener_room_name, template_changed_info
+from src.database import database
+from src.listener.constants import template_changed_info
 from src.listener.schemas import WSEventMessage
-from src.organizations.security import is_user_in_organization
+from src.listener.topics import (
+    get_auth_context_topics,
+    get_visibility_topics,
+    publish_listener_event,
+)
 from src.pagination_utils import enrich_paginated_items
-from src.redis_client import pub_sub_manager
+from src.templates.cache import template_listing_cache
 from src.templates.enums import VisibilityChoices
 from src.templates.exceptions import (
     ForbiddenVisibilityState,
@@ -30,6 +36,8 @@ from src.templates.schemas import (
     TemplateDB,
     TemplateDeleteOutput,
     TemplateDetails,
+    TemplateListing,
+    TemplateListItem,
     TemplateUpdate,
     TemplateUpdateInputDetails,
     TemplateUpdateNameInput,
@@ -38,46 +46,71 @@ from src.templates.service import (
     create_template_in_db,
     delete_template_from_db,
     get_template_by_id_from_db,
+    get_template_listing_query,
     update_template_in_db,
     update_template_name_in_db,
 )
+from src.utils import etag_matches, get_etag
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
 
-@router.get("")
+def get_template_topics(template: TemplateDB | TemplateDetails) -> list[str]:
+    return get_visibility_topics(
+        template.user_id, template.visibility, template.organization_uuid
+    )
+
+
+@router.get("", response_model=TemplateListing)
 async def get_templates(
+    request: Request,
     visibility: str | None = None,
     organization_uuid: str | None = None,
     template_filter: TemplateFilter = FilterDepends(TemplateFilter),
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
-    if organization_uuid and not await is_user_in_organization(
-        jwt_data.user_id, str(organization_uuid)
-    ):
+    if organization_uuid and not auth.is_in_organization(str(organization_uuid)):
         # User is not in the organization
         # thus he cannot see the rooms
         raise TemplateDoesNotExist()
 
-    query = await get_query_filtered_by_visibility(
-        visibility, jwt_data.user_id, organization_uuid
+    # the visible templates depend on the filters and on the organizations
+    variant = json.dumps(
+        [
+            sorted(request.query_params.multi_items()),
+            sorted(auth.organization_uuids),
+        ]
     )
+    cache_key = await template_listing_cache.get_key(
+        jwt_data.user_id, get_auth_context_topics(auth), variant
+    )
+    listing = await template_listing_cache.get(cache_key) if cache_key else None
+
+    if listing is None:
+        query = await get_query_filtered_by_visibility(
+            visibility, jwt_data.user_id, organization_uuid
+        )
 
-    filtered_query = template_filter.filter(query)
-    sorted_query = template_filter.sort(filtered_query)
+        filtered_query = template_filter.filter(get_template_listing_query(query))
+        sorted_query = template_filter.sort(filtered_query)
 
-    # TemplateDB
-    from src.database import database
+        templates_db = await database.fetch_all(sorted_query)
+        templates = [TemplateListItem(**dict(template)) for template in templates_db]
+        enrich_paginated_items(templates)
 
-    templates_db = await database.fetch_all(sorted_query)
-    templates = [TemplateDB(**dict(template)) for template in templates_db]
-    enrich_paginated_items(templates)
+        listing = TemplateListing(items=templates).model_dump_json()
+        if cache_key:
+            await template_listing_cache.set(cache_key, listing)
 
-    return {
-        "items": templates,
-    }
+    etag = get_etag(listing)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(listing, media_type="application/json", headers=headers)
 
 
 @router.get("/{template_id}", response_model=TemplateDetails)
@@ -108,14 +141,9 @@ async def create_template(
         details = TemplateDetails(**dict(template))
 
         if settings.ENVIRONMENT != Environment.TESTING:
-            await pub_sub_manager.publish(
-                listener_room_name,
-                json.dumps(
-                    WSEventMessage(
-                        type=template_changed_info,
-                        id=str(details.uuid),
-                    ).model_dump(mode="json")
-                ),
+            await publish_listener_event(
+                WSEventMessage(type=template_changed_info, id=str(details.uuid)),
+                *get_template_topics(details),
             )
 
         return details
@@ -129,6 +157,7 @@ async def update_template(
     template_id: str,
     template_data: TemplateUpdate,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
     current_template = await get_template_by_id_from_db(template_id)
     if not current_template:
@@ -140,8 +169,8 @@ async def update_template(
     ):
         raise TemplateDoesNotExist()
 
-    if template_schema.organization_uuid and not await is_user_in_organization(
-        jwt_data.user_id, str(template_schema.organization_uuid)
+    if template_schema.organization_uuid and not auth.is_in_organization(
+        str(template_schema.organization_uuid)
     ):
         # User is not in the organization
         # thus he cannot see the templates
@@ -163,14 +192,11 @@ async def update_template(
         details = TemplateDetails(**dict(template))
 
         if settings.ENVIRONMENT != Environment.TESTING:
-            await pub_sub_manager.publish(
-                listener_room_name,
-                json.dumps(
-                    WSEventMessage(
-                        type=template_changed_info,
-                        id=str(details.uuid),
-                    ).model_dump(mode="json")
-                ),
+            # the audience of the previous visibility is told too
+            await publish_listener_event(
+                WSEventMessage(type=template_changed_info, id=str(details.uuid)),
+                *get_template_topics(template_schema),
+                *get_template_topics(details),
             )
 
         return details
@@ -193,14 +219,9 @@ async def update_template_name(
         details = TemplateDetails(**dict(template))
 
         if settings.ENVIRONMENT != Environment.TESTING:
-            await pub_sub_manager.publish(
-                listener_room_name,
-                json.dumps(
-                    WSEventMessage(
-                        type=template_changed_info,
-                        id=str(details.uuid),
-                    ).model_dump(mode="json")
-                ),
+            await publish_listener_event(
+                WSEventMessage(type=template_changed_info, id=str(details.uuid)),
+                *get_template_topics(details),
             )
 
         return details
@@ -214,7 +235,17 @@ async def delete_template(
     template_id: str,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
 ):
-    await delete_template_from_db(template_id, jwt_data.user_id)
+    template = await delete_template_from_db(template_id, jwt_data.user_id)
+
+    if template and settings.ENVIRONMENT != Environment.TESTING:
+        await publish_listener_event(
+            WSEventMessage(type=template_changed_info, id=template_id),
+            *get_visibility_topics(
+                template["user_id"],
+                template["visibility"],
+                template["organization_uuid"],
+            ),
+        )
 
     return TemplateDeleteOutput(status="success")
 
@@ -32,6 +32,21 @@ class TemplateDB(TemplateBase):
     updated_at: datetime | None = None
 
 
+class TemplateListItem(BaseModel):
+    uuid: UUID
+    name: str | None = None
+    share: bool = False
+    visibility: str = VisibilityChoices.JUST_ME
+    organization_uuid: UUID | None = None
+    user_id: int
+    created_at: datetime
+    updated_at: datetime | None = None
+
+
+class TemplateListing(BaseModel):
+    items: list[TemplateListItem]
+
+
 class TemplateCreateInput(TemplateBase):
     content: str
 
@@ -1,12 +1,13 @@
 import uuid
 
 from databases.interfaces import Record
-from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy import and_, any_, delete, func, insert, or_, select, update
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.sql.selectable import Select
 
-from src.database import Template, User, database
-from src.organizations.service import get_organizations_by_user_id_from_db
+from src.database import OrganizationUser, Template, User, database
+from src.listener.topics import get_visibility_topics
+from src.templates.cache import template_listing_cache
 from src.templates.enums import VisibilityChoices
 from src.templates.schemas import (
     TemplateCreateInputDetails,
@@ -15,6 +16,24 @@ from src.templates.schemas import (
 )
 
 
+async def invalidate_template_listings(*templates: Record | None) -> None:
+    """
+    Invalidates the cached listings of the users who see the templates
+    """
+    await template_listing_cache.invalidate(
+        *[
+            topic
+            for template in templates
+            if template
+            for topic in get_visibility_topics(
+                template["user_id"],
+                template["visibility"],
+                template["organization_uuid"],
+            )
+        ]
+    )
+
+
 def get_templates_query(user_id) -> Select:
     select_query = (
         select(Template)
@@ -64,23 +83,43 @@ def get_organization_templates_query(organization_uuid: str | None) -> Select:
     return select_query
 
 
-async def get_user_and_organization_templates_query(user_id: int) -> Select:
-    where_clause = (and_(*get_user_templates_where_clause(user_id)),)
-
-    organizations: list[Record] = await get_organizations_by_user_id_from_db(user_id)
-    for organization in organizations:
-        if not organization["uuid"]:
-            continue
+def get_user_and_organization_templates_query(user_id: int) -> Select:
+    # ARRAY(SELECT ...) is evaluated once, before the template scan
+    user_organization_uuids = func.array(
+        select(OrganizationUser.organization_uuid)
+        .where(OrganizationUser.auth_user_id == user_id)
+        .scalar_subquery()
+    )
 
-        where_clause += (  # type: ignore
-            and_(*get_organizations_templates_where_clause(organization["uuid"])),
+    select_query = select(Template).where(
+        or_(
+            and_(*get_user_templates_where_clause(user_id)),
+            and_(
+                Template.visibility == VisibilityChoices.ORGANIZATION,
+                Template.organization_uuid == any_(user_organization_uuids),
+            ),
         )
-
-    select_query = select(Template).where(or_(*where_clause))
+    )
 
     return select_query
 
 
+def get_template_listing_query(query: Select) -> Select:
+    """
+    The query without the heavy content columns, for listings
+    """
+    return query.with_only_columns(
+        Template.uuid,
+        Template.name,
+        Template.share,
+        Template.visibility,
+        Template.organization_uuid,
+        Template.user_id,
+        Template.created_at,
+        Template.updated_at,
+    )
+
+
 async def get_template_by_id_from_db(template_id: str) -> Record | None:
     select_query = select(Template).where(Template.uuid == template_id)
 
@@ -104,7 +143,10 @@ async def create_template_in_db(
     }
 
     insert_query = insert(Template).values(**insert_values).returning(Template)
-    return await database.fetch_one(insert_query)
+    template = await database.fetch_one(insert_query)
+    await invalidate_template_listings(template)
+
+    return template
 
 
 async def update_template_in_db(
@@ -142,10 +184,14 @@ async def update_template_in_db(
     )
 
     try:
-        return await database.fetch_one(update_query)
+        template = await database.fetch_one(update_query)
     except NoResultFound:
         return None
 
+    # the template may have left the audience which saw it
+    await invalidate_template_listings(current_template, template)
+    return template
+
 
 async def update_template_name_in_db(
     template_id: str, update_data: TemplateUpdateNameInput
@@ -159,11 +205,19 @@ async def update_template_name_in_db(
         .returning(Template)
     )
 
-    return await database.fetch_one(update_query)
+    template = await database.fetch_one(update_query)
+    await invalidate_template_listings(template)
+
+    return template
 
 
 async def delete_template_from_db(template_id: str, user_id: int) -> Record | None:
-    delete_query = delete(Template).where(
-        Template.uuid == template_id, Template.user_id == user_id
+    delete_query = (
+        delete(Template)
+        .where(Template.uuid == template_id, Template.user_id == user_id)
+        .returning(Template)
     )
-    return await database.fetch_one(delete_query)
+    template = await database.fetch_one(delete_query)
+    await invalidate_template_listings(template)
+
+    return template
@@ -1,7 +1,7 @@
 from logging import getLogger
 
 from databases.interfaces import Record
-from sqlalchemy import func, insert, select, update
+from sqlalchemy import insert, select, update
 
 from src.chat.constants import MODEL_NAME
 from src.chat.schemas import MessageDBWithTokenUsage, MessageDetails
@@ -13,34 +13,12 @@ from src.tokenizer.tiktoken import count_content_tokens
 logger = getLogger(__name__)
 
 
-async def get_max_id() -> int:
-    query = select(func.max(TokenUsage.id))
-    result = await database.fetch_val(query)
-    return result or 0  # Return 0 if no records exist
-
-
-async def generate_new_id() -> int:
-    max_id = await get_max_id()
-    return max_id + 1
-
-
 async def create_token_usage_in_db(token_usage_data: TokenUsageInput) -> Record | None:
-    insert_values = {
-        **token_usage_data.model_dump(),
-    }
-
-    try:
-        insert_query = insert(TokenUsage).values(**insert_values).returning(TokenUsage)
-        return await database.fetch_one(insert_query)
-    except Exception as e:
-        logger.error(f"Error while inserting token usage: {e}")
-        logger.info("Token usage already exists in the database")
-        id_ = await generate_new_id()
-        max_insert_query = (
-            insert(TokenUsage).values(id=id_, **insert_values).returning(TokenUsage)
-        )
-        logger.info(f"Inserting token usage with id: {id_}")
-        return await database.fetch_one(max_insert_query)
+    # the id is taken from token_usage_id_seq
+    insert_query = (
+        insert(TokenUsage).values(**token_usage_data.model_dump()).returning(TokenUsage)
+    )
+    return await database.fetch_one(insert_query)
 
 
 def get_token_usage_input_from_message(message: MessageDetails) -> TokenUsageInput:
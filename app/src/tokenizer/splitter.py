@@ -0,0 +1,77 @@
+from functools import lru_cache
+from logging import getLogger
+from typing import AsyncIterable, AsyncIterator
+
+import tiktoken
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from tiktoken import Encoding
+
+from src.user_models.constants import KNOWN_CONTEXT_WINDOWS
+
+logger = getLogger(__name__)
+
+# encoding used by `RecursiveCharacterTextSplitter.from_tiktoken_encoder`
+SPLITTER_ENCODING = "gpt2"
+DEFAULT_CHUNK_SIZE = 4096
+
+
+@lru_cache()
+def get_encoding() -> Encoding:
+    return tiktoken.get_encoding(SPLITTER_ENCODING)
+
+
+@lru_cache(maxsize=64)
+def get_text_splitter(chunk_size: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=SPLITTER_ENCODING,
+        chunk_size=chunk_size,
+        chunk_overlap=0,
+    )
+
+
+def get_chunk_size(model: str) -> int:
+    return KNOWN_CONTEXT_WINDOWS.get(model, DEFAULT_CHUNK_SIZE)
+
+
+def split_text(content: str, model: str) -> list[str]:
+    return get_text_splitter(get_chunk_size(model)).split_text(content)
+
+
+async def split_text_stream(
+    pieces: AsyncIterable[str], model: str
+) -> AsyncIterator[str]:
+    """
+    Split a stream of text pieces (pages, paragraphs) into token-bounded splits
+
+    Each split is emitted as soon as it is full, so the first one is ready
+    before the rest of the document has been read. The last, possibly
+    underfull split is carried over and merged with the following pieces.
+    """
+    chunk_size = get_chunk_size(model)
+    splitter = get_text_splitter(chunk_size)
+    encoding = get_encoding()
+
+    buffer = ""
+    buffer_tokens = 0
+    async for piece in pieces:
+        if not piece:
+            continue
+        buffer = f"{buffer} {piece}" if buffer else piece
+        buffer_tokens += len(encoding.encode(piece, disallowed_special=()))
+        if buffer_tokens < chunk_size:
+            continue
+
+        splits = splitter.split_text(buffer)
+        for split in splits[:-1]:
+            yield split
+        buffer = splits[-1] if splits else ""
+        buffer_tokens = len(encoding.encode(buffer, disallowed_special=()))
+
+    if buffer:
+        for split in splitter.split_text(buffer):
+            yield split
+
+
+async def iter_pieces(*pieces: str) -> AsyncIterator[str]:
+    for piece in pieces:
+        yield piece
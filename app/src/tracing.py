@@ -0,0 +1,252 @@
+"""
+Tracing of a request across the API, the task runners and the LLM calls
+
+Spans follow the OpenTelemetry model: every span of a request shares the
+trace id, and has its own span id and the id of its parent. The current span
+is kept in a context variable, so it follows the code across awaits, tasks
+and `run_coroutine_threadsafe`. Between processes the trace travels as a W3C
+`traceparent` value: in HTTP request headers, in the Celery task headers and
+in the job stream entries. Broadcast payloads carry the trace id, so a
+client event can be matched with the spans that produced it.
+
+Finished spans are handed to the exporters of `tracer`: LoggingSpanExporter
+when TRACING_LOG_SPANS is set, InMemorySpanExporter in tests.
+"""
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Protocol
+
+import httpx
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    start_time: float = field(default_factory=time.time)
+    end_time: float | None = None
+    error: str | None = None
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None:
+        ...
+
+
+class LoggingSpanExporter:
+    def export(self, span: Span) -> None:
+        logger.info(
+            f"Span {span.name} trace={span.trace_id} span={span.span_id} "
+            f"parent={span.parent_id} duration={span.duration:.4f}s "
+            f"error={span.error} {span.attributes}"
+        )
+
+
+class InMemorySpanExporter:
+    """
+    Keeps the finished spans, for tests
+    """
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def get_finished_spans(self, name: str | None = None) -> list[Span]:
+        return [span for span in self.spans if name is None or span.name == name]
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def parse_traceparent(traceparent: str | None) -> tuple[str, str] | None:
+    """
+    Trace id and parent span id of a traceparent value, None if invalid
+    """
+    match = TRACEPARENT_PATTERN.match(traceparent or "")
+    if not match or not int(match.group(1), 16) or not int(match.group(2), 16):
+        return None
+    return match.group(1), match.group(2)
+
+
+def get_current_span() -> Span | None:
+    return _current_span.get()
+
+
+def get_trace_id() -> str | None:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def get_traceparent() -> str | None:
+    span = _current_span.get()
+    return span.traceparent if span else None
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.exporters: list[SpanExporter] = []
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: SpanExporter) -> None:
+        if exporter in self.exporters:
+            self.exporters.remove(exporter)
+
+    def start(self, name: str, traceparent: str | None = None, **attributes) -> Span:
+        """
+        Starts a span, child of the remote `traceparent` when given and valid,
+        otherwise of the current span
+        """
+        remote_parent = parse_traceparent(traceparent)
+        parent_id: str | None
+        if remote_parent:
+            trace_id, parent_id = remote_parent
+        else:
+            current = _current_span.get()
+            trace_id = current.trace_id if current else _new_id(16)
+            parent_id = current.span_id if current else None
+
+        return Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=_new_id(8),
+            parent_id=parent_id,
+            attributes=attributes,
+        )
+
+    def activate(self, span: Span) -> Token:
+        """
+        Makes the span current, until `deactivate` is called with the token
+        """
+        return _current_span.set(span)
+
+    def deactivate(self, token: Token) -> None:
+        _current_span.reset(token)
+
+    def end(self, span: Span, error: BaseException | None = None) -> None:
+        span.end_time = time.time()
+        if error is not None:
+            span.error = repr(error)
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.error(f"Failed to export span {span.name}: {e}")
+
+    @contextmanager
+    def span(
+        self, name: str, traceparent: str | None = None, **attributes
+    ) -> Iterator[Span]:
+        """
+        Runs the block in a new span, which is the current span meanwhile
+        """
+        span = self.start(name, traceparent, **attributes)
+        token = self.activate(span)
+        error: BaseException | None = None
+        try:
+            yield span
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.deactivate(token)
+            self.end(span, error)
+
+
+tracer = Tracer()
+if settings.TRACING_LOG_SPANS:
+    tracer.add_exporter(LoggingSpanExporter())
+
+
+def start_span(name: str, traceparent: str | None = None, **attributes):
+    return tracer.span(name, traceparent, **attributes)
+
+
+@contextmanager
+def trace_http_request(method: str, url: str) -> Iterator[Span]:
+    """
+    Span of an outgoing HTTP request, only the host is recorded as URLs may
+    carry credentials
+    """
+    with start_span("http", method=method, host=httpx.URL(url).host) as span:
+        yield span
+
+
+class TracingTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx transport with a span around every request, up to its headers
+    """
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with start_span("http", method=request.method, host=request.url.host) as span:
+            response = await super().handle_async_request(request)
+            span.set_attribute("status_code", response.status_code)
+            return response
+
+
+class TracingMiddleware:
+    """
+    Runs every HTTP request in a span, continuing the trace of an incoming
+    traceparent header, and returns the traceparent of the span
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = Headers(scope=scope).get(TRACEPARENT_HEADER)
+        with start_span(
+            f"{scope['method']} {scope['path']}", traceparent, method=scope["method"]
+        ) as span:
+
+            async def send_with_traceparent(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("status_code", message["status"])
+                    headers = MutableHeaders(scope=message)
+                    headers.append(TRACEPARENT_HEADER, span.traceparent)
+                await send(message)
+
+            await self.app(scope, receive, send_with_traceparent)
@@ -1,6 +1,6 @@
 import logging
 
-from src.chat.bot_ai import bot_ai
+from src.chat.bot_ai import get_bot_ai
 from src.chat.constants import MAX_TOKENS
 from src.tokenizer.tiktoken import count_content_tokens
 from src.user_files.schemas import UserFileDB
@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 
 
 async def get_optimized_content(data: UserFileDB, room_id: str) -> str:
+    bot_ai = get_bot_ai()
     pre_processed_content = data.content
     if not (
         data.source_value.endswith(".txt")
@@ -1,20 +1,20 @@
-import json
 import logging
 
-from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi import APIRouter, Depends, File, Request, Response, UploadFile
 
 from src.auth.exceptions import UserNotFound
 from src.auth.jwt import parse_jwt_user_data
 from src.auth.schemas import JWTData, UserDB
 from src.auth.service import get_user_by_id
-from src.chat.bot_ai import bot_ai
+from src.chat.bot_ai import get_bot_ai
+from src.conditional import check_not_modified, get_last_modified, get_version_etag
 from src.google_drive.downloader import get_google_drive_file_details
 from src.listener.constants import (
-    listener_room_name,
     optimizing_user_file_content_info,
     user_file_updated_info,
 )
 from src.listener.schemas import WSEventMessage
+from src.listener.topics import publish_listener_event, user_topic
 from src.redis_client import pub_sub_manager
 from src.scraping.downloaders import download_and_extract_content_from_url
 from src.user_files.constants import UserFileSourceType
@@ -28,6 +28,7 @@ from src.user_files.service import (
     delete_user_file_from_db,
     get_specific_user_file_from_db,
     get_user_files_from_db,
+    get_user_files_version_from_db,
     upsert_user_file_to_db,
 )
 
@@ -38,8 +39,16 @@ logger = logging.getLogger(__name__)
 
 @router.get("", response_model=list[UserFileDB])
 async def get_user_files(
+    request: Request,
+    response: Response,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
 ):
+    version = await get_user_files_version_from_db(jwt_data.user_id)
+    etag = get_version_etag(jwt_data.user_id, dict(version))
+    last_modified = get_last_modified(version["updated_at"])
+    if not_modified := check_not_modified(request, response, etag, last_modified):
+        return not_modified
+
     user_files = await get_user_files_from_db(jwt_data.user_id)
 
     return [UserFileDB(**dict(file)) for file in user_files]
@@ -78,7 +87,7 @@ async def create_user_file(
 
         file_data.content = url_data.get("content", "")
         # get title from url file name
-        file_data.title = await bot_ai.get_title_from_url(
+        file_data.title = await get_bot_ai().get_title_from_url(
             url=file_data.source_value, user_id=jwt_data.user_id
         )
         file_data.extension = file_data.source_value.split(".")[-1]
@@ -95,13 +104,11 @@ async def create_user_file(
         file_data.title = file_details.get("name", "")
     await pub_sub_manager.publish(
         file_data.room_id or "",
-        json.dumps(
-            WSEventMessage(
-                type=optimizing_user_file_content_info,
-                id=str(jwt_data.user_id),
-                source="update-user-file-content",
-            ).model_dump(mode="json")
-        ),
+        WSEventMessage(
+            type=optimizing_user_file_content_info,
+            id=str(jwt_data.user_id),
+            source="update-user-file-content",
+        ).model_dump_json(),
     )
 
     user_file = await upsert_user_file_to_db(jwt_data.user_id, file_data)
@@ -109,15 +116,13 @@ async def create_user_file(
     if not user_file:
         raise UserFileAlreadyExists()
 
-    await pub_sub_manager.publish(
-        listener_room_name,
-        json.dumps(
-            WSEventMessage(
-                type=user_file_updated_info,
-                id=str(jwt_data.user_id),
-                source="update-user-file-content",
-            ).model_dump(mode="json")
+    await publish_listener_event(
+        WSEventMessage(
+            type=user_file_updated_info,
+            id=str(jwt_data.user_id),
+            source="update-user-file-content",
         ),
+        user_topic(jwt_data.user_id),
     )
 
     return UserFileDB(**dict(user_file))  # Return the processed file data
@@ -134,7 +139,7 @@ async def create_user_file_from_file(
         title=file.filename or "file",
         content=file.file.read().decode("utf-8"),
     )
-    optimized_content = await bot_ai.optimize_content(
+    optimized_content = await get_bot_ai().optimize_content(
         content=data.content, user_id=jwt_data.user_id, room_id=""
     )
     data.optimized_content = optimized_content
@@ -1,7 +1,7 @@
 import uuid
 
 from databases.interfaces import Record
-from sqlalchemy import delete, insert, select, update
+from sqlalchemy import delete, func, insert, select, update
 
 from src.database import UserFile, database
 from src.user_files.schemas import CreateUserFileInput, NewUserFileContent
@@ -13,6 +13,18 @@ async def get_user_files_from_db(user_id: int) -> list[Record]:
     return await database.fetch_all(select_query)
 
 
+async def get_user_files_version_from_db(user_id: int) -> Record:
+    select_query = select(
+        func.count(UserFile.uuid).label("count"),
+        func.max(UserFile.updated_at).label("updated_at"),
+    ).where(UserFile.user == user_id)
+
+    version = await database.fetch_one(select_query)
+    # an aggregate without GROUP BY always returns one row
+    assert version is not None
+    return version
+
+
 async def get_specific_user_file_from_db(file_uuid: str, user_id: int) -> Record | None:
     select_query = select(UserFile).where(
         UserFile.uuid == file_uuid,
@@ -0,0 +1,128 @@
+import asyncio
+import json
+from collections import OrderedDict
+from hashlib import sha256
+from logging import getLogger
+from time import time
+from typing import Callable, NamedTuple
+
+from redis.exceptions import RedisError
+
+from src.config import settings
+from src.redis_client import pub_sub_manager
+
+logger = getLogger(__name__)
+
+MODEL_CATALOG_VERSION_KEY = "models:catalog:version"
+MODEL_CATALOG_DIGEST_KEY_PREFIX = "models:catalog:digest"
+
+ModelsFetcher = Callable[[str | None], tuple[list[str], dict[str, int]]]
+
+
+class CatalogEntry(NamedTuple):
+    models: list[str]
+    context_windows: dict[str, int]
+    fetched_at: float
+
+
+class ModelCatalog:
+    """
+    In-process cache of provider model lists keyed by provider and API key hash
+
+    Entries younger than MODEL_CATALOG_TTL are served as they are. Older ones
+    are served for up to MODEL_CATALOG_STALE_TTL while a background task
+    refreshes them. Concurrent misses for the same key share one fetch, and
+    the blocking SDK calls run in threads, so providers are fetched
+    concurrently.
+
+    A version shared in Redis is bumped whenever a fetch returns models which
+    differ from the last ones fetched for that key by any process, so it can
+    validate responses built from the catalog without fetching it.
+    """
+
+    def __init__(self, fetchers: dict[str, ModelsFetcher]) -> None:
+        self.fetchers = fetchers
+        self._entries: OrderedDict[tuple[str, str], CatalogEntry] = OrderedDict()
+        self._in_flight: dict[tuple[str, str], asyncio.Task[CatalogEntry]] = {}
+
+    @staticmethod
+    def _key(provider: str, api_key: str | None) -> tuple[str, str]:
+        return provider, sha256((api_key or "").encode()).hexdigest()
+
+    async def get(
+        self, provider: str, api_key: str | None
+    ) -> tuple[list[str], dict[str, int]]:
+        key = self._key(provider, api_key)
+        entry = self._entries.get(key)
+        if entry:
+            self._entries.move_to_end(key)
+            age = time() - entry.fetched_at
+            if age < settings.MODEL_CATALOG_TTL:
+                return list(entry.models), dict(entry.context_windows)
+            if age < settings.MODEL_CATALOG_STALE_TTL:
+                logger.info(f"Serving stale {provider} models, refreshing")
+                self._refresh(key, api_key)
+                return list(entry.models), dict(entry.context_windows)
+
+        # a client going away must not cancel the fetch shared with others
+        fetched = await asyncio.shield(self._refresh(key, api_key))
+        return list(fetched.models), dict(fetched.context_windows)
+
+    def _refresh(
+        self, key: tuple[str, str], api_key: str | None
+    ) -> asyncio.Task[CatalogEntry]:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, api_key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_fetched(key, done))
+        return task
+
+    async def _fetch(self, key: tuple[str, str], api_key: str | None) -> CatalogEntry:
+        provider, _ = key
+        start = time()
+        models, context_windows = await asyncio.to_thread(
+            self.fetchers[provider], api_key
+        )
+        logger.info(f"Fetched {len(models)} {provider} models in {time() - start:.2f}s")
+
+        entry = CatalogEntry(models, context_windows, time())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.MODEL_CATALOG_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+        await self._update_version(key, entry)
+        return entry
+
+    async def get_version(self) -> str | None:
+        try:
+            redis = pub_sub_manager.get_connection()
+            return await redis.get(MODEL_CATALOG_VERSION_KEY) or "0"
+        except RedisError as e:
+            logger.error(f"Failed to read model catalog version: {e}")
+            return None
+
+    @staticmethod
+    async def _update_version(key: tuple[str, str], entry: CatalogEntry) -> None:
+        provider, api_key_hash = key
+        digest = sha256(
+            json.dumps([entry.models, entry.context_windows], sort_keys=True).encode()
+        ).hexdigest()
+        try:
+            redis = pub_sub_manager.get_connection()
+            previous = await redis.set(
+                f"{MODEL_CATALOG_DIGEST_KEY_PREFIX}:{provider}:{api_key_hash}",
+                digest,
+                ex=settings.MODEL_CATALOG_STALE_TTL,
+                get=True,
+            )
+            if previous != digest:
+                await redis.incr(MODEL_CATALOG_VERSION_KEY)
+        except RedisError as e:
+            logger.error(f"Failed to update model catalog version: {e}")
+
+    def _on_fetched(self, key: tuple[str, str], task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        # also retrieves the error of background refreshes nobody awaits
+        if not task.cancelled() and task.exception():
+            logger.error(f"Failed to fetch {key[0]} models: {task.exception()}")
@@ -0,0 +1,242 @@
+"""
+Process-wide pool of LLM clients
+
+LangChain chat models and OpenAI SDK clients are reused across tasks, so
+their HTTP connection pools and TLS sessions stay warm and API keys are
+decrypted only once. The pool is a bounded LRU keyed by (provider, model,
+temperature, API key hash). When an entry is evicted, its HTTP clients are
+closed as soon as no running task still holds it.
+"""
+import asyncio
+import inspect
+import weakref
+from collections import OrderedDict
+from hashlib import sha256
+from logging import getLogger
+from typing import Any, Callable, NamedTuple
+
+from langchain_anthropic import ChatAnthropic
+from langchain_core.language_models import BaseChatModel
+from langchain_groq import ChatGroq
+from langchain_openai import ChatOpenAI
+from openai import AsyncClient, Client
+from pydantic.v1 import SecretStr
+
+from src.chat.config import settings as chat_settings
+from src.config import settings
+from src.user_models.service import decrypt_api_key
+
+logger = getLogger(__name__)
+
+# attributes under which the provider integrations keep their SDK clients
+_SDK_CLIENT_ATTRIBUTES = ("client", "async_client", "_client", "_async_client")
+
+
+class ClientKey(NamedTuple):
+    kind: str  # "chat" for chat models, "sdk" for OpenAI SDK clients
+    provider: str
+    model: str
+    temperature: float | None
+    api_key_hash: str
+
+
+def _create_chat_model(
+    provider: str, model: str, api_key: str, temperature: float | None
+) -> BaseChatModel | None:
+    kwargs: dict[str, Any] = {} if temperature is None else {"temperature": temperature}
+    if provider == "openai":
+        return ChatOpenAI(model=model, openai_api_key=api_key, **kwargs)  # type: ignore
+    if provider == "claude":
+        return ChatAnthropic(  # type: ignore
+            model=model, api_key=SecretStr(api_key), **kwargs
+        )
+    if provider == "groq":
+        return ChatGroq(  # type: ignore
+            model_name=model, groq_api_key=api_key, **kwargs
+        )
+    return None
+
+
+def _get_http_clients(value: Any) -> list[Any]:
+    """
+    SDK clients (openai.AsyncOpenAI, anthropic.Anthropic, ...) of a pooled value
+    """
+    if isinstance(value, tuple):
+        return [client for item in value for client in _get_http_clients(item)]
+    if hasattr(value, "close"):
+        return [value]
+
+    clients: list[Any] = []
+    for attribute in _SDK_CLIENT_ATTRIBUTES:
+        try:
+            client = getattr(value, attribute, None)
+        except Exception:
+            continue
+        if not hasattr(client, "close"):
+            # resources like `AsyncCompletions` keep the SDK client in `_client`
+            client = getattr(client, "_client", None)
+        if hasattr(client, "close") and all(client is not c for c in clients):
+            clients.append(client)
+    return clients
+
+
+async def _close_clients(clients: list[Any]) -> None:
+    for client in clients:
+        try:
+            result = client.close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning(f"Failed to close LLM client {type(client).__name__}: {e}")
+
+
+def _close_when_released(value: Any, loop: asyncio.AbstractEventLoop) -> None:
+    clients = _get_http_clients(value)
+
+    def _close() -> None:
+        if loop.is_closed():
+            return
+        loop.call_soon_threadsafe(
+            lambda: loop.create_task(_close_clients(clients))  # type: ignore
+        )
+
+    if isinstance(value, tuple):
+        # tuples can't be weakly referenced, their clients can
+        for item in value:
+            weakref.finalize(item, _close)
+    else:
+        weakref.finalize(value, _close)
+
+
+class LLMClientPool:
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._clients: OrderedDict[ClientKey, Any] = OrderedDict()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get(self, key: ClientKey, create: Callable[[], Any]) -> Any:
+        """
+        Return the pooled client, creating it with `create()` on a miss
+        """
+        self._bind_to_running_loop()
+
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            return client
+
+        client = create()
+        if client is None:
+            return None
+
+        logger.info(f"Created {key.provider} LLM client for {key.model or key.kind}")
+        self._clients[key] = client
+        while len(self._clients) > self.max_size:
+            evicted_key, evicted = self._clients.popitem(last=False)
+            logger.info(f"Evicting {evicted_key.provider} LLM client")
+            if self._loop is not None:
+                _close_when_released(evicted, self._loop)
+
+        return client
+
+    def _bind_to_running_loop(self) -> None:
+        """
+        SDK clients can't be shared between event loops, start over on a new one
+
+        The dropped clients are closed once released when the previous loop
+        still runs, right away otherwise.
+        """
+        try:
+            loop: asyncio.AbstractEventLoop | None = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is self._loop:
+            return
+
+        previous_loop, dropped = self._loop, list(self._clients.values())
+        self._clients.clear()
+        self._loop = loop
+        if previous_loop is not None and previous_loop.is_running():
+            # tasks on the previous loop (another thread) may still use them
+            for value in dropped:
+                _close_when_released(value, previous_loop)
+            return
+
+        clients = [client for value in dropped for client in _get_http_clients(value)]
+        if not clients:
+            return
+        if loop is not None:
+            loop.create_task(_close_clients(clients))
+        else:
+            asyncio.run(_close_clients(clients))
+
+    async def close(self) -> None:
+        clients = [
+            client
+            for value in self._clients.values()
+            for client in _get_http_clients(value)
+        ]
+        self._clients.clear()
+        await _close_clients(clients)
+
+
+llm_client_pool = LLMClientPool(settings.LLM_CLIENT_POOL_SIZE)
+
+
+def hash_api_key(api_key: str) -> str:
+    return sha256(api_key.encode()).hexdigest()
+
+
+def get_chat_model(
+    provider: str,
+    model: str,
+    encrypted_api_key: str,
+    temperature: float | None = None,
+) -> BaseChatModel | None:
+    """
+    Pooled chat model of a user model, the key is decrypted only on a miss
+    """
+    provider = provider.lower()
+
+    def _create() -> BaseChatModel | None:
+        chat_model = _create_chat_model(
+            provider, model, decrypt_api_key(encrypted_api_key), temperature
+        )
+        if chat_model is None:
+            logger.error(f"Unknown LLM provider: {provider}")
+        return chat_model
+
+    return llm_client_pool.get(
+        ClientKey(
+            "chat", provider, model, temperature, hash_api_key(encrypted_api_key)
+        ),
+        _create,
+    )
+
+
+def get_default_chat_model(
+    model: str, temperature: float | None = None
+) -> BaseChatModel:
+    """
+    Pooled OpenAI chat model using the application key
+    """
+    api_key = chat_settings.CHATGPT_KEY
+    return llm_client_pool.get(
+        ClientKey("chat", "openai", model, temperature, hash_api_key(api_key)),
+        lambda: _create_chat_model("openai", model, api_key, temperature),
+    )
+
+
+def get_openai_clients() -> tuple[AsyncClient, Client]:
+    """
+    Pooled OpenAI SDK clients using the application key
+    """
+    api_key = chat_settings.CHATGPT_KEY
+    return llm_client_pool.get(
+        ClientKey("sdk", "openai", "", None, hash_api_key(api_key)),
+        lambda: (AsyncClient(api_key=api_key), Client(api_key=api_key)),
+    )
@@ -5,6 +5,8 @@ import openai
 from anthropic import Anthropic
 from groq import Groq
 
+from src.user_models.catalog import ModelCatalog
+
 logger = getLogger(__name__)
 
 # Context windows for various models
@@ -153,6 +155,15 @@ def get_groq_models(api_key: str | None = None) -> Tuple[List[str], Dict[str, in
     return model_list, context_windows
 
 
+model_catalog = ModelCatalog(
+    {
+        "openai": get_openai_models,
+        "claude": get_anthropic_models,
+        "groq": get_groq_models,
+    }
+)
+
+
 async def get_available_models(
     api_key: str | None = None, provider: str | None = None
 ) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
@@ -162,17 +173,9 @@ async def get_available_models(
     if provider:
         provider = provider.lower()
         try:
-            if provider == "openai":
-                models, windows = get_openai_models(api_key)
-                available_models["openai"] = models
-                all_context_windows.update(windows)
-            elif provider == "claude":
-                models, windows = get_anthropic_models(api_key)
-                available_models["claude"] = models
-                all_context_windows.update(windows)
-            elif provider == "groq":
-                models, windows = get_groq_models(api_key)
-                available_models["groq"] = models
+            if provider in model_catalog.fetchers:
+                models, windows = await model_catalog.get(provider, api_key)
+                available_models[provider] = models
                 all_context_windows.update(windows)
         except Exception as e:
             logger.error(f"Error fetching models for {provider}: {e}")
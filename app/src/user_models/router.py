@@ -1,15 +1,20 @@
-import json
+import asyncio
 import logging
+from hashlib import sha256
+from time import time
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.exc import NoResultFound
 
+from src.auth.context import AuthContext, get_auth_context
 from src.auth.jwt import parse_jwt_user_data
 from src.auth.schemas import JWTData
-from src.listener.constants import listener_room_name, user_model_changed_info
+from src.conditional import check_not_modified, get_version_etag
+from src.config import settings
+from src.listener.constants import user_model_changed_info
 from src.listener.schemas import WSEventMessage
-from src.redis_client import pub_sub_manager
-from src.user_models.constants import get_available_models
+from src.listener.topics import get_auth_context_topics, publish_listener_event
+from src.user_models.constants import get_available_models, model_catalog
 from src.user_models.schemas import (
     UserModelCreateInput,
     UserModelDeleteOut,
@@ -47,7 +52,9 @@ async def get_available_models_endpoint(
     if provider_input:
         logger.info(f"Provider input: {provider_input}")
         logger.info(f"API key: {api_key}")
-    available_models, context_windows = await get_available_models(api_key, provider_input)
+    available_models, context_windows = await get_available_models(
+        api_key, provider_input
+    )
     return [
         {
             "provider": provider_mapper.get(provider, provider),
@@ -59,15 +66,43 @@ async def get_available_models_endpoint(
 
 @router.get("", response_model=list[UserModelOutWithModelsList])
 async def get_user_models(
+    request: Request,
+    response: Response,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
 ):
     user_models_db = await get_user_models_by_user_id(jwt_data.user_id)
 
+    # validated before any key is decrypted or model list fetched: the rows
+    # with a digest of the encrypted keys, the version of the shared model
+    # catalog, and the catalog TTL window, so stale model lists get refreshed
+    catalog_version = await model_catalog.get_version()
+    if catalog_version is None:
+        # without the version the body would be hashed, keys included
+        response.headers["Cache-Control"] = "no-store"
+    else:
+        etag = get_version_etag(
+            catalog_version,
+            int(time() // settings.MODEL_CATALOG_TTL),
+            [
+                (
+                    model["uuid"],
+                    model["provider"],
+                    model["defaultSelected"],
+                    model["default"],
+                    sha256(model["api_key"].encode()).hexdigest(),
+                    model["updated_at"],
+                )
+                for model in user_models_db
+            ],
+        )
+        if not_modified := check_not_modified(request, response, etag):
+            return not_modified
+
     user_models = [
         UserModelOutWithModelsList(**dict(model)) for model in user_models_db
     ]
 
-    for model in user_models:
+    async def _add_models_list(model: UserModelOutWithModelsList) -> None:
         decrypted_api_key = decrypt_api_key(model.api_key)
         model.api_key = decrypted_api_key
         try:
@@ -79,12 +114,17 @@ async def get_user_models(
             logger.error(f"Error fetching models for {model.provider}: {e}")
             model.models = []
 
+    # model lists of different providers and keys are fetched concurrently
+    await asyncio.gather(*[_add_models_list(model) for model in user_models])
+
     return user_models
 
 
 @router.get("/{model_uuid}", response_model=UserModelOut)
 async def get_specific_user_model(
-    model_uuid, jwt_data: JWTData = Depends(parse_jwt_user_data)
+    model_uuid,
+    response: Response,
+    jwt_data: JWTData = Depends(parse_jwt_user_data),
 ):
     user_model_db = await get_user_model_by_uuid(model_uuid, jwt_data.user_id)
 
@@ -93,6 +133,8 @@ async def get_specific_user_model(
 
     user_model = UserModelOut(**dict(user_model_db))
     user_model.api_key = decrypt_api_key(user_model.api_key)
+    # keeps the plaintext key out of the body hashed for an ETag
+    response.headers["Cache-Control"] = "no-store"
 
     return user_model
 
@@ -116,6 +158,7 @@ async def update_user_model(
     model_uuid,
     user_model_data: UserModelUpdateInput,
     jwt_data: JWTData = Depends(parse_jwt_user_data),
+    auth: AuthContext = Depends(get_auth_context),
 ):
     user_model = await update_user_model_in_db(
         model_uuid, user_model_data, jwt_data.user_id
@@ -123,15 +166,14 @@ async def update_user_model(
     if not user_model:
         raise NoResultFound()
 
-    await pub_sub_manager.publish(
-        listener_room_name,
-        json.dumps(
-            WSEventMessage(
-                type=user_model_changed_info,
-                id=str(jwt_data.user_id),
-                source="user-model-update",
-            ).model_dump(mode="json")
+    # user models are shared with the organizations of the user
+    await publish_listener_event(
+        WSEventMessage(
+            type=user_model_changed_info,
+            id=str(jwt_data.user_id),
+            source="user-model-update",
         ),
+        *get_auth_context_topics(auth),
     )
 
     return UserModelOut(**dict(user_model))
@@ -1,4 +1,5 @@
 import contextlib
+import hashlib
 import logging
 import os
 import random
@@ -51,3 +52,20 @@ def validate_html(html: str) -> bool:
     except Exception as e:
         logger.error(e)
         return False
+
+
+def get_etag(content: str | bytes) -> str:
+    if isinstance(content, str):
+        content = content.encode()
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches the ETag, compared weakly
+    """
+    if not if_none_match:
+        return False
+
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
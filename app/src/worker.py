@@ -0,0 +1,187 @@
+"""
+Long-lived asyncio runtime of a Celery worker process
+
+Every worker process owns one event loop, running in a dedicated thread,
+with the database pool, the Redis pool and the HTTP clients bound to it.
+Tasks submit their coroutines to that loop instead of connecting and
+disconnecting around every run.
+
+Task durations are recorded from the task signals, and the metrics of all
+the pool processes are served by the main process on METRICS_PORT. Tasks
+run in a span continuing the trace of the traceparent header they were sent
+with, the coroutines submitted to the loop inherit it.
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from contextvars import Token
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Coroutine, TypeVar
+
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
+
+from src.config import settings
+from src.database import database
+from src.metrics import mark_process_dead, observe_task, start_metrics_server
+from src.redis_client import pub_sub_manager
+from src.scraping.async_downloader import async_downloader
+from src.tracing import TRACEPARENT_HEADER, Span, tracer
+from src.user_models.clients import llm_client_pool
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    def __init__(self) -> None:
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._shutdown_callbacks: list[Callable[[], Awaitable[Any]]] = []
+
+    @property
+    def is_running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+
+    def add_shutdown_callback(self, callback: Callable[[], Awaitable[Any]]) -> None:
+        self._shutdown_callbacks.append(callback)
+
+    def start(self) -> None:
+        with self._lock:
+            if self.is_running:
+                return
+
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=loop.run_forever, name="worker-event-loop", daemon=True
+            )
+            self._thread.start()
+            self.loop = loop
+
+            start = perf_counter()
+            asyncio.run_coroutine_threadsafe(self._connect(), loop).result()
+            logger.info(f"Worker runtime started in {perf_counter() - start:.3f}s")
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self.is_running or self.loop is None:
+                return
+
+            loop = self.loop
+            try:
+                asyncio.run_coroutine_threadsafe(self._disconnect(), loop).result()
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+                if self._thread:
+                    self._thread.join()
+                loop.close()
+                self.loop = None
+                self._thread = None
+            logger.info("Worker runtime stopped")
+
+    async def _connect(self) -> None:
+        await database.connect()
+        logger.info("Connected to database")
+        # bind the Redis pool to this loop
+        pub_sub_manager.get_connection()
+
+    async def _disconnect(self) -> None:
+        for callback in self._shutdown_callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Worker shutdown callback failed: {e}")
+        await async_downloader.close()
+        await llm_client_pool.close()
+        await pub_sub_manager.disconnect()
+        await database.disconnect()
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> Future[T]:
+        if not self.is_running:
+            # solo/threads pools don't send `worker_process_init`
+            self.start()
+        assert self.loop is not None
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine: Coroutine[Any, Any, T], name: str = "") -> T:
+        """
+        Run the coroutine on the worker loop and wait for its result
+
+        Logs the task overhead, the time spent outside the coroutine itself.
+        """
+        started_at: float | None = None
+        finished_at: float | None = None
+
+        async def _timed() -> T:
+            nonlocal started_at, finished_at
+            started_at = perf_counter()
+            try:
+                return await coroutine
+            finally:
+                finished_at = perf_counter()
+
+        submitted_at = perf_counter()
+        try:
+            return self.submit(_timed()).result()
+        finally:
+            returned_at = perf_counter()
+            if started_at is not None and finished_at is not None:
+                overhead = (started_at - submitted_at) + (returned_at - finished_at)
+                logger.info(
+                    f"Task {name or coroutine.__qualname__} finished in "
+                    f"{returned_at - submitted_at:.3f}s, overhead {overhead:.4f}s"
+                )
+
+
+worker_runtime = WorkerRuntime()
+
+
+# task id -> start time and span, of the tasks running in this process
+_task_starts: dict[str, tuple[float, Span, Token]] = {}
+
+
+@worker_init.connect
+def start_worker_metrics_server(**kwargs) -> None:
+    start_metrics_server(settings.METRICS_PORT)
+
+
+@worker_process_init.connect
+def start_worker_runtime(**kwargs) -> None:
+    worker_runtime.start()
+
+
+@worker_process_shutdown.connect
+def stop_worker_runtime(**kwargs) -> None:
+    worker_runtime.stop()
+    mark_process_dead(os.getpid())
+
+
+@task_prerun.connect
+def start_task_timer(task_id: str, task, **kwargs) -> None:
+    span = tracer.start(
+        f"task {task.name}", task.request.get(TRACEPARENT_HEADER), task_id=task_id
+    )
+    # prerun, the task and postrun run in the same thread and context
+    _task_starts[task_id] = (perf_counter(), span, tracer.activate(span))
+
+
+@task_postrun.connect
+def observe_task_duration(task_id: str, task, state: str | None = None, **kwargs):
+    started = _task_starts.pop(task_id, None)
+    if started is None:
+        return
+
+    start, span, token = started
+    observe_task("celery", task.name, state or "unknown", perf_counter() - start)
+    span.set_attribute("state", state)
+    tracer.deactivate(token)
+    tracer.end(span)
@@ -0,0 +1,113 @@
+import asyncio
+from logging import getLogger
+from time import time
+from typing import Awaitable, Callable
+
+from redis.exceptions import RedisError
+
+from src.config import settings
+from src.redis_client import pub_sub_manager
+
+logger = getLogger(__name__)
+
+TRANSCRIPT_KEY_PREFIX = "youtube:transcript"
+TRANSCRIPT_INDEX_KEY = "youtube:transcripts"
+
+
+class TranscriptCache:
+    """
+    Redis cache of YouTube transcripts keyed by video id and language
+
+    Entries expire after YOUTUBE_TRANSCRIPT_CACHE_TTL; a sorted set scored by
+    the last access time evicts the least recently used entries above
+    YOUTUBE_TRANSCRIPT_CACHE_MAX_ENTRIES. Concurrent misses for the same key
+    within a process share one fetch.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[str, asyncio.Task[str]] = {}
+
+    @staticmethod
+    def _key(video_id: str, language: str) -> str:
+        return f"{TRANSCRIPT_KEY_PREFIX}:{video_id}:{language}"
+
+    async def get(self, video_id: str, language: str) -> str | None:
+        key = self._key(video_id, language)
+        try:
+            redis = pub_sub_manager.get_connection()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.zadd(TRANSCRIPT_INDEX_KEY, {key: time()}, xx=True)
+                transcript, _ = await pipe.execute()
+        except RedisError as e:
+            logger.error(f"Failed to read cached transcript {key}: {e}")
+            return None
+
+        return transcript
+
+    async def set(self, video_id: str, language: str, transcript: str) -> None:
+        key = self._key(video_id, language)
+        try:
+            redis = pub_sub_manager.get_connection()
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.set(key, transcript, ex=settings.YOUTUBE_TRANSCRIPT_CACHE_TTL)
+                pipe.zadd(TRANSCRIPT_INDEX_KEY, {key: time()})
+                # drop index entries of transcripts which already expired
+                pipe.zremrangebyscore(
+                    TRANSCRIPT_INDEX_KEY,
+                    "-inf",
+                    time() - settings.YOUTUBE_TRANSCRIPT_CACHE_TTL,
+                )
+                pipe.zcard(TRANSCRIPT_INDEX_KEY)
+                *_, size = await pipe.execute()
+
+            overflow = size - settings.YOUTUBE_TRANSCRIPT_CACHE_MAX_ENTRIES
+            if overflow > 0:
+                evicted = await redis.zpopmin(TRANSCRIPT_INDEX_KEY, overflow)
+                await redis.delete(*[evicted_key for evicted_key, _ in evicted])
+        except RedisError as e:
+            logger.error(f"Failed to cache transcript {key}: {e}")
+
+    async def get_or_fetch(
+        self,
+        video_id: str,
+        language: str,
+        fetch: Callable[[], Awaitable[str]],
+    ) -> str:
+        """
+        The fetch runs in a task owned by the cache, so a caller being
+        cancelled doesn't cancel it for the others waiting on it
+        """
+        key = self._key(video_id, language)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._get_or_fetch(video_id, language, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._done(key))
+        else:
+            logger.info(f"Waiting for the transcript fetch in flight: {key}")
+
+        return await asyncio.shield(task)
+
+    async def _get_or_fetch(
+        self,
+        video_id: str,
+        language: str,
+        fetch: Callable[[], Awaitable[str]],
+    ) -> str:
+        transcript = await self.get(video_id, language)
+        if transcript is None:
+            transcript = await fetch()
+            # failed fetches return an empty transcript, don't keep those
+            if transcript:
+                await self.set(video_id, language, transcript)
+        return transcript
+
+    def _done(self, key: str) -> None:
+        task = self._in_flight.pop(key)
+        if not task.cancelled():
+            # retrieve it so a fetch without waiters doesn't log a warning
+            task.exception()
+
+
+transcript_cache = TranscriptCache()
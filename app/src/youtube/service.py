@@ -1,12 +1,19 @@
+import asyncio
+import threading
 from logging import getLogger
 from urllib.parse import parse_qs, urlparse
 
-from youtube_transcript_api import YouTubeTranscriptApi
+from requests import Session
+from youtube_transcript_api._transcripts import TranscriptListFetcher
 
 from src.config import settings
+from src.youtube.cache import transcript_cache
 
 logger = getLogger(__name__)
 
+_http_client: Session | None = None
+_http_client_lock = threading.Lock()
+
 
 class YouTubeService:
     def get_youtube_link(self, url: str):
@@ -48,19 +55,44 @@ class YouTubeService:
 
         return None
 
-    def get_video_transcription(self, url: str) -> str:
-        """Return the transcription of the video."""
+    async def get_video_transcription(self, url: str, language: str = "en") -> str:
+        """Return the transcription of the video, cached by video id and language."""
         video_id = self.get_video_id(url)
+        if not video_id:
+            return ""
 
-        # Proxy configuration
-        proxies = {
-            "http": f"http://{settings.YOUTUBE_PROXY_URL}",
-            "https": f"http://{settings.YOUTUBE_PROXY_URL}",
-        }
+        return await transcript_cache.get_or_fetch(
+            video_id,
+            language,
+            # youtube_transcript_api is blocking, keep it off the event loop
+            lambda: asyncio.to_thread(
+                self._get_video_transcription, video_id, language
+            ),
+        )
 
+    @staticmethod
+    def _get_http_client() -> Session:
+        """Return the proxied HTTP session shared by every transcript fetch."""
+        global _http_client
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = Session()
+                if settings.YOUTUBE_PROXY_URL:
+                    _http_client.proxies = {
+                        "http": f"http://{settings.YOUTUBE_PROXY_URL}",
+                        "https": f"http://{settings.YOUTUBE_PROXY_URL}",
+                    }
+            return _http_client
+
+    def _get_video_transcription(self, video_id: str, language: str) -> str:
         try:
-            transcription_data = YouTubeTranscriptApi.get_transcript(
-                video_id, proxies=proxies
+            # same as YouTubeTranscriptApi.get_transcript, which opens
+            # a new session (and proxy connection) on every call
+            transcription_data = (
+                TranscriptListFetcher(self._get_http_client())
+                .fetch(video_id)
+                .find_transcript([language])
+                .fetch()
             )
         except Exception as e:
             logger.error(f"Failed to get transcription for video: {video_id}")
@@ -70,7 +102,10 @@ class YouTubeService:
         if not transcription_data:
             return ""
 
-        return " ".join([item.get("text") for item in transcription_data])
+        texts: list[str] = [""] * len(transcription_data)
+        for index, item in enumerate(transcription_data):
+            texts[index] = item.get("text", "")
+        return " ".join(texts)
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import time
+import unittest
+import uuid
+from typing import Any, Iterator
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql
+
+from src.auth.service import get_or_create_user
+from src.chat.schemas import MessageDetails
+from src.chat.service import (
+    get_create_message_query,
+    get_user_and_organization_rooms_query,
+)
+from src.database import DATABASE_URL, Database, Room, TokenUsage, User, database
+
+TEST_USER = "test_queries_user@mail.com"
+TEST_CONCURRENCY_USER = "test_queries_concurrency_user@mail.com"
+CONCURRENT_CONNECTIONS = 10
+
+logger = logging.getLogger(__name__)
+
+
+def iter_plan_nodes(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+class TestRoomVisibilityQuery(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        await database.connect()
+        self.user = await get_or_create_user({"email": TEST_USER})
+
+    async def asyncTearDown(self) -> None:
+        await database.execute(delete(User).where(User.email == TEST_USER))
+        await database.disconnect()
+
+    async def explain(self, user_id: int) -> list[dict[str, Any]]:
+        query = get_user_and_organization_rooms_query(user_id).compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        async with database.transaction(force_rollback=True):
+            # the test tables are tiny, make the planner show the index choice
+            await database.execute("SET LOCAL enable_seqscan = off")
+            plan = await database.fetch_val(f"EXPLAIN (FORMAT JSON) {query}")
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return list(iter_plan_nodes(plan[0]["Plan"]))
+
+    async def test_visibility_query_uses_indexes(self) -> None:
+        nodes = await self.explain(self.user["id"])
+        index_names = {node.get("Index Name") for node in nodes}
+
+        self.assertIn("room_user_id_visibility_idx", index_names)
+        self.assertIn("room_organization_uuid_visibility_idx", index_names)
+        self.assertIn("organization_user_auth_user_id_idx", index_names)
+
+    async def test_visibility_query_scans_room_once(self) -> None:
+        nodes = await self.explain(self.user["id"])
+        room_scans = [
+            node
+            for node in nodes
+            if node.get("Relation Name") == "room" and "Scan" in node["Node Type"]
+        ]
+
+        self.assertEqual(len(room_scans), 1)
+
+
+class TestCreateMessage(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs on a pool of its own: the shared test database is a single
+    rollback connection, on which concurrent queries run one at a time
+    """
+
+    async def asyncSetUp(self) -> None:
+        self.db = Database(
+            DATABASE_URL.unicode_string(),
+            min_size=CONCURRENT_CONNECTIONS,
+            max_size=CONCURRENT_CONNECTIONS,
+        )
+        await self.db.connect()
+        # committed, so that every connection of the pool sees them
+        self.user_id = await self.db.fetch_val(
+            insert(User)
+            .values(email=TEST_CONCURRENCY_USER, password=b"")
+            .returning(User.id)
+        )
+        self.room_id = uuid.uuid4()
+        await self.db.execute(
+            insert(Room).values(uuid=self.room_id, user_id=self.user_id, name="test")
+        )
+        self.token_usage_ids: list[int] = []
+
+    async def asyncTearDown(self) -> None:
+        # messages are deleted with their token usage
+        await self.db.execute(
+            delete(TokenUsage).where(TokenUsage.id.in_(self.token_usage_ids))
+        )
+        await self.db.execute(delete(Room).where(Room.uuid == self.room_id))
+        await self.db.execute(delete(User).where(User.id == self.user_id))
+        await self.db.disconnect()
+
+    async def create_message(self, i: int) -> tuple[int, int]:
+        """
+        Token usage id of the new message and the backend which inserted it
+        """
+        async with self.db.connection() as connection:
+            message = await connection.fetch_one(
+                get_create_message_query(
+                    MessageDetails(
+                        created_by="user",
+                        room_id=str(self.room_id),
+                        content=f"message {i}",
+                        user_id=self.user_id,
+                    )
+                )
+            )
+            backend_pid = await connection.fetch_val("SELECT pg_backend_pid()")
+        return message["token_usage_id"], backend_pid
+
+    async def test_concurrent_inserts_get_unique_token_usage_ids(self) -> None:
+        count = 500
+        start = time.perf_counter()
+        results = await asyncio.gather(*[self.create_message(i) for i in range(count)])
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"{count} messages on {CONCURRENT_CONNECTIONS} connections in "
+            f"{elapsed:.2f}s ({count / elapsed:.0f} inserts/s)"
+        )
+        self.token_usage_ids = [token_usage_id for token_usage_id, _ in results]
+
+        # the inserts ran side by side on several connections
+        self.assertGreater(len({backend_pid for _, backend_pid in results}), 1)
+        self.assertEqual(len(set(self.token_usage_ids)), count)
+        self.assertNotIn(None, self.token_usage_ids)
+
+        token_usages = await self.db.fetch_all(
+            select(TokenUsage).where(TokenUsage.id.in_(self.token_usage_ids))
+        )
+        self.assertEqual(len(token_usages), count)
@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import json
+import unittest
+
+from src.jobs.config import settings
+from src.jobs.constants import (
+    get_cancelled_key,
+    get_dead_letter_stream_name,
+    get_stream_name,
+)
+from src.jobs.runner import JobRunner
+
+JOB_NAME = "test_job"
+STREAM = get_stream_name(JOB_NAME)
+
+
+class FakePubSub:
+    def __init__(self, messages: asyncio.Queue[str]) -> None:
+        self.messages = messages
+
+    async def subscribe(self, *channels: str) -> None:
+        pass
+
+    async def unsubscribe(self, *channels: str) -> None:
+        pass
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool, timeout: float
+    ) -> dict | None:
+        try:
+            return {"data": await asyncio.wait_for(self.messages.get(), timeout)}
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeRedis:
+    """
+    The stream commands the runner uses, for a single consumer
+    """
+
+    def __init__(self) -> None:
+        self.streams: dict[str, list[tuple[str, dict]]] = {}
+        self.delivered: dict[str, int] = {}
+        self.acked: list[tuple[str, str]] = []
+        self.keys: set[str] = set()
+        self.cancellations: asyncio.Queue[str] = asyncio.Queue()
+        self._ids = itertools.count(1)
+
+    async def xgroup_create(self, *args, **kwargs) -> None:
+        pass
+
+    async def xadd(self, stream: str, fields: dict, **kwargs) -> str:
+        entry_id = f"{next(self._ids)}-0"
+        entry = {key: str(value) for key, value in fields.items()}
+        self.streams.setdefault(stream, []).append((entry_id, entry))
+        return entry_id
+
+    async def xreadgroup(self, group, consumer, streams, count, block) -> list:
+        response = []
+        for stream in streams:
+            entries = self.streams.get(stream, [])
+            start = self.delivered.get(stream, 0)
+            new_entries = entries[start:][:count]
+            self.delivered[stream] = start + len(new_entries)
+            if new_entries:
+                response.append((stream, new_entries))
+        if not response:
+            await asyncio.sleep(0.01)
+        return response
+
+    async def xack(self, stream: str, group: str, entry_id: str) -> None:
+        self.acked.append((stream, entry_id))
+
+    async def exists(self, key: str) -> int:
+        return int(key in self.keys)
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self.cancellations)
+
+
+class TestJobRunner(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.redis = FakeRedis()
+        self.runner = JobRunner(self.redis, "test")  # type: ignore
+        self.runner_task: asyncio.Task | None = None
+
+    async def asyncTearDown(self) -> None:
+        self.runner.stop()
+        if self.runner_task:
+            await asyncio.wait_for(self.runner_task, 5)
+
+    async def enqueue(self, job_id: str, payload: dict) -> str:
+        return await self.redis.xadd(
+            STREAM, {"job_id": job_id, "payload": json.dumps(payload), "attempt": 0}
+        )
+
+    def start(self) -> None:
+        self.runner_task = asyncio.create_task(self.runner.run())
+
+    async def wait_until_acked(self, entry_id: str) -> None:
+        for _ in range(200):
+            if (STREAM, entry_id) in self.redis.acked:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"{entry_id} was not acknowledged")
+
+    async def test_successful_job_is_acknowledged(self) -> None:
+        payloads: list[dict] = []
+
+        async def handler(payload: dict) -> None:
+            payloads.append(payload)
+
+        self.runner.register(JOB_NAME, handler)
+        entry_id = await self.enqueue("job-1", {"room_id": "1"})
+        self.start()
+
+        await self.wait_until_acked(entry_id)
+
+        self.assertEqual(payloads, [{"room_id": "1"}])
+        self.assertEqual(self.redis.acked, [(STREAM, entry_id)])
+        self.assertNotIn(get_dead_letter_stream_name(JOB_NAME), self.redis.streams)
+        self.assertEqual(self.runner.running, {})
+
+    async def test_failed_job_without_retries_is_dead_lettered(self) -> None:
+        async def handler(payload: dict) -> None:
+            raise ValueError("boom")
+
+        self.runner.register(JOB_NAME, handler, max_retries=0)
+        entry_id = await self.enqueue("job-2", {})
+        self.start()
+
+        await self.wait_until_acked(entry_id)
+
+        ((_, dead_letter),) = self.redis.streams[get_dead_letter_stream_name(JOB_NAME)]
+        self.assertEqual(dead_letter["job_id"], "job-2")
+        self.assertEqual(dead_letter["reason"], "boom")
+        # not re-enqueued
+        self.assertEqual(len(self.redis.streams[STREAM]), 1)
+
+    async def test_running_job_is_cancelled(self) -> None:
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def handler(payload: dict) -> None:
+            started.set()
+            try:
+                await asyncio.sleep(settings.JOBS_VISIBILITY_TIMEOUT)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        self.runner.register(JOB_NAME, handler)
+        entry_id = await self.enqueue("job-3", {})
+        self.start()
+        await asyncio.wait_for(started.wait(), 2)
+
+        # what cancel_job does
+        self.redis.keys.add(get_cancelled_key("job-3"))
+        self.redis.cancellations.put_nowait("job-3")
+        await self.wait_until_acked(entry_id)
+
+        self.assertTrue(cancelled.is_set())
+        self.assertNotIn(get_dead_letter_stream_name(JOB_NAME), self.redis.streams)
+        self.assertEqual(len(self.redis.streams[STREAM]), 1)
+        self.assertEqual(self.runner.running, {})
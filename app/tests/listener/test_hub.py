@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+
+from starlette import status
+
+from src.listener.constants import room_changed_info
+from src.listener.hub import ListenerConnection, ListenerHub
+from src.listener.schemas import WSEventMessage
+from src.utils import override_settings
+
+TOPIC = "listener:user:1"
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.received: asyncio.Queue[str] = asyncio.Queue()
+        self.close_code: int | None = None
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(data)
+
+    async def receive_text(self) -> str:
+        return await self.received.get()
+
+    async def close(self, code: int) -> None:
+        self.close_code = code
+
+
+class FakePubSub:
+    def __init__(self) -> None:
+        self.subscribed: list[str] = []
+        self.unsubscribed: list[str] = []
+        self.messages: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def subscribe(self, *topics: str) -> None:
+        self.subscribed.extend(topics)
+
+    async def unsubscribe(self, *topics: str) -> None:
+        self.unsubscribed.extend(topics)
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool, timeout: float
+    ) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        pass
+
+
+class TestListenerHub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.pubsub = FakePubSub()
+        self.hub = ListenerHub()
+        self.hub._pubsub = self.pubsub  # type: ignore
+
+    async def asyncTearDown(self) -> None:
+        await self.hub.close()
+
+    async def test_burst_of_events_is_delivered_once(self) -> None:
+        websocket = FakeWebSocket()
+        connection = ListenerConnection(websocket)  # type: ignore
+        await self.hub.subscribe(connection, TOPIC)
+
+        with override_settings(LISTENER_COALESCE_WINDOW=0.05):
+            task = asyncio.create_task(connection.run(self._ignore_message))
+            for _ in range(5):
+                event = WSEventMessage(type=room_changed_info, id="room")
+                self.pubsub.messages.put_nowait(
+                    {"channel": TOPIC, "data": event.model_dump_json()}
+                )
+            await asyncio.sleep(0.2)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        self.assertEqual(len(websocket.sent), 1)
+        self.assertIn(room_changed_info, websocket.sent[0])
+
+    async def test_idle_connection_is_closed(self) -> None:
+        websocket = FakeWebSocket()
+        connection = ListenerConnection(websocket)  # type: ignore
+
+        with override_settings(LISTENER_PING_INTERVAL=0.01, LISTENER_IDLE_TIMEOUT=0.03):
+            await asyncio.wait_for(connection.run(self._ignore_message), 1)
+
+        self.assertEqual(websocket.close_code, status.WS_1001_GOING_AWAY)
+
+    async def test_last_unsubscribe_of_a_topic_unsubscribes_from_redis(self) -> None:
+        first = ListenerConnection(FakeWebSocket())  # type: ignore
+        second = ListenerConnection(FakeWebSocket())  # type: ignore
+        await self.hub.subscribe(first, TOPIC)
+        await self.hub.subscribe(second, TOPIC)
+        self.assertEqual(self.pubsub.subscribed, [TOPIC])
+
+        await self.hub.remove(first)
+        self.assertEqual(self.pubsub.unsubscribed, [])
+
+        await self.hub.remove(second)
+        self.assertEqual(self.pubsub.unsubscribed, [TOPIC])
+        self.assertNotIn(TOPIC, self.hub.connections)
+
+    @staticmethod
+    async def _ignore_message(message) -> None:
+        pass
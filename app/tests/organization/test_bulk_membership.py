@@ -0,0 +1,91 @@
+import logging
+import time
+import unittest
+
+from sqlalchemy import delete, func, insert, select
+
+from src.database import OrganizationAdmin, OrganizationUser, User, database
+from src.organizations.enums import MembershipStatus
+from src.organizations.schemas import OrganizationCreate
+from src.organizations.service import (
+    add_users_to_organization_in_db_by_emails,
+    create_organization_in_db,
+    delete_organization_from_db,
+)
+from src.tracing import InMemorySpanExporter, tracer
+
+MEMBERS_COUNT = 5000
+EMAIL_DOMAIN = "bulk-membership.test"
+
+logger = logging.getLogger(__name__)
+
+
+class TestBulkMembership(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        await database.connect()
+        self.exporter = InMemorySpanExporter()
+        tracer.add_exporter(self.exporter)
+        self.organization = await create_organization_in_db(
+            OrganizationCreate(name="Bulk membership organization")
+        )
+        self.emails = [f"user{i}@{EMAIL_DOMAIN}" for i in range(MEMBERS_COUNT)]
+        await database.execute(
+            insert(User).values(
+                [{"email": email, "password": b"password"} for email in self.emails]
+            )
+        )
+
+    async def asyncTearDown(self) -> None:
+        tracer.remove_exporter(self.exporter)
+        await delete_organization_from_db(str(self.organization["uuid"]))
+        await database.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+        await database.disconnect()
+
+    async def count_members(self, table) -> int:
+        return await database.fetch_val(
+            select(func.count()).where(
+                table.organization_uuid == self.organization["uuid"]
+            )
+        )
+
+    async def test_add_synthetic_organization(self) -> None:
+        organization_uuid = str(self.organization["uuid"])
+        missing_email = f"missing@{EMAIL_DOMAIN}"
+
+        self.exporter.clear()
+        start = time.perf_counter()
+        statuses = await add_users_to_organization_in_db_by_emails(
+            organization_uuid, [*self.emails, missing_email], as_admin=True
+        )
+        elapsed = time.perf_counter() - start
+        statements = [
+            span.attributes["statement"]
+            for span in self.exporter.get_finished_spans("db")
+        ]
+        logger.info(f"Added {MEMBERS_COUNT} users and admins in {elapsed:.2f}s")
+
+        self.assertEqual(statuses[missing_email], MembershipStatus.USER_NOT_FOUND)
+        self.assertEqual(
+            [
+                email
+                for email in self.emails
+                if statuses[email] != MembershipStatus.ADDED
+            ],
+            [],
+        )
+        self.assertEqual(await self.count_members(OrganizationUser), MEMBERS_COUNT)
+        self.assertEqual(await self.count_members(OrganizationAdmin), MEMBERS_COUNT)
+        # one lookup of the emails and one insert per table, whatever the size
+        self.assertEqual(
+            statements,
+            [
+                "select:auth_user",
+                "insert:organization_user",
+                "insert:organization_admin",
+            ],
+        )
+
+        statuses = await add_users_to_organization_in_db_by_emails(
+            organization_uuid, self.emails[:10]
+        )
+        self.assertEqual(set(statuses.values()), {MembershipStatus.ALREADY_MEMBER})
@@ -0,0 +1,97 @@
+import unittest
+
+from async_asgi_testclient import TestClient
+from fastapi import FastAPI
+from starlette import status
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from src.conditional import NOT_MODIFIED_HEADERS, ConditionalRequestMiddleware
+
+ENDPOINT_ETAG = '"endpoint-version"'
+
+app = FastAPI()
+app.add_middleware(ConditionalRequestMiddleware)
+
+
+@app.get("/json")
+async def get_json():
+    return JSONResponse({"items": [1, 2, 3]})
+
+
+@app.get("/text")
+async def get_text():
+    return PlainTextResponse("plain text")
+
+
+@app.get("/stream")
+async def get_stream():
+    async def iter_items():
+        yield b'{"items": ['
+        yield b"1, 2, 3]}"
+
+    return StreamingResponse(iter_items(), media_type="application/json")
+
+
+@app.get("/secret")
+async def get_secret():
+    return JSONResponse({"api_key": "key"}, headers={"Cache-Control": "no-store"})
+
+
+@app.get("/versioned")
+async def get_versioned():
+    return JSONResponse({"items": []}, headers={"ETag": ENDPOINT_ETAG})
+
+
+class TestConditionalRequestMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.client = TestClient(app)
+
+    async def test_matching_etag_returns_304_with_validators_only(self) -> None:
+        resp = await self.client.get("/json")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp.headers["etag"]
+
+        resp = await self.client.get("/json", headers={"If-None-Match": etag})
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp.content, b"")
+        self.assertEqual(resp.headers["etag"], etag)
+        for name in resp.headers:
+            self.assertIn(name.lower().encode(), NOT_MODIFIED_HEADERS)
+
+    async def test_changed_etag_returns_the_body(self) -> None:
+        resp = await self.client.get("/json", headers={"If-None-Match": '"stale"'})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json(), {"items": [1, 2, 3]})
+
+    async def test_non_json_response_passes_through(self) -> None:
+        resp = await self.client.get("/text")
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.text, "plain text")
+        self.assertNotIn("etag", resp.headers)
+
+    async def test_streaming_response_passes_through(self) -> None:
+        resp = await self.client.get("/stream")
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.json(), {"items": [1, 2, 3]})
+        self.assertNotIn("etag", resp.headers)
+
+    async def test_no_store_response_is_not_hashed(self) -> None:
+        resp = await self.client.get("/secret")
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotIn("etag", resp.headers)
+
+    async def test_endpoint_etag_is_kept(self) -> None:
+        resp = await self.client.get("/versioned")
+        self.assertEqual(resp.headers["etag"], ENDPOINT_ETAG)
+
+        resp = await self.client.get(
+            "/versioned", headers={"If-None-Match": ENDPOINT_ETAG}
+        )
+
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp.headers["etag"], ENDPOINT_ETAG)
@@ -0,0 +1,18 @@
+import pytest
+
+from src.config import Config
+from src.constants import TaskRunner
+
+
+@pytest.mark.parametrize("value", ["asyncio", "ASYNCIO", "Asyncio"])
+def test_task_runner_is_case_insensitive(monkeypatch, value):
+    monkeypatch.setenv("TASK_RUNNER", value)
+
+    assert Config().TASK_RUNNER is TaskRunner.ASYNCIO
+
+
+def test_task_runner_rejects_unknown_values(monkeypatch):
+    monkeypatch.setenv("TASK_RUNNER", "threads")
+
+    with pytest.raises(ValueError):
+        Config()
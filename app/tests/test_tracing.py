@@ -0,0 +1,101 @@
+import unittest
+
+from src.chat.schemas import BroadcastData
+from src.database import database
+from src.listener.schemas import WSEventMessage
+from src.metrics import time_llm_request
+from src.tracing import (
+    InMemorySpanExporter,
+    get_trace_id,
+    parse_traceparent,
+    start_span,
+    tracer,
+)
+
+REMOTE_TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+REMOTE_SPAN_ID = "00f067aa0ba902b7"
+
+
+class TestTracing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        await database.connect()
+        self.exporter = InMemorySpanExporter()
+        tracer.add_exporter(self.exporter)
+
+    async def asyncTearDown(self) -> None:
+        tracer.remove_exporter(self.exporter)
+        await database.disconnect()
+
+    async def test_nested_spans_share_the_trace(self) -> None:
+        with start_span("parent") as parent:
+            with start_span("child") as child:
+                self.assertEqual(get_trace_id(), parent.trace_id)
+
+        self.assertIsNone(get_trace_id())
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.parent_id, parent.span_id)
+        self.assertIsNone(parent.parent_id)
+        # children end first
+        self.assertEqual(
+            [span.name for span in self.exporter.get_finished_spans()],
+            ["child", "parent"],
+        )
+
+    async def test_remote_traceparent_is_continued(self) -> None:
+        traceparent = f"00-{REMOTE_TRACE_ID}-{REMOTE_SPAN_ID}-01"
+
+        with start_span("task", traceparent) as span:
+            pass
+
+        self.assertEqual(span.trace_id, REMOTE_TRACE_ID)
+        self.assertEqual(span.parent_id, REMOTE_SPAN_ID)
+        self.assertEqual(parse_traceparent(span.traceparent)[0], REMOTE_TRACE_ID)
+
+    async def test_invalid_traceparent_starts_a_new_trace(self) -> None:
+        for traceparent in ("", "garbage", f"00-{'0' * 32}-{REMOTE_SPAN_ID}-01"):
+            self.assertIsNone(parse_traceparent(traceparent))
+
+        with start_span("task", "garbage") as span:
+            pass
+
+        self.assertNotEqual(span.trace_id, REMOTE_TRACE_ID)
+        self.assertIsNone(span.parent_id)
+
+    async def test_error_is_recorded(self) -> None:
+        with self.assertRaises(ValueError):
+            with start_span("failing"):
+                raise ValueError("boom")
+
+        (span,) = self.exporter.get_finished_spans("failing")
+        self.assertIn("boom", span.error)
+        self.assertIsNotNone(span.duration)
+
+    async def test_broadcast_payloads_carry_the_trace_id(self) -> None:
+        self.assertIsNone(WSEventMessage(type="test").trace_id)
+
+        with start_span("chat.message") as span:
+            event = WSEventMessage(type="test")
+            broadcast = BroadcastData(type="message", message="hi", room_id="1")
+
+        self.assertEqual(event.trace_id, span.trace_id)
+        self.assertEqual(broadcast.trace_id, span.trace_id)
+
+    async def test_llm_request_span(self) -> None:
+        with start_span("chat.message") as parent:
+            with time_llm_request("OpenAI", "gpt-4") as timer:
+                timer.chunk()
+                timer.chunk()
+
+        (span,) = self.exporter.get_finished_spans("llm")
+        self.assertEqual(span.parent_id, parent.span_id)
+        self.assertEqual(span.attributes["provider"], "openai")
+        self.assertEqual(span.attributes["model"], "gpt-4")
+        self.assertIsNotNone(span.attributes["time_to_first_token"])
+
+    async def test_db_query_span(self) -> None:
+        with start_span("request") as parent:
+            self.assertEqual(await database.fetch_val("SELECT 1"), 1)
+
+        (span,) = self.exporter.get_finished_spans("db")
+        self.assertEqual(span.parent_id, parent.span_id)
+        self.assertEqual(span.attributes["statement"], "raw")
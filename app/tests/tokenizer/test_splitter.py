@@ -0,0 +1,40 @@
+import unittest
+from typing import AsyncIterator
+
+from src.tokenizer.splitter import DEFAULT_CHUNK_SIZE, get_encoding, split_text_stream
+
+PAGE = "The quick brown fox jumps over the lazy dog. " * 100
+PAGE_COUNT = 30
+
+
+class TestSplitTextStream(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.pages_read = 0
+
+    async def iter_pages(self) -> AsyncIterator[str]:
+        for _ in range(PAGE_COUNT):
+            self.pages_read += 1
+            yield PAGE
+
+    async def test_splits_are_bounded_by_token_count(self) -> None:
+        encoding = get_encoding()
+
+        splits = [
+            split async for split in split_text_stream(self.iter_pages(), "unknown")
+        ]
+
+        self.assertGreater(len(splits), 1)
+        for split in splits:
+            self.assertLessEqual(len(encoding.encode(split)), DEFAULT_CHUNK_SIZE)
+        self.assertEqual(
+            " ".join(splits).split(), " ".join([PAGE] * PAGE_COUNT).split()
+        )
+
+    async def test_first_split_is_emitted_before_the_input_ends(self) -> None:
+        splits = split_text_stream(self.iter_pages(), "unknown")
+
+        first = await splits.__anext__()
+
+        self.assertTrue(first)
+        self.assertLess(self.pages_read, PAGE_COUNT)
+        await splits.aclose()
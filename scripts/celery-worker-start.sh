@@ -4,4 +4,9 @@ set -o errexit
 set -o nounset
 
 cd app
+
+# the metrics of all the worker processes are collected in this directory
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 celery -A src.tasks.celery_app worker --loglevel=info --concurrency=2
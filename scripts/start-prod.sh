@@ -13,5 +13,9 @@ export GUNICORN_CONF=${GUNICORN_CONF:-$DEFAULT_GUNICORN_CONF}
 export WORKER_CLASS=${WORKER_CLASS:-"uvicorn.workers.UvicornWorker"}
 export WORKERS=${WORKERS:-1}
 
+# the metrics of all the worker processes are collected in this directory
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 # Start Gunicorn
 gunicorn --forwarded-allow-ips "*" -w "$WORKERS" -k "$WORKER_CLASS" -c "$GUNICORN_CONF" "$APP_MODULE"